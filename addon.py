@@ -1,14 +1,33 @@
 import bpy
+import bmesh
 import mathutils
 import json
 import threading
 import socket
+import selectors
+import collections
 import time
 import requests
 import tempfile
 import traceback
 import os
+import pstats
 import shutil
+import stat
+import sys
+import ast
+import io
+import contextlib
+import cProfile
+import ctypes
+import hashlib
+import math
+import heapq
+import struct
+import zlib
+import base64
+import fnmatch
+import numpy as np
 from bpy.props import StringProperty, IntProperty, BoolProperty, EnumProperty
 
 bl_info = {
@@ -21,154 +40,1869 @@ bl_info = {
     "category": "Interface",
 }
 
+# Faster frame header codecs, used when installed into Blender's Python
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 RODIN_FREE_TRIAL_KEY = "k9TcfFoEhNd9cCPP2guHAHHHkctZHIRhZDywZ1euGUXwihbYLpOjQhofby80NJez"
 
-class BlenderMCPServer:
-    def __init__(self, host='localhost', port=9876):
-        self.host = host
-        self.port = port
-        self.running = False
-        self.socket = None
-        self.server_thread = None
-    
-    def start(self):
-        if self.running:
-            print("Server is already running")
+# Framed wire protocol: a fixed prefix, a header (UTF-8 JSON, or MessagePack when
+# negotiated), then the raw bytes of any binary attachments. Large frames can be
+# compressed as a whole, with the compressed length after the prefix. Clients that
+# send bare JSON keep working.
+FRAME_MAGIC = b"BMCP"
+FRAME_VERSION = 1
+FRAME_PREFIX = struct.Struct("!4sBBIQ")  # magic, version, flags, header length, attachments length
+ATTACHMENT_KEY = "__attachment__"
+_ATTACHMENT_MARKER = ATTACHMENT_KEY.encode('ascii')
+FLAG_SHARED_MEMORY = 0x01  # Some attachments are in the sender's shared-memory ring
+FLAG_MSGPACK = 0x02  # The header is MessagePack instead of JSON
+FLAG_ZLIB = 0x04  # Header and attachments are one zlib stream
+FLAG_ZSTD = 0x08  # Header and attachments are one Zstandard stream
+COMPRESSION_FLAGS = FLAG_ZLIB | FLAG_ZSTD
+COMPRESSED_LENGTH = struct.Struct("!Q")  # Follows the prefix of a compressed frame
+COMPRESSION_THRESHOLD = 64 * 1024  # Smaller frames are sent as they are
+_INFLATE_CHUNK = 1024 * 1024  # Largest piece of output zlib produces at a time
+SHARED_MEMORY_THRESHOLD = 64 * 1024  # Smaller attachments stay in the socket stream
+
+class BinaryAttachment:
+    """Raw binary data sent next to a JSON message instead of inside it"""
+    def __init__(self, data, dtype="uint8", shape=None):
+        # Keep a view over the caller's buffer (NumPy array, bytes, bytearray) - no copy
+        view = memoryview(data)
+        self.data = view.cast("B") if view.nbytes else memoryview(b"")
+        self.dtype = str(dtype)
+        self.shape = list(shape) if shape is not None else [len(self.data) // np.dtype(self.dtype).itemsize]
+
+    @classmethod
+    def from_array(cls, array):
+        array = np.ascontiguousarray(array)
+        return cls(array, dtype=array.dtype.name, shape=array.shape)
+
+    @property
+    def nbytes(self):
+        return len(self.data)
+
+    def to_array(self):
+        """View the attachment as a NumPy array without copying"""
+        return np.frombuffer(self.data, dtype=self.dtype).reshape(self.shape)
+
+def _default(value):
+    """Serialize NumPy scalars and arrays, which handler results sometimes contain"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+def _dumps_json(value, default=_default):
+    """Compact JSON, encoded by orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits, which the stdlib encoder handles
+    return json.dumps(value, default=default, separators=(",", ":")).encode('utf-8')
+
+def _encode_header(value, codec="json", default=_default):
+    """Encode a frame header, returning (bytes, frame flags)"""
+    if codec == "msgpack":
+        return msgpack.packb(value, default=default, use_bin_type=True), FLAG_MSGPACK
+    return _dumps_json(value, default), 0
+
+def _decode_header(data, flags=0):
+    if flags & FLAG_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Received a MessagePack frame, but msgpack is not installed")
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(bytes(data).decode('utf-8'))
+
+def _choose_codec(offered):
+    """Pick the header codec for a client from the ones it offered.
+
+    Responses are encoded on Blender's main thread, so the codec that is
+    fastest here wins: JSON through orjson, then MessagePack, then stdlib JSON.
+    """
+    offered = offered or ["json"]
+    if orjson is not None and "json" in offered:
+        return "json"
+    if msgpack is not None and "msgpack" in offered:
+        return "msgpack"
+    return "json"
+
+def _choose_compression(offered):
+    """The first compression the client offered that is available here, or None"""
+    available = (["zstd"] if zstandard is not None else []) + ["zlib"]
+    return next((name for name in offered or () if name in available), None)
+
+def _compress_frame(buffers, compression=None, threshold=COMPRESSION_THRESHOLD):
+    """Compress an encoded frame's header and attachments when that makes it smaller"""
+    if not compression:
+        return buffers
+    payload = [buffers[0][FRAME_PREFIX.size:], *buffers[1:]]
+    size = sum(len(buffer) for buffer in payload)
+    if size < threshold:
+        return buffers
+    if compression == "zstd":
+        compressor, flag = zstandard.ZstdCompressor(level=3).compressobj(), FLAG_ZSTD
+    else:
+        compressor, flag = zlib.compressobj(1), FLAG_ZLIB
+    parts = [compressor.compress(buffer) for buffer in payload]
+    parts.append(compressor.flush())
+    compressed = sum(len(part) for part in parts)
+    if compressed > size * 0.9:
+        # Already compressed data (images, packed files); not worth it
+        return buffers
+    magic, version, flags, header_length, attachments_length = FRAME_PREFIX.unpack(buffers[0][:FRAME_PREFIX.size])
+    head = FRAME_PREFIX.pack(magic, version, flags | flag, header_length, attachments_length)
+    return [memoryview(head + COMPRESSED_LENGTH.pack(compressed)), *(memoryview(part) for part in parts if part)]
+
+class _Inflater:
+    """Decompresses a frame as it arrives, straight into its preallocated buffer"""
+    def __init__(self, flags, header_length, attachments_length, compressed_length):
+        if flags & FLAG_ZSTD:
+            if zstandard is None:
+                raise ValueError("Received a Zstandard frame, but zstandard is not installed")
+            self.decompressor = zstandard.ZstdDecompressor().decompressobj()
+        else:
+            self.decompressor = zlib.decompressobj()
+        self.zlib = not flags & FLAG_ZSTD
+        self.header_length = header_length
+        self.plain = bytearray(header_length + attachments_length)
+        self.filled = 0
+        self.remaining = compressed_length
+
+    def feed(self, data):
+        """Decompress the next chunk; True once the whole frame is in"""
+        self.remaining -= len(data)
+        if self.zlib:
+            # Bound each piece of output, so a highly compressed chunk doesn't expand all at once
+            while data:
+                self._write(self.decompressor.decompress(data, _INFLATE_CHUNK))
+                data = self.decompressor.unconsumed_tail
+            if not self.remaining:
+                self._write(self.decompressor.flush())
+        else:
+            self._write(self.decompressor.decompress(data))
+        return not self.remaining
+
+    def _write(self, chunk):
+        end = self.filled + len(chunk)
+        if end > len(self.plain):
+            raise ValueError("Decompressed frame is larger than its prefix says")
+        self.plain[self.filled:end] = chunk
+        self.filled = end
+
+    def frame(self):
+        if self.filled != len(self.plain):
+            raise ValueError("Decompressed frame is shorter than its prefix says")
+        return bytes(self.plain[:self.header_length]), memoryview(self.plain)[self.header_length:]
+
+class _SharedMemoryRing:
+    """Attached view of a shared-memory ring created by the MCP server.
+
+    A 24-byte header holds the capacity and the write and read positions,
+    which only ever grow; payloads never wrap around the end. Each ring has
+    one producer and one consumer. Mirrors SharedMemoryRing in the server's
+    protocol module.
+    """
+    HEADER = struct.Struct("<QQQ")  # capacity, write position, read position
+
+    def __init__(self, name):
+        from multiprocessing import shared_memory
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+        except TypeError:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # The server owns the segment; don't let this process's tracker unlink it
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.capacity = self.HEADER.unpack_from(self.shm.buf, 0)[0]
+        self.data = self.shm.buf[self.HEADER.size:self.HEADER.size + self.capacity]
+
+    def write(self, data):
+        """Copy data into the ring and return its position, or None when there is no room"""
+        _, written, read = self.HEADER.unpack_from(self.shm.buf, 0)
+        size = len(data)
+        start = written
+        if start % self.capacity + size > self.capacity:
+            start += self.capacity - start % self.capacity
+        if size > self.capacity or start + size - read > self.capacity:
+            return None
+        offset = start % self.capacity
+        self.data[offset:offset + size] = data
+        struct.pack_into("<Q", self.shm.buf, 8, start + size)
+        return start
+
+    def read(self, position, size):
+        offset = position % self.capacity
+        return bytearray(self.data[offset:offset + size])
+
+    def release(self, end):
+        struct.pack_into("<Q", self.shm.buf, 16, end)
+
+    def close(self):
+        self.data.release()
+        self.shm.close()
+
+def _encode_frame(message, ring=None, codec="json"):
+    """Encode a message into a list of buffers ready to be written in order.
+
+    With a ring, large attachments go through shared memory and only their
+    placeholders are sent; they fall back to the socket when the ring is full.
+    Attachments are swapped for placeholders by the encoder's default hook,
+    so the response is walked once, in C.
+    """
+    attachments = []
+    offset = 0
+    flags = 0
+    placeholders = {}  # id(attachment) -> placeholder, in case the encoder retries
+
+    def extract(value):
+        nonlocal offset, flags
+        if not isinstance(value, BinaryAttachment):
+            return _default(value)
+        placeholder = placeholders.get(id(value))
+        if placeholder is not None:
+            return placeholder
+        placeholder = placeholders[id(value)] = {
+            ATTACHMENT_KEY: len(attachments),
+            "nbytes": value.nbytes,
+            "dtype": value.dtype,
+            "shape": value.shape,
+        }
+        if ring is not None and value.nbytes >= SHARED_MEMORY_THRESHOLD:
+            position = ring.write(value.data)
+            if position is not None:
+                placeholder["shm"] = position
+                flags |= FLAG_SHARED_MEMORY
+                return placeholder
+        placeholder["offset"] = offset
+        attachments.append(value.data)
+        offset += value.nbytes
+        return placeholder
+
+    header, codec_flags = _encode_header(message, codec, extract)
+    flags |= codec_flags
+    prefix = FRAME_PREFIX.pack(FRAME_MAGIC, FRAME_VERSION, flags, len(header), offset)
+    return [memoryview(prefix + header), *attachments]
+
+def _decode_frame(header, body, ring=None, flags=0):
+    """Decode a frame header, turning attachment placeholders into views over body.
+
+    Attachments in the client's shared-memory ring are copied out and their
+    space is released.
+    """
+    view = memoryview(body)
+    ring_end = None
+
+    def resolve(value):
+        nonlocal ring_end
+        if isinstance(value, dict):
+            if ATTACHMENT_KEY in value:
+                if "shm" in value:
+                    if ring is None:
+                        raise ValueError("Frame refers to shared memory, but none was negotiated")
+                    data = ring.read(value["shm"], value["nbytes"])
+                    ring_end = max(ring_end or 0, value["shm"] + value["nbytes"])
+                    return BinaryAttachment(data, value["dtype"], value["shape"])
+                start = value["offset"]
+                return BinaryAttachment(view[start:start + value["nbytes"]], value["dtype"], value["shape"])
+            return {key: resolve(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [resolve(item) for item in value]
+        return value
+
+    message = _decode_header(header, flags)
+    if _ATTACHMENT_MARKER not in header:
+        # Most commands carry no attachments; don't walk them
+        return message
+    message = resolve(message)
+    if ring_end is not None:
+        ring.release(ring_end)
+    return message
+
+def _legacy_json_default(value):
+    """Inline attachments as base64 for clients that only speak bare JSON"""
+    if isinstance(value, BinaryAttachment):
+        return {
+            "base64": base64.b64encode(value.data).decode('ascii'),
+            "dtype": value.dtype,
+            "shape": value.shape,
+        }
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class _SpatialIndex:
+    """Uniform grid over object world AABBs, refreshed incrementally from depsgraph updates"""
+    # Objects covering more cells than this (ground planes, walls) are checked separately
+    MAX_CELLS_PER_OBJECT = 64
+
+    def __init__(self, get_aabbs):
+        self.get_aabbs = get_aabbs  # [obj] -> [[[min], [max]] or None when an object has no extent]
+        self.cell_size = 1.0
+        self.boxes = {}
+        self.cells = collections.defaultdict(set)
+        self.object_cells = {}
+        self.oversized = set()
+        self.known = set()  # Every object seen, including ones without a box
+        self.dirty = set()
+        self.needs_rebuild = True
+        self.scene_name = None
+
+    def on_depsgraph_update(self, depsgraph):
+        """Remember which objects moved or changed shape; the work happens on the next query"""
+        for update in depsgraph.updates:
+            if isinstance(update.id, bpy.types.Object) and (update.is_updated_transform or update.is_updated_geometry):
+                self.dirty.add(update.id.original.name)
+
+    def invalidate(self):
+        self.needs_rebuild = True
+
+    def refresh(self):
+        """Bring the index up to date with the scene"""
+        scene = bpy.context.scene
+        if self.needs_rebuild or scene.name != self.scene_name:
+            self.rebuild()
+            return
+
+        changed = []
+        for name in self.dirty:
+            self._remove(name)
+            obj = scene.objects.get(name)
+            if obj is not None:
+                changed.append(obj)
+        self.dirty.clear()
+        self._insert(changed)
+
+        # Deletions don't show up as updates
+        if len(self.known) != len(scene.objects):
+            self.resync()
+
+    def resync(self):
+        """Compare the indexed names with the scene's; a rename is the old name going away and the new one appearing"""
+        objects = bpy.context.scene.objects
+        names = set(objects.keys())
+        for name in self.known - names:
+            self._remove(name)
+        self._insert([objects[name] for name in names - self.known])
+
+    def is_current(self, names):
+        """Whether every name still belongs to a scene object - renames don't show up as updates"""
+        objects = bpy.context.scene.objects
+        return all(name in objects for name in names)
+
+    def _insert(self, objects):
+        for obj, box in zip(objects, self.get_aabbs(objects)):
+            self.known.add(obj.name)
+            if box is not None:
+                self._add_box(obj.name, box)
+
+    def rebuild(self):
+        scene = bpy.context.scene
+        objects = list(scene.objects)
+        boxes = {obj.name: box for obj, box in zip(objects, self.get_aabbs(objects)) if box is not None}
+
+        # Cells about as large as a typical object keep both lookups and inserts cheap
+        extents = sorted(max(high - low for low, high in zip(*box)) for box in boxes.values())
+        self.cell_size = max(extents[len(extents) // 2], 0.1) if extents else 1.0
+
+        self.boxes = {}
+        self.cells = collections.defaultdict(set)
+        self.object_cells = {}
+        self.oversized = set()
+        self.known = {obj.name for obj in objects}
+        for name, box in boxes.items():
+            self._add_box(name, box)
+        self.dirty.clear()
+        self.needs_rebuild = False
+        self.scene_name = scene.name
+
+    def _cell_range(self, box_min, box_max):
+        low = [math.floor(value / self.cell_size) for value in box_min]
+        high = [math.floor(value / self.cell_size) for value in box_max]
+        return low, high
+
+    def _add_box(self, name, box):
+        self.boxes[name] = box
+        low, high = self._cell_range(*box)
+        count = (high[0] - low[0] + 1) * (high[1] - low[1] + 1) * (high[2] - low[2] + 1)
+        if count > self.MAX_CELLS_PER_OBJECT:
+            self.oversized.add(name)
+            return
+        keys = [
+            (i, j, k)
+            for i in range(low[0], high[0] + 1)
+            for j in range(low[1], high[1] + 1)
+            for k in range(low[2], high[2] + 1)
+        ]
+        for key in keys:
+            self.cells[key].add(name)
+        self.object_cells[name] = keys
+
+    def _remove(self, name):
+        self.known.discard(name)
+        self.boxes.pop(name, None)
+        self.oversized.discard(name)
+        for key in self.object_cells.pop(name, ()):
+            cell = self.cells[key]
+            cell.discard(name)
+            if not cell:
+                del self.cells[key]
+
+    @staticmethod
+    def _overlaps(a, b, margin=0.0):
+        # Touching boxes (an object resting on the ground) don't count as overlapping
+        return all(a[0][axis] < b[1][axis] + margin and a[1][axis] + margin > b[0][axis] for axis in range(3))
+
+    @staticmethod
+    def _distance(box, point):
+        """Distance from a point to a box, 0 when inside"""
+        return math.sqrt(sum(max(box[0][axis] - point[axis], 0.0, point[axis] - box[1][axis]) ** 2 for axis in range(3)))
+
+    def _candidates(self, box_min, box_max):
+        low, high = self._cell_range(box_min, box_max)
+        count = (high[0] - low[0] + 1) * (high[1] - low[1] + 1) * (high[2] - low[2] + 1)
+        if count > len(self.cells):
+            # Region larger than the populated grid - walking the cells is cheaper
+            names = set()
+            for key, cell in self.cells.items():
+                if all(low[axis] <= key[axis] <= high[axis] for axis in range(3)):
+                    names |= cell
+        else:
+            names = set()
+            for i in range(low[0], high[0] + 1):
+                for j in range(low[1], high[1] + 1):
+                    for k in range(low[2], high[2] + 1):
+                        cell = self.cells.get((i, j, k))
+                        if cell:
+                            names |= cell
+        return names | self.oversized
+
+    def query(self, box_min, box_max, margin=0.0, ignore=()):
+        """Names of the objects whose boxes intersect the region"""
+        region = [list(box_min), list(box_max)]
+        grown_min = [value - margin for value in box_min]
+        grown_max = [value + margin for value in box_max]
+        return sorted(
+            name for name in self._candidates(grown_min, grown_max)
+            if name not in ignore and self._overlaps(self.boxes[name], region, margin)
+        )
+
+    def overlapping_pairs(self, margin=0.0, ignore=()):
+        """All pairs of objects whose boxes intersect"""
+        pairs = set()
+
+        def check(first, second):
+            if first > second:
+                first, second = second, first
+            if (first, second) not in pairs and self._overlaps(self.boxes[first], self.boxes[second], margin):
+                pairs.add((first, second))
+
+        for cell in self.cells.values():
+            members = [name for name in cell if name not in ignore]
+            for index, first in enumerate(members):
+                for second in members[index + 1:]:
+                    check(first, second)
+        for first in self.oversized:
+            if first in ignore:
+                continue
+            for second in self.boxes:
+                if second != first and second not in ignore:
+                    check(first, second)
+        return sorted(pairs)
+
+    @staticmethod
+    def _shell(center, ring):
+        """The cells exactly `ring` cells from the center, one face of the cube at a time"""
+        ci, cj, ck = center
+        if ring == 0:
+            yield (ci, cj, ck)
+            return
+        span = range(-ring, ring + 1)
+        inner = range(-ring + 1, ring)
+        for side in (-ring, ring):
+            for a in span:
+                for b in span:
+                    yield (ci + side, cj + a, ck + b)
+            for a in inner:
+                for b in span:
+                    yield (ci + a, cj + side, ck + b)
+            for a in inner:
+                for b in inner:
+                    yield (ci + a, cj + b, ck + side)
+
+    def nearest(self, point, count=5, max_distance=None, ignore=()):
+        """The count objects closest to a point.
+
+        Searches outward shell by shell while the shells are small; once a shell
+        would hold more cells than are populated, the remaining populated cells
+        are ranked by distance instead.
+        """
+        center = [math.floor(value / self.cell_size) for value in point]
+        found = {}
+        best = []  # Negated distances of the `count` closest objects so far (a max-heap)
+
+        def consider(name):
+            if name in ignore or name in found:
+                return
+            distance = found[name] = self._distance(self.boxes[name], point)
+            if len(best) < count:
+                heapq.heappush(best, -distance)
+            elif distance < -best[0]:
+                heapq.heapreplace(best, -distance)
+
+        def done(reach):
+            # Anything not seen yet is at least `reach` away
+            return (len(best) >= count and -best[0] <= reach) or (max_distance is not None and reach > max_distance)
+
+        for name in self.oversized:
+            consider(name)
+
+        ring = 0
+        while (2 * ring + 1) ** 3 <= len(self.cells):
+            for key in self._shell(center, ring):
+                for name in self.cells.get(key, ()):
+                    consider(name)
+            if done(ring * self.cell_size):
+                break
+            ring += 1
+        else:
+            size = self.cell_size
+
+            def gap(index, value):
+                low = index * size
+                return low - value if value < low else max(value - low - size, 0.0)
+
+            # Cells already visited come back too, but their objects are skipped
+            px, py, pz = point
+            bounds = [(math.hypot(gap(i, px), gap(j, py), gap(k, pz)), (i, j, k)) for i, j, k in self.cells]
+            heapq.heapify(bounds)
+            while bounds:
+                bound, key = heapq.heappop(bounds)
+                if done(bound):
+                    break
+                for name in self.cells[key]:
+                    consider(name)
+
+        ranked = sorted(found.items(), key=lambda item: item[1])
+        if max_distance is not None:
+            ranked = [item for item in ranked if item[1] <= max_distance]
+        return ranked[:count]
+
+class _GeometryCache:
+    """Template meshes shared between objects built from the same primitive parameters or asset.
+
+    Entries only hold datablock names; the mesh is tagged with its key so a
+    renamed or replaced mesh is never handed out by mistake.
+    """
+    TAG = "blendermcp_template"
+
+    def __init__(self):
+        self.entries = {}  # key -> (mesh name, matrix_basis of the original object or None)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return (mesh, matrix) for a cached template, or (None, None)"""
+        entry = self.entries.get(key)
+        if entry:
+            mesh = bpy.data.meshes.get(entry[0])
+            if mesh is not None and mesh.get(self.TAG) == key:
+                self.hits += 1
+                return mesh, entry[1]
+            del self.entries[key]
+        self.misses += 1
+        return None, None
+
+    def put(self, key, mesh, matrix=None):
+        mesh[self.TAG] = key
+        self.entries[key] = (mesh.name, [list(row) for row in matrix] if matrix is not None else None)
+
+    def release(self, mesh):
+        """Stop handing out a mesh, e.g. before it is edited in place"""
+        key = mesh.get(self.TAG)
+        if key is not None:
+            del mesh[self.TAG]
+            self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+class _TextureRegistry:
+    """Downloaded texture sets by texture_id, so applying one doesn't scan bpy.data.images"""
+    TEMPLATE_TAG = "blendermcp_texture_template"
+
+    def __init__(self):
+        # texture_id -> {"maps": {map type: image name}, "resolution": "1k" or None when unknown,
+        #                "prepared": bool, "template": material name}
+        self.entries = {}
+
+    @staticmethod
+    def map_type(image_name):
+        """Map type from an image name like "<texture_id>_<map>.<ext>" ("nor_gl" gives "gl")"""
+        return image_name.split('_')[-1].split('.')[0]
+
+    def register(self, texture_id, images, resolution=None):
+        self.entries[texture_id] = {
+            "maps": {self.map_type(image.name): image.name for image in images},
+            "resolution": resolution,
+            "prepared": False,
+            "template": None,
+        }
+        return self.entries[texture_id]
+
+    def lookup(self, texture_id):
+        """Return (entry, {map type: image}), rebuilding a missing or stale entry with one scan"""
+        entry = self.entries.get(texture_id)
+        if entry:
+            images = {map_type: bpy.data.images.get(name) for map_type, name in entry["maps"].items()}
+            if all(image is not None for image in images.values()):
+                return entry, images
+        # Downloaded in an earlier session or by other means
+        prefix = texture_id + "_"
+        found = [image for image in bpy.data.images if image.name.startswith(prefix)]
+        if not found:
+            self.entries.pop(texture_id, None)
+            return None, {}
+        entry = self.register(texture_id, found)
+        return entry, {self.map_type(image.name): image for image in found}
+
+    def template(self, entry, texture_id):
+        """The cached material node setup for a texture, if it still exists"""
+        mat = bpy.data.materials.get(entry["template"]) if entry["template"] else None
+        if mat is not None and mat.get(self.TEMPLATE_TAG) == texture_id:
+            return mat
+        return None
+
+    def set_template(self, entry, texture_id, mat):
+        mat[self.TEMPLATE_TAG] = texture_id
+        entry["template"] = mat.name
+
+    def clear(self):
+        self.entries.clear()
+
+class _ExecutionTimeout:
+    """Raise TimeoutError in the calling thread if the block runs longer than `seconds`.
+
+    The exception is delivered asynchronously, so it interrupts Python code
+    but not a single long-running C call (such as one bpy.ops operator).
+    """
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.thread_id = None
+        self.timer = None
+        self.active = False
+        self.fired = False
+        self.lock = threading.Lock()
+
+    def _fire(self):
+        with self.lock:
+            if self.active:
+                self.fired = True
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self.thread_id), ctypes.py_object(TimeoutError))
+
+    def __enter__(self):
+        if self.seconds:
+            self.thread_id = threading.get_ident()
+            self.active = True
+            self.timer = threading.Timer(self.seconds, self._fire)
+            self.timer.daemon = True
+            self.timer.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if self.timer:
+            with self.lock:
+                self.active = False
+                if self.fired:
+                    # Drop the exception in case it hasn't landed yet (the code finished or raised first)
+                    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self.thread_id), None)
+            self.timer.cancel()
+        return False
+
+class _ThreadOutput:
+    """Stand-in for sys.stdout/sys.stderr that sends a capturing thread's writes to its buffer.
+
+    contextlib.redirect_stdout swaps the stream for the whole process, so the
+    server thread's log lines would end up in the agent's output.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffers = {}  # thread id -> StringIO
+
+    def write(self, text):
+        return self.buffers.get(threading.get_ident(), self.stream).write(text)
+
+    def flush(self):
+        self.buffers.get(threading.get_ident(), self.stream).flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    @classmethod
+    @contextlib.contextmanager
+    def capture(cls, stdout, stderr):
+        """Collect what the current thread prints while the block runs"""
+        thread_id = threading.get_ident()
+        for name, buffer in (("stdout", stdout), ("stderr", stderr)):
+            stream = getattr(sys, name)
+            if not isinstance(stream, cls):
+                stream = cls(stream)
+                setattr(sys, name, stream)
+            stream.buffers[thread_id] = buffer
+        try:
+            yield
+        finally:
+            wrappers = [(name, getattr(sys, name)) for name in ("stdout", "stderr")]
+            wrappers = [(name, stream) for name, stream in wrappers if isinstance(stream, cls)]
+            # Put both real streams back before touching the buffers, so nothing is left half restored
+            for name, stream in wrappers:
+                if set(stream.buffers) <= {thread_id}:
+                    setattr(sys, name, stream.stream)
+            for name, stream in wrappers:
+                stream.buffers.pop(thread_id, None)
+
+class _CodeExecutor:
+    """Runs agent code with a compiled-code cache, named persistent sessions and captured output"""
+    CACHE_SIZE = 256
+    MAX_OUTPUT = 100000  # Characters of stdout/stderr returned per call
+
+    def __init__(self):
+        self.cache = collections.OrderedDict()  # sha256 of the source -> (body, expression)
+        self.sessions = {}
+
+    @staticmethod
+    def _new_namespace():
+        return {"bpy": bpy, "__name__": "__blender_mcp__"}
+
+    def _compile(self, code):
+        """Compile code once per distinct source; a trailing expression becomes the return value"""
+        key = hashlib.sha256(code.encode('utf-8')).hexdigest()
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.cache.move_to_end(key)
+            return entry, True
+
+        tree = ast.parse(code, filename="<blender_mcp>", mode="exec")
+        expression = None
+        if tree.body and isinstance(tree.body[-1], ast.Expr):
+            expression = compile(ast.Expression(tree.body.pop().value), "<blender_mcp>", "eval")
+        body = compile(tree, "<blender_mcp>", "exec")
+
+        entry = (body, expression)
+        self.cache[key] = entry
+        if len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return entry, False
+
+    def reset(self, session):
+        self.sessions.pop(session, None)
+
+    @classmethod
+    def _truncate(cls, text):
+        if len(text) > cls.MAX_OUTPUT:
+            return text[:cls.MAX_OUTPUT] + f"\n... [{len(text) - cls.MAX_OUTPUT} more characters truncated]"
+        return text
+
+    @staticmethod
+    def _result_value(value):
+        """Return JSON-compatible values as they are, anything else as its repr"""
+        try:
+            json.dumps(value)
+            return value
+        except (TypeError, ValueError):
+            return repr(value)
+
+    def run(self, code, session=None, timeout=None):
+        if session:
+            namespace = self.sessions.setdefault(session, self._new_namespace())
+        else:
+            namespace = self._new_namespace()
+
+        (body, expression), cached = self._compile(code)
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        start = time.perf_counter()
+        limit = _ExecutionTimeout(timeout)
+        try:
+            # The timer is cancelled before the streams are restored, so it can't interrupt that
+            with _ThreadOutput.capture(stdout, stderr), limit:
+                exec(body, namespace)
+                value = eval(expression, namespace) if expression is not None else None
+        except Exception as e:
+            # A TimeoutError raised by the code itself is an ordinary error
+            if limit.fired and isinstance(e, TimeoutError):
+                raise TimeoutError(f"Code execution timed out after {timeout}s" + self._output_suffix(stdout, stderr))
+            raise Exception(f"{type(e).__name__}: {str(e)}" + self._output_suffix(stdout, stderr))
+
+        if expression is not None:
+            namespace["_"] = value
+        return {
+            "executed": True,
+            "result": self._result_value(value),
+            "stdout": self._truncate(stdout.getvalue()),
+            "stderr": self._truncate(stderr.getvalue()),
+            "session": session,
+            "cached": cached,
+            "duration": time.perf_counter() - start,
+        }
+
+    @classmethod
+    def _output_suffix(cls, stdout, stderr):
+        output = stdout.getvalue() + stderr.getvalue()
+        return f"\nOutput before the error:\n{cls._truncate(output)}" if output else ""
+
+class _Transaction:
+    """Scene snapshot taken by begin_transaction so a failed batch can be discarded in one step.
+
+    New datablocks are found by diffing bpy.data against the names present
+    at the start. Object transforms, visibility, parenting and material
+    slots are recorded up front; meshes and materials that already existed
+    are copied the first time a handler edits them. Deleted objects are only
+    unlinked until commit. Changes made through execute_code outside of
+    these paths are not tracked.
+    """
+    TRACKED_DATA = ("objects", "meshes", "materials", "images", "textures", "node_groups", "collections",
+                    "curves", "lights", "cameras", "worlds")
+
+    def __init__(self, name, owner=None, rollback_on_error=True):
+        self.name = name
+        self.owner = owner
+        self.rollback_on_error = rollback_on_error
+        self.started = time.time()
+        self.command_count = 0
+        self.existing = {attr: {block.name for block in getattr(bpy.data, attr)} for attr in self.TRACKED_DATA}
+        self.objects = [self._object_state(obj) for obj in bpy.data.objects]
+        self.data_materials = {}
+        for obj in bpy.data.objects:
+            data = obj.data
+            if data is not None and hasattr(data, "materials") and data.as_pointer() not in self.data_materials:
+                self.data_materials[data.as_pointer()] = (data, list(data.materials))
+        self.backups = {}  # pointer of an edited datablock -> (datablock, untouched copy, original name)
+        self.deleted = []  # (object, collections it was linked to)
+
+    @staticmethod
+    def _object_state(obj):
+        return {
+            "object": obj,
+            "name": obj.name,
+            "location": tuple(obj.location),
+            "rotation_mode": obj.rotation_mode,
+            "rotation_euler": tuple(obj.rotation_euler),
+            "rotation_quaternion": tuple(obj.rotation_quaternion),
+            "scale": tuple(obj.scale),
+            "hide_viewport": obj.hide_viewport,
+            "hide_render": obj.hide_render,
+            "parent": obj.parent,
+            "data": obj.data,
+            "slots": [(slot.link, slot.material) for slot in obj.material_slots],
+        }
+
+    def touch(self, block):
+        """Back up a pre-existing mesh or material before a handler edits it in place"""
+        pointer = block.as_pointer()
+        if pointer in self.backups:
+            return
+        if isinstance(block, bpy.types.Mesh):
+            existed = block.name in self.existing["meshes"]
+        elif isinstance(block, bpy.types.Material):
+            existed = block.name in self.existing["materials"]
+        else:
+            return
+        if existed:
+            self.backups[pointer] = (block, block.copy(), block.name)
+
+    def delete_object(self, obj):
+        """Unlink instead of removing, so rollback can bring the object back"""
+        linked_to = list(obj.users_collection)
+        for collection in linked_to:
+            collection.objects.unlink(obj)
+        self.deleted.append((obj, linked_to))
+
+    def commit(self):
+        removed = [obj for obj, _ in self.deleted] + [backup for _, backup, _ in self.backups.values()]
+        if removed:
+            bpy.data.batch_remove(removed)
+        try:
+            # One undo step for the whole transaction
+            bpy.ops.ed.undo_push(message=f"MCP: {self.name}")
+        except Exception:
+            pass
+
+    def rollback(self):
+        for obj, linked_to in self.deleted:
+            for collection in linked_to:
+                if obj.name not in collection.objects:
+                    collection.objects.link(obj)
+
+        # Swap edited meshes and materials for their untouched copies
+        edited = []
+        for block, backup, name in self.backups.values():
+            block.user_remap(backup)
+            edited.append(block)
+        if edited:
+            bpy.data.batch_remove(edited)
+        for block, backup, name in self.backups.values():
+            backup.name = name
+
+        for data, materials in self.data_materials.values():
+            try:
+                if list(data.materials) != materials:
+                    data.materials.clear()
+                    for material in materials:
+                        data.materials.append(material)
+            except ReferenceError:
+                continue
+
+        for state in self.objects:
+            obj = state["object"]
+            try:
+                obj.name = state["name"]
+                obj.data = state["data"]
+                obj.parent = state["parent"]
+                obj.location = state["location"]
+                obj.rotation_mode = state["rotation_mode"]
+                obj.rotation_euler = state["rotation_euler"]
+                obj.rotation_quaternion = state["rotation_quaternion"]
+                obj.scale = state["scale"]
+                obj.hide_viewport = state["hide_viewport"]
+                obj.hide_render = state["hide_render"]
+                for slot, (link, material) in zip(obj.material_slots, state["slots"]):
+                    slot.link = link
+                    slot.material = material
+            except (ReferenceError, RuntimeError, TypeError):
+                # Removed behind our back (e.g. by execute_code) - nothing to restore
+                continue
+
+        # Everything created since begin goes in one batch
+        new_blocks = []
+        backups = {backup.as_pointer() for _, backup, _ in self.backups.values()}
+        for attr in self.TRACKED_DATA:
+            existing = self.existing[attr]
+            new_blocks.extend(
+                block for block in getattr(bpy.data, attr)
+                if block.name not in existing and block.as_pointer() not in backups
+            )
+        if new_blocks:
+            bpy.data.batch_remove(new_blocks)
+        return len(new_blocks)
+
+class _LatencyHistogram:
+    """Latency histogram with exponential buckets, from 10 microseconds up to ~10 minutes"""
+    BOUNDS = [1e-5 * 2 ** k for k in range(26)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)  # Last bucket is everything above the largest bound
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        index = 0
+        while index < len(self.BOUNDS) and seconds > self.BOUNDS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        """Estimate a percentile by interpolating inside the bucket that holds it"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.BOUNDS[index - 1] if index else 0.0
+                upper = self.BOUNDS[index] if index < len(self.BOUNDS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+class _Metrics:
+    """Per-command latency histograms for each phase of a request.
+
+    recv: first byte of a command until it is fully parsed
+    queue: parsed until the main thread starts it
+    handler: execute_command
+    serialize: encoding the response
+    """
+    PHASES = ("recv", "queue", "handler", "serialize")
+
+    def __init__(self):
+        self.histograms = {}  # (command type, phase) -> _LatencyHistogram
+        self.errors = collections.Counter()
+        self.expired = collections.Counter()  # Commands skipped because their deadline had passed
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, command_type, phase, seconds):
+        with self._lock:
+            histogram = self.histograms.get((command_type, phase))
+            if histogram is None:
+                histogram = self.histograms[(command_type, phase)] = _LatencyHistogram()
+            histogram.add(seconds)
+
+    def record_error(self, command_type):
+        with self._lock:
+            self.errors[command_type] += 1
+
+    def record_expired(self, command_type):
+        with self._lock:
+            self.expired[command_type] += 1
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.errors.clear()
+            self.expired.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            commands = {}
+            for (command_type, phase), histogram in sorted(self.histograms.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+                commands.setdefault(command_type, {})[phase] = histogram.summary()
+            for command_type, count in self.errors.items():
+                commands.setdefault(command_type, {})["errors"] = count
+            for command_type, count in self.expired.items():
+                commands.setdefault(command_type, {})["expired"] = count
+            return {"since": self.started, "commands": commands}
+
+    def prometheus(self):
+        """Render the histograms in the Prometheus text exposition format"""
+        lines = [
+            "# HELP blendermcp_command_phase_seconds Time spent in each phase of a command",
+            "# TYPE blendermcp_command_phase_seconds histogram",
+        ]
+        with self._lock:
+            for (command_type, phase), histogram in sorted(self.histograms.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+                labels = f'command="{command_type}",phase="{phase}"'
+                cumulative = 0
+                for bound, count in zip(histogram.BOUNDS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'blendermcp_command_phase_seconds_bucket{{{labels},le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'blendermcp_command_phase_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"blendermcp_command_phase_seconds_sum{{{labels}}} {histogram.total:.9f}")
+                lines.append(f"blendermcp_command_phase_seconds_count{{{labels}}} {histogram.count}")
+            lines.append("# HELP blendermcp_command_errors_total Commands that returned an error")
+            lines.append("# TYPE blendermcp_command_errors_total counter")
+            for command_type, count in sorted(self.errors.items(), key=lambda item: str(item[0])):
+                lines.append(f'blendermcp_command_errors_total{{command="{command_type}"}} {count}')
+            lines.append("# HELP blendermcp_command_expired_total Commands skipped because the client's deadline had passed")
+            lines.append("# TYPE blendermcp_command_expired_total counter")
+            for command_type, count in sorted(self.expired.items(), key=lambda item: str(item[0])):
+                lines.append(f'blendermcp_command_expired_total{{command="{command_type}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+class _Profiler:
+    """On-demand profiling of command handlers.
+
+    "cprofile" mode runs handlers under cProfile (exact, higher overhead);
+    "sampling" mode has a background thread record the main thread's stack
+    every `interval` seconds while a handler runs.
+    """
+    CONTROL_COMMANDS = ("start_profiling", "stop_profiling")
+    SORT_KEYS = {"cumulative": "cumulative", "self": "tottime", "calls": "calls"}
+
+    def __init__(self):
+        self.mode = None
+        self.commands = None  # Only profile these command types, or all when None
+        self.started = None
+        self.handled = collections.Counter()
+        self.profile = None
+        self.interval = 0.005
+        self.samples = collections.Counter()  # Stack (tuple of frames, outermost first) -> count
+        # Seconds per stack: the sampler can't wake up on time while the handler holds the GIL,
+        # so each sample is weighted with the time since the previous one
+        self.sample_time = collections.Counter()
+        self._sampled_thread = None
+        self._sampler = None
+        self._stop = threading.Event()
+        self._depth = 0  # Handlers running inside another profiled handler (execute_batch) nest
+
+    @property
+    def active(self):
+        return self.mode is not None
+
+    def start(self, mode="cprofile", commands=None, interval=0.005):
+        if self.active:
+            raise ValueError(f"Profiling is already running ({self.mode})")
+        if mode not in ("cprofile", "sampling"):
+            raise ValueError(f"Unknown profiling mode: {mode}. Must be cprofile or sampling")
+        self.mode = mode
+        self.commands = set(commands) if commands else None
+        self.started = time.time()
+        self.handled.clear()
+        self.samples.clear()
+        self.sample_time.clear()
+        if mode == "cprofile":
+            self.profile = cProfile.Profile()
+        else:
+            self.interval = max(float(interval), 0.0005)
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+            self._sampler.start()
+
+    @contextlib.contextmanager
+    def run(self, command_type):
+        """Profile a handler call if profiling is on and the command is selected"""
+        if (not self.active or command_type in self.CONTROL_COMMANDS
+                or (self.commands is not None and command_type not in self.commands)):
+            yield
+            return
+        self.handled[command_type] += 1
+        if self._depth:
+            # Already profiled by the enclosing handler; switching off here would end it early
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+            return
+        profile = self.profile
+        if profile is not None:
+            profile.enable()
+        else:
+            self._sampled_thread = threading.get_ident()
+        self._depth = 1
+        try:
+            yield
+        finally:
+            self._depth = 0
+            if profile is not None:
+                profile.disable()
+            else:
+                self._sampled_thread = None
+
+    def _sample_loop(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            thread_id = self._sampled_thread
+            if thread_id is None:
+                continue
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if stack:
+                stack = tuple(reversed(stack))
+                self.samples[stack] += 1
+                self.sample_time[stack] += min(elapsed, 10 * self.interval)
+
+    def stop(self, top=30, sort="cumulative", save_path=None):
+        """Stop profiling and return the top functions, optionally saving the raw data"""
+        if not self.active:
+            raise ValueError("Profiling is not running")
+        if sort not in self.SORT_KEYS:
+            raise ValueError(f"Unknown sort: {sort}. Must be cumulative, self or calls")
+        try:
+            if self.mode == "cprofile":
+                result = self._cprofile_result(top, sort, save_path)
+            else:
+                self._stop.set()
+                self._sampler.join(timeout=1.0)
+                result = self._sampling_result(top, sort, save_path)
+        finally:
+            self._sampler = None
+            self.mode = None
+            self.profile = None
+            self.commands = None
+        return result
+
+    def _summary(self):
+        return {
+            "mode": self.mode,
+            "duration": time.time() - self.started,
+            "commands": dict(self.handled),
+        }
+
+    def _cprofile_result(self, top, sort, save_path):
+        result = self._summary()
+        self.profile.create_stats()
+        if not self.profile.stats:
+            # No selected command ran - pstats refuses an empty profile, so there is nothing to save
+            result.update(total_time=0.0, functions=[])
+            return result
+        stats = pstats.Stats(self.profile)
+        stats.sort_stats(self.SORT_KEYS[sort])
+        functions = []
+        for (filename, line, name) in stats.fcn_list[:top]:
+            calls, primitive_calls, self_time, cumulative_time, _ = stats.stats[(filename, line, name)]
+            functions.append({
+                "function": f"{name} ({os.path.basename(filename)}:{line})",
+                "calls": calls,
+                "self_time": self_time,
+                "cumulative_time": cumulative_time,
+            })
+        result["total_time"] = stats.total_tt
+        result["functions"] = functions
+        if save_path:
+            stats.dump_stats(save_path)
+            result["path"] = save_path
+        return result
+
+    def _sampling_result(self, top, sort, save_path):
+        result = self._summary()
+        self_times = collections.Counter()
+        cumulative_times = collections.Counter()
+        cumulative_counts = collections.Counter()
+        for stack, seconds in self.sample_time.items():
+            self_times[stack[-1]] += seconds
+            for frame in set(stack):
+                cumulative_times[frame] += seconds
+                cumulative_counts[frame] += self.samples[stack]
+        # Sampling can't count calls; the number of samples a function shows up in stands in for it
+        order = {"cumulative": cumulative_times, "self": self_times, "calls": cumulative_counts}[sort]
+        functions = [
+            {
+                "function": f"{name} ({os.path.basename(filename)}:{line})",
+                "self_time": self_times[(filename, line, name)],
+                "cumulative_time": cumulative_times[(filename, line, name)],
+                "samples": cumulative_counts[(filename, line, name)],
+            }
+            for (filename, line, name), _ in order.most_common(top)
+        ]
+        result["samples"] = sum(self.samples.values())
+        result["interval"] = self.interval
+        if save_path:
+            # Collapsed stacks weighted in microseconds, as read by flamegraph.pl and speedscope
+            with open(save_path, "w") as f:
+                for stack, seconds in self.sample_time.items():
+                    f.write(";".join(f"{name} ({os.path.basename(filename)}:{line})"
+                                     for filename, line, name in stack) + f" {int(seconds * 1e6)}\n")
+            result["path"] = save_path
+        result["functions"] = functions
+        return result
+
+class _ClientConnection:
+    """State kept by the server for one connected client"""
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.buffer = bytearray()
+        self.framed = None  # Decided by the first byte: framed protocol or bare JSON
+        self.frame_header = None  # Header of a frame whose attachments are still arriving
+        self.frame_flags = 0
+        self.inflater = None  # Decompresses a compressed frame that is still arriving
+        self.attachment_buffer = None
+        self.attachment_received = 0
+        self.pending = collections.deque()  # (command, recv seconds, parsed at) waiting for the main thread
+        self.recv_started = None  # When the first bytes of the command being received arrived
+        self.outbox = collections.deque()   # Encoded responses waiting to be written
+        self.closed = False
+        # Shared-memory rings negotiated with "hello": the client writes rx_ring, we write tx_ring
+        self.rx_ring = None
+        self.tx_ring = None
+        self.codec = "json"  # Header codec for responses, negotiated with "hello"
+        self.compression = None
+        self.compress_threshold = COMPRESSION_THRESHOLD
+
+class BlenderMCPServer:
+    def __init__(self, host='localhost', port=9876, backlog=5, max_clients=8, socket_path=None):
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.max_clients = max_clients
+        # Optional Unix domain socket, served next to TCP for clients on the same machine
+        self.socket_path = socket_path or None
+        self.running = False
+        self.socket = None
+        self.unix_socket = None
+        self.server_thread = None
+        self.selector = None
+        self.clients = {}
+        # Clients with pending commands, served round-robin from the main thread
+        self._ready_clients = collections.deque()
+        self._queue_scheduled = False
+        self._lock = threading.Lock()
+        self._wakeup_recv = None
+        self._wakeup_send = None
+        self.spatial_index = _SpatialIndex(self._get_world_aabbs)
+        self.code_executor = _CodeExecutor()
+        self.geometry_cache = _GeometryCache()
+        self.metrics = _Metrics()
+        self.profiler = _Profiler()
+        self.texture_registry = _TextureRegistry()
+        self.transaction = None
+        self._current_client = None
+        self._deadline = None  # perf_counter deadline of the running command, if the client sent one
+
+    def start(self):
+        if self.running:
+            print("Server is already running")
+            return
+
+        self.running = True
+
+        try:
+            # Create socket
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.socket.bind((self.host, self.port))
+            self.socket.listen(self.backlog)
+            self.socket.setblocking(False)
+
+            # The wakeup pair lets the main thread interrupt select() when responses are ready
+            self._wakeup_recv, self._wakeup_send = socket.socketpair()
+            self._wakeup_recv.setblocking(False)
+            self._wakeup_send.setblocking(False)
+
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(self.socket, selectors.EVENT_READ, data=None)
+            self.selector.register(self._wakeup_recv, selectors.EVENT_READ, data="wakeup")
+
+            if self.socket_path:
+                if hasattr(socket, "AF_UNIX"):
+                    self._listen_unix()
+                else:
+                    print("Unix domain sockets are not available on this platform, serving TCP only")
+
+            # Start server thread
+            self.server_thread = threading.Thread(target=self._server_loop)
+            self.server_thread.daemon = True
+            self.server_thread.start()
+
+            where = f"{self.host}:{self.port}"
+            if self.unix_socket:
+                where += f" and {self.socket_path}"
+            print(f"BlenderMCP server started on {where} (max {self.max_clients} clients)")
+        except Exception as e:
+            print(f"Failed to start server: {str(e)}")
+            self.stop()
+
+    def _listen_unix(self):
+        """Listen on the Unix domain socket, replacing a stale socket file left by a crash"""
+        try:
+            mode = os.lstat(self.socket_path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            # Only ever remove a leftover socket, never a file the path happens to point at
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError(f"Socket path {self.socket_path} exists and is not a socket")
+            os.unlink(self.socket_path)
+        self.unix_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.unix_socket.bind(self.socket_path)
+        self.unix_socket.listen(self.backlog)
+        self.unix_socket.setblocking(False)
+        self.selector.register(self.unix_socket, selectors.EVENT_READ, data=None)
+
+    def stop(self):
+        self.running = False
+        self._wakeup()
+
+        # Wait for thread to finish
+        if self.server_thread:
+            try:
+                if self.server_thread.is_alive():
+                    self.server_thread.join(timeout=1.0)
+            except:
+                pass
+            self.server_thread = None
+
+        # Close client sockets that the server thread did not get to
+        for client in list(self.clients.values()):
+            self._close_client(client)
+
+        if self.selector:
+            try:
+                self.selector.close()
+            except:
+                pass
+            self.selector = None
+
+        # Close sockets
+        for sock in (self.socket, self.unix_socket, self._wakeup_recv, self._wakeup_send):
+            if sock:
+                try:
+                    sock.close()
+                except:
+                    pass
+        if self.unix_socket:
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+        self.socket = None
+        self.unix_socket = None
+        self._wakeup_recv = None
+        self._wakeup_send = None
+
+        print("BlenderMCP server stopped")
+
+    def _wakeup(self):
+        """Interrupt the selector so it picks up new responses or a stop request"""
+        if self._wakeup_send:
+            try:
+                self._wakeup_send.send(b'\0')
+            except (BlockingIOError, OSError):
+                pass
+
+    def _server_loop(self):
+        """Main server loop in a separate thread"""
+        print("Server thread started")
+
+        while self.running:
+            try:
+                events = self.selector.select(timeout=1.0)
+                for key, mask in events:
+                    if key.data is None:
+                        self._accept_client(key.fileobj)
+                    elif key.data == "wakeup":
+                        try:
+                            while self._wakeup_recv.recv(4096):
+                                pass
+                        except (BlockingIOError, OSError):
+                            pass
+                    else:
+                        client = key.data
+                        if mask & selectors.EVENT_READ:
+                            self._read_client(client)
+                        if mask & selectors.EVENT_WRITE and not client.closed:
+                            self._write_client(client)
+
+                # Start watching clients that have responses queued by the main thread
+                for client in list(self.clients.values()):
+                    if client.outbox and not client.closed:
+                        self._write_client(client)
+            except Exception as e:
+                print(f"Error in server loop: {str(e)}")
+                if not self.running:
+                    break
+                time.sleep(0.5)
+
+        for client in list(self.clients.values()):
+            self._close_client(client)
+        print("Server thread stopped")
+
+    def _accept_client(self, listener):
+        """Accept a pending connection, refusing it when the client limit is reached"""
+        try:
+            sock, address = listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        except Exception as e:
+            print(f"Error accepting connection: {str(e)}")
+            return
+
+        if len(self.clients) >= self.max_clients:
+            print(f"Refusing client {address}: limit of {self.max_clients} clients reached")
+            try:
+                sock.sendall(json.dumps({
+                    "status": "error",
+                    "message": f"Blender MCP server is busy ({self.max_clients} clients connected)"
+                }).encode('utf-8'))
+            except:
+                pass
+            sock.close()
+            return
+
+        # Unix domain socket clients have no address of their own
+        address = address or self.socket_path
+        print(f"Connected to client: {address}")
+        sock.setblocking(False)
+        client = _ClientConnection(sock, address)
+        self.clients[sock.fileno()] = client
+        self.selector.register(sock, selectors.EVENT_READ, data=client)
+
+    def _read_client(self, client):
+        """Read available data from a client and queue every complete command"""
+        try:
+            if client.attachment_buffer is not None:
+                # Attachments are received straight into their preallocated buffer
+                view = memoryview(client.attachment_buffer)[client.attachment_received:]
+                received = client.sock.recv_into(view)
+                data = None
+            elif client.inflater is not None:
+                # Compressed frames are decompressed chunk by chunk as they arrive
+                data = client.sock.recv(min(262144, client.inflater.remaining))
+                received = len(data)
+            else:
+                data = client.sock.recv(65536)
+                received = len(data)
+        except (BlockingIOError, InterruptedError):
+            return
+        except Exception as e:
+            print(f"Error receiving data: {str(e)}")
+            self._close_client(client)
+            return
+
+        if not received:
+            print("Client disconnected")
+            self._close_client(client)
+            return
+
+        received_at = time.perf_counter()
+        if client.recv_started is None:
+            client.recv_started = received_at
+        commands = []
+        try:
+            if client.inflater is not None:
+                if not client.inflater.feed(data):
+                    return
+                header, body = client.inflater.frame()
+                client.inflater = None
+                commands.append(_decode_frame(header, body, client.rx_ring, client.frame_flags))
+            elif data is None:
+                client.attachment_received += received
+                if client.attachment_received < len(client.attachment_buffer):
+                    return
+                commands.append(_decode_frame(client.frame_header, client.attachment_buffer, client.rx_ring,
+                                              client.frame_flags))
+                client.frame_header = None
+                client.attachment_buffer = None
+            else:
+                client.buffer += data
+                if client.framed is None:
+                    client.framed = client.buffer[:1] == FRAME_MAGIC[:1]
+
+            if client.framed:
+                commands.extend(self._parse_frames(client))
+            else:
+                commands.extend(self._parse_legacy_commands(client))
+        except Exception as e:
+            print(f"Invalid data from client {client.address}: {str(e)}")
+            self._close_client(client)
+            return
+
+        if commands and isinstance(commands[0], dict) and commands[0].get("type") == "hello":
+            # The handshake touches no Blender data, so it is answered here instead of
+            # waiting for the main thread
+            self._answer_hello(client, commands.pop(0))
+        if commands:
+            parsed_at = time.perf_counter()
+            recv_time = parsed_at - client.recv_started
+            self._enqueue_commands(client, [(command, recv_time, parsed_at) for command in commands])
+            # Leftover bytes belong to the next command, which started arriving with this read
+            receiving = client.buffer or client.attachment_buffer is not None or client.inflater is not None
+            client.recv_started = received_at if receiving else None
+
+    def _parse_frames(self, client):
+        """Split complete frames off the receive buffer"""
+        commands = []
+        buffer = client.buffer
+        while client.attachment_buffer is None and client.inflater is None and len(buffer) >= FRAME_PREFIX.size:
+            magic, version, flags, header_length, attachments_length = FRAME_PREFIX.unpack_from(buffer)
+            if magic != FRAME_MAGIC:
+                raise ValueError("Bad frame magic")
+            if flags & COMPRESSION_FLAGS:
+                start = FRAME_PREFIX.size + COMPRESSED_LENGTH.size
+                if len(buffer) < start:
+                    break
+                compressed_length = COMPRESSED_LENGTH.unpack_from(buffer, FRAME_PREFIX.size)[0]
+                inflater = _Inflater(flags, header_length, attachments_length, compressed_length)
+                available = min(len(buffer) - start, compressed_length)
+                done = inflater.feed(buffer[start:start + available])
+                del buffer[:start + available]
+                client.frame_flags = flags
+                if not done:
+                    # The rest is decompressed as it arrives
+                    client.inflater = inflater
+                    break
+                header, body = inflater.frame()
+                commands.append(_decode_frame(header, body, client.rx_ring, flags))
+                continue
+            header_end = FRAME_PREFIX.size + header_length
+            if len(buffer) < header_end:
+                break
+
+            header = bytes(buffer[FRAME_PREFIX.size:header_end])
+            body = bytearray(attachments_length)
+            available = min(len(buffer) - header_end, attachments_length)
+            body[:available] = buffer[header_end:header_end + available]
+            del buffer[:header_end + available]
+
+            if available < attachments_length:
+                # The rest of the attachments is read with recv_into
+                client.frame_header = header
+                client.frame_flags = flags
+                client.attachment_buffer = body
+                client.attachment_received = available
+                break
+            commands.append(_decode_frame(header, body, client.rx_ring, flags))
+        return commands
+
+    def _parse_legacy_commands(self, client):
+        """Split complete bare JSON commands off the receive buffer"""
+        commands = []
+        try:
+            text = client.buffer.decode('utf-8')
+        except UnicodeDecodeError:
+            # A multi-byte character is split across reads, wait for more
+            return commands
+
+        # A single read may hold several commands back to back
+        decoder = json.JSONDecoder()
+        position = 0
+        while True:
+            while position < len(text) and text[position].isspace():
+                position += 1
+            if position >= len(text):
+                break
+            try:
+                command, position = decoder.raw_decode(text, position)
+            except json.JSONDecodeError:
+                # Incomplete data, wait for more
+                break
+            commands.append(command)
+        client.buffer = bytearray(text[position:].encode('utf-8'))
+        return commands
+
+    def _enqueue_commands(self, client, commands):
+        """Hand commands to the main thread queue"""
+        with self._lock:
+            if not client.pending:
+                self._ready_clients.append(client)
+            client.pending.extend(commands)
+            schedule = not self._queue_scheduled
+            self._queue_scheduled = True
+
+        # Schedule execution in main thread
+        if schedule:
+            bpy.app.timers.register(self._process_command_queue, first_interval=0.0)
+
+    def _answer_hello(self, client, command):
+        """Answer the connection handshake from the server thread"""
+        try:
+            response = {"status": "success", "result": self.hello(client, **command.get("params", {}))}
+        except Exception as e:
+            response = {"status": "error", "message": str(e)}
+        if command.get("id") is not None:
+            response["id"] = command["id"]
+        self._send_response(client, self._encode_response(client, response))
+
+    def _process_command_queue(self):
+        """Timer callback: run one command per waiting client, round-robin"""
+        with self._lock:
+            batch = []
+            for _ in range(len(self._ready_clients)):
+                client = self._ready_clients.popleft()
+                if client.closed or not client.pending:
+                    continue
+                batch.append((client, client.pending.popleft()))
+                if client.pending:
+                    self._ready_clients.append(client)
+
+        for client, (command, recv_time, parsed_at) in batch:
+            self._current_client = client
+            command_type = command.get("type") if isinstance(command, dict) else None
+            request_id = command.get("id") if isinstance(command, dict) else None
+            self._deadline = self._command_deadline(command, recv_time, parsed_at)
+            started = time.perf_counter()
+            expired = self._deadline is not None and started >= self._deadline
+            try:
+                if expired:
+                    # The client has given up on this command; don't spend main-thread time on it
+                    response = {
+                        "status": "error",
+                        "message": f"Deadline exceeded: {command_type} waited {started - parsed_at + recv_time:.2f}s "
+                                   f"of its {command['timeout']}s budget and was not run",
+                    }
+                else:
+                    response = self.execute_command(command)
+                handled = time.perf_counter()
+                self._add_trace_spans(command, response, recv_time, parsed_at, started, handled)
+                if request_id is not None:
+                    response["id"] = request_id
+                buffers = self._encode_response(client, response)
+            except Exception as e:
+                print(f"Error executing command: {str(e)}")
+                traceback.print_exc()
+                response = {
+                    "status": "error",
+                    "message": str(e)
+                }
+                if request_id is not None:
+                    response["id"] = request_id
+                handled = time.perf_counter()
+                buffers = self._encode_response(client, response)
+            finished = time.perf_counter()
+            self._send_response(client, buffers)
+
+            metrics = self.metrics
+            metrics.record(command_type, "recv", recv_time)
+            metrics.record(command_type, "queue", started - parsed_at)
+            if expired:
+                metrics.record_expired(command_type)
+            else:
+                metrics.record(command_type, "handler", handled - started)
+                metrics.record(command_type, "serialize", finished - handled)
+                if response.get("status") == "error":
+                    metrics.record_error(command_type)
+        self._current_client = None
+        self._deadline = None
+
+        with self._lock:
+            if self._ready_clients and self.running:
+                # Let Blender redraw between rounds, then continue
+                return 0.0
+            self._queue_scheduled = False
+        return None
+
+    @staticmethod
+    def _command_deadline(command, recv_time, parsed_at):
+        """perf_counter time after which the client no longer waits for a command, or None.
+
+        Clients send their timeout in seconds rather than a wall-clock time, so
+        the deadline is counted from when the command started arriving and does
+        not depend on the two clocks agreeing.
+        """
+        timeout = command.get("timeout") if isinstance(command, dict) else None
+        if not isinstance(timeout, (int, float)) or timeout <= 0:
+            return None
+        return parsed_at - recv_time + timeout
+
+    def _remaining_time(self):
+        """Seconds left before the running command's deadline, or None without one"""
+        if self._deadline is None:
+            return None
+        return max(self._deadline - time.perf_counter(), 0.0)
+
+    @staticmethod
+    def _add_trace_spans(command, response, recv_time, parsed_at, started, handled):
+        """Continue the client's trace: return receive, queue and handler spans with the response"""
+        trace = command.get("trace") if isinstance(command, dict) else None
+        if not trace:
+            return
+        # perf_counter values are turned into wall-clock microseconds, which the client also uses
+        offset = time.time() - time.perf_counter()
+        command_type = command.get("type")
+
+        def span(name, start, end, parent_id):
+            return {
+                "name": name,
+                "trace_id": trace["trace_id"],
+                "span_id": os.urandom(8).hex(),
+                "parent_id": parent_id,
+                "start_us": int((start + offset) * 1e6),
+                "duration_us": int((end - start) * 1e6),
+                "process": "blender",
+                "attributes": {},
+            }
+
+        root = span(f"blender:{command_type}", parsed_at - recv_time, handled, trace.get("parent_id"))
+        root["attributes"]["status"] = response.get("status")
+        spans = [
+            root,
+            span("recv", parsed_at - recv_time, parsed_at, root["span_id"]),
+            span("queue", parsed_at, started, root["span_id"]),
+            span(f"handler:{command_type}", started, handled, root["span_id"]),
+        ]
+        response["trace"] = {"spans": spans}
+
+    @staticmethod
+    def _encode_response(client, response):
+        """Encode a response in the protocol the client spoke"""
+        if client.framed:
+            buffers = _encode_frame(response, client.tx_ring, client.codec)
+            return _compress_frame(buffers, client.compression, client.compress_threshold)
+        return [memoryview(json.dumps(response, default=_legacy_json_default).encode('utf-8'))]
+
+    def _send_response(self, client, buffers):
+        """Queue encoded response buffers for the server thread to write"""
+        if client.closed:
+            print("Failed to send response - client disconnected")
             return
-            
-        self.running = True
-        
+        with self._lock:
+            client.outbox.extend(buffers)
+        self._wakeup()
+
+    def _write_client(self, client):
+        """Write as much queued response data as the socket accepts"""
         try:
-            # Create socket
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.socket.bind((self.host, self.port))
-            self.socket.listen(1)
-            
-            # Start server thread
-            self.server_thread = threading.Thread(target=self._server_loop)
-            self.server_thread.daemon = True
-            self.server_thread.start()
-            
-            print(f"BlenderMCP server started on {self.host}:{self.port}")
+            while True:
+                with self._lock:
+                    if not client.outbox:
+                        break
+                    chunk = client.outbox[0]
+                sent = client.sock.send(chunk)
+                with self._lock:
+                    if sent < len(chunk):
+                        client.outbox[0] = chunk[sent:]
+                        break
+                    client.outbox.popleft()
+        except (BlockingIOError, InterruptedError):
+            pass
         except Exception as e:
-            print(f"Failed to start server: {str(e)}")
-            self.stop()
-            
-    def stop(self):
-        self.running = False
-        
-        # Close socket
-        if self.socket:
-            try:
-                self.socket.close()
-            except:
-                pass
-            self.socket = None
-        
-        # Wait for thread to finish
-        if self.server_thread:
+            print(f"Failed to send response - client disconnected: {str(e)}")
+            self._close_client(client)
+            return
+
+        # Only watch for writability while there is something left to send
+        events = selectors.EVENT_READ
+        if client.outbox:
+            events |= selectors.EVENT_WRITE
+        try:
+            self.selector.modify(client.sock, events, data=client)
+        except (KeyError, ValueError):
+            pass
+
+    def _close_client(self, client):
+        """Unregister and close a client socket, dropping its queued work"""
+        if client.closed:
+            return
+        client.closed = True
+        with self._lock:
+            client.pending.clear()
+            client.outbox.clear()
+        if self.transaction and self.transaction.owner is client:
+            bpy.app.timers.register(lambda: self._rollback_abandoned(client), first_interval=0.0)
+        self.clients.pop(client.sock.fileno(), None)
+        if self.selector:
             try:
-                if self.server_thread.is_alive():
-                    self.server_thread.join(timeout=1.0)
-            except:
+                self.selector.unregister(client.sock)
+            except (KeyError, ValueError):
                 pass
-            self.server_thread = None
-        
-        print("BlenderMCP server stopped")
-    
-    def _server_loop(self):
-        """Main server loop in a separate thread"""
-        print("Server thread started")
-        self.socket.settimeout(1.0)  # Timeout to allow for stopping
-        
-        while self.running:
-            try:
-                # Accept new connection
-                try:
-                    client, address = self.socket.accept()
-                    print(f"Connected to client: {address}")
-                    
-                    # Handle client in a separate thread
-                    client_thread = threading.Thread(
-                        target=self._handle_client,
-                        args=(client,)
-                    )
-                    client_thread.daemon = True
-                    client_thread.start()
-                except socket.timeout:
-                    # Just check running condition
-                    continue
-                except Exception as e:
-                    print(f"Error accepting connection: {str(e)}")
-                    time.sleep(0.5)
-            except Exception as e:
-                print(f"Error in server loop: {str(e)}")
-                if not self.running:
-                    break
-                time.sleep(0.5)
-        
-        print("Server thread stopped")
-    
-    def _handle_client(self, client):
-        """Handle connected client"""
-        print("Client handler started")
-        client.settimeout(None)  # No timeout
-        buffer = b''
-        
         try:
-            while self.running:
-                # Receive data
+            client.sock.close()
+        except:
+            pass
+        self._detach_rings(client)
+        print(f"Client handler stopped: {client.address}")
+
+    @staticmethod
+    def _detach_rings(client):
+        rings = (client.rx_ring, client.tx_ring)
+        client.rx_ring = client.tx_ring = None
+        for ring in rings:
+            if ring:
                 try:
-                    data = client.recv(8192)
-                    if not data:
-                        print("Client disconnected")
-                        break
-                    
-                    buffer += data
-                    try:
-                        # Try to parse command
-                        command = json.loads(buffer.decode('utf-8'))
-                        buffer = b''
-                        
-                        # Execute command in Blender's main thread
-                        def execute_wrapper():
-                            try:
-                                response = self.execute_command(command)
-                                response_json = json.dumps(response)
-                                try:
-                                    client.sendall(response_json.encode('utf-8'))
-                                except:
-                                    print("Failed to send response - client disconnected")
-                            except Exception as e:
-                                print(f"Error executing command: {str(e)}")
-                                traceback.print_exc()
-                                try:
-                                    error_response = {
-                                        "status": "error",
-                                        "message": str(e)
-                                    }
-                                    client.sendall(json.dumps(error_response).encode('utf-8'))
-                                except:
-                                    pass
-                            return None
-                        
-                        # Schedule execution in main thread
-                        bpy.app.timers.register(execute_wrapper, first_interval=0.0)
-                    except json.JSONDecodeError:
-                        # Incomplete data, wait for more
-                        pass
+                    ring.close()
                 except Exception as e:
-                    print(f"Error receiving data: {str(e)}")
-                    break
-        except Exception as e:
-            print(f"Error in client handler: {str(e)}")
-        finally:
-            try:
-                client.close()
-            except:
-                pass
-            print("Client handler stopped")
+                    # A response may still be being encoded into it on the main thread
+                    print(f"Error detaching shared memory: {str(e)}")
 
     def execute_command(self, command):
         """Execute a command in the main Blender thread"""
@@ -176,10 +1910,16 @@ class BlenderMCPServer:
             cmd_type = command.get("type")
             params = command.get("params", {})
             
-            # Ensure we're in the right context
-            if cmd_type in ["create_object", "modify_object", "delete_object"]:
+            # Ensure we're in the right context. Objects are created through the data API by
+            # default, which needs no viewport; only the operator path is tied to one.
+            needs_view = cmd_type == "delete_object" or (
+                cmd_type == "create_object"
+                and (params.get("method") == "OPERATOR"
+                     or (params.get("type") == "TORUS" and params.get("align") == "VIEW")))
+            area = self._view3d_area() if needs_view else None
+            if area:
                 override = bpy.context.copy()
-                override['area'] = [area for area in bpy.context.screen.areas if area.type == 'VIEW_3D'][0]
+                override['area'] = area
                 with bpy.context.temp_override(**override):
                     return self._execute_command_internal(command)
             else:
@@ -190,6 +1930,14 @@ class BlenderMCPServer:
             traceback.print_exc()
             return {"status": "error", "message": str(e)}
 
+    @staticmethod
+    def _view3d_area():
+        """Return a 3D viewport area of the current screen, or None when running headless"""
+        screen = getattr(bpy.context, "screen", None)
+        if screen is None:
+            return None
+        return next((area for area in screen.areas if area.type == 'VIEW_3D'), None)
+
     def _execute_command_internal(self, command):
         """Internal command execution with proper context"""
         cmd_type = command.get("type")
@@ -204,10 +1952,28 @@ class BlenderMCPServer:
             "get_scene_info": self.get_scene_info,
             "create_object": self.create_object,
             "modify_object": self.modify_object,
+            "modify_objects": self.modify_objects,
             "delete_object": self.delete_object,
             "get_object_info": self.get_object_info,
             "execute_code": self.execute_code,
+            "get_mesh_data": self.get_mesh_data,
+            "scatter_instances": self.scatter_instances,
+            "make_single_user": self.make_single_user,
+            "begin_transaction": self.begin_transaction,
+            "commit_transaction": self.commit_transaction,
+            "rollback_transaction": self.rollback_transaction,
+            "execute_batch": self.execute_batch,
+            "set_mesh_data": self.set_mesh_data,
+            "find_overlaps": self.find_overlaps,
+            "query_region": self.query_region,
+            "nearest_objects": self.nearest_objects,
+            "find_free_placement": self.find_free_placement,
             "set_material": self.set_material,
+            "set_materials_bulk": self.set_materials_bulk,
+            "consolidate_textures": self.consolidate_textures,
+            "get_metrics": self.get_metrics,
+            "start_profiling": self.start_profiling,
+            "stop_profiling": self.stop_profiling,
             "get_polyhaven_status": self.get_polyhaven_status,
             "get_hyper3d_status": self.get_hyper3d_status,
         }
@@ -219,6 +1985,7 @@ class BlenderMCPServer:
                 "search_polyhaven_assets": self.search_polyhaven_assets,
                 "download_polyhaven_asset": self.download_polyhaven_asset,
                 "set_texture": self.set_texture,
+                "upgrade_textures": self.upgrade_textures,
             }
             handlers.update(polyhaven_handlers)
         
@@ -235,16 +2002,33 @@ class BlenderMCPServer:
         if handler:
             try:
                 print(f"Executing handler for {cmd_type}")
-                result = handler(**params)
+                with self.profiler.run(cmd_type):
+                    result = handler(**params)
                 print(f"Handler execution complete")
-                return {"status": "success", "result": result}
             except Exception as e:
                 print(f"Error in handler: {str(e)}")
                 traceback.print_exc()
-                return {"status": "error", "message": str(e)}
+                return {"status": "error", "message": self._fail_transaction(cmd_type, str(e))}
+
+            if self.transaction and cmd_type not in self.TRANSACTION_COMMANDS:
+                self.transaction.command_count += 1
+                # Several handlers report failures in the result instead of raising
+                if isinstance(result, dict) and (result.get("error") or result.get("status") == "error"):
+                    message = result.get("error") or result.get("message") or "Command failed"
+                    return {"status": "error", "message": self._fail_transaction(cmd_type, message)}
+            return {"status": "success", "result": result}
         else:
             return {"status": "error", "message": f"Unknown command type: {cmd_type}"}
 
+    def _fail_transaction(self, cmd_type, message):
+        """Roll back the open transaction after a failed command of its owner if it asked for that"""
+        if (self._owns_transaction() and self.transaction.rollback_on_error
+                and cmd_type not in self.TRANSACTION_COMMANDS):
+            name = self.transaction.name
+            self._discard_transaction()
+            message += f" (transaction '{name}' rolled back)"
+        return message
+
     
     def get_simple_info(self):
         """Get basic Blender information"""
@@ -267,10 +2051,9 @@ class BlenderMCPServer:
             }
             
             # Collect minimal object information (limit to first 10 objects)
-            for i, obj in enumerate(bpy.context.scene.objects):
-                if i >= 10:  # Reduced from 20 to 10
-                    break
-                    
+            objects = list(bpy.context.scene.objects[:10])  # Reduced from 20 to 10
+            bounding_boxes = self._get_world_aabbs(objects)
+            for obj, bounding_box in zip(objects, bounding_boxes):
                 obj_info = {
                     "name": obj.name,
                     "type": obj.type,
@@ -279,6 +2062,8 @@ class BlenderMCPServer:
                                 round(float(obj.location.y), 2), 
                                 round(float(obj.location.z), 2)],
                 }
+                if bounding_box:
+                    obj_info["world_bounding_box"] = [[round(value, 2) for value in corner] for corner in bounding_box]
                 scene_info["objects"].append(obj_info)
             
             print(f"Scene info collected: {len(scene_info['objects'])} objects")
@@ -288,73 +2073,471 @@ class BlenderMCPServer:
             traceback.print_exc()
             return {"error": str(e)}
     
+    # Object types whose bound_box describes actual geometry
+    BOUNDED_TYPES = {'MESH', 'CURVE', 'SURFACE', 'META', 'FONT', 'LATTICE', 'ARMATURE',
+                     'GPENCIL', 'GREASEPENCIL', 'CURVES', 'POINTCLOUD', 'VOLUME'}
+
     @staticmethod
-    def _get_aabb(obj):
-        """ Returns the world-space axis-aligned bounding box (AABB) of an object. """
-        if obj.type != 'MESH':
-            raise TypeError("Object must be a mesh")
+    def _transform_boxes(corners, matrices):
+        """Batched transform of (N, 8, 3) corners by (N, 4, 4) matrices, reduced to (N, 2, 3) min/max"""
+        world = np.einsum('nij,nkj->nki', matrices[:, :3, :3], corners) + matrices[:, None, :3, 3]
+        return np.stack((world.min(axis=1), world.max(axis=1)), axis=1)
 
-        # Get the bounding box corners in local space
-        local_bbox_corners = [mathutils.Vector(corner) for corner in obj.bound_box]
+    @staticmethod
+    def _box_corners(boxes):
+        """The 8 corners of (N, 2, 3) min/max boxes"""
+        index = np.array([[i, j, k] for i in (0, 1) for j in (0, 1) for k in (0, 1)])
+        return boxes[:, index, [0, 1, 2]]
 
-        # Convert to world coordinates
-        world_bbox_corners = [obj.matrix_world @ corner for corner in local_bbox_corners]
+    @classmethod
+    def _compute_world_aabbs(cls, objects, _depth=0):
+        """World-space AABBs of many objects with one batched matmul.
 
-        # Compute axis-aligned min/max coordinates
-        min_corner = mathutils.Vector(map(min, zip(*world_bbox_corners)))
-        max_corner = mathutils.Vector(map(max, zip(*world_bbox_corners)))
+        Handles every type with geometry (meshes, curves, text, ...) and
+        collection instances. Returns a list aligned with `objects` holding a
+        (2, 3) min/max array, or None for objects without extent.
+        """
+        boxes = [None] * len(objects)
 
-        return [
-            [*min_corner], [*max_corner]
+        direct = [i for i, obj in enumerate(objects) if obj.type in cls.BOUNDED_TYPES]
+        if direct:
+            corners = np.array([objects[i].bound_box for i in direct], dtype=np.float64)
+            matrices = np.array([objects[i].matrix_world for i in direct], dtype=np.float64)
+            for i, box in zip(direct, cls._transform_boxes(corners, matrices)):
+                boxes[i] = box
+
+        instances = [
+            i for i, obj in enumerate(objects)
+            if obj.type == 'EMPTY' and obj.instance_type == 'COLLECTION' and obj.instance_collection
         ]
+        if instances and _depth < 8:
+            local_boxes = {}
+            for i in instances:
+                collection = objects[i].instance_collection
+                if collection.name not in local_boxes:
+                    local_boxes[collection.name] = cls._collection_aabb(collection, _depth + 1)
+            placed = [i for i in instances if local_boxes[objects[i].instance_collection.name] is not None]
+            if placed:
+                corners = cls._box_corners(np.array(
+                    [local_boxes[objects[i].instance_collection.name] for i in placed]))
+                matrices = np.array([objects[i].matrix_world for i in placed], dtype=np.float64)
+                for i, box in zip(placed, cls._transform_boxes(corners, matrices)):
+                    boxes[i] = box
 
-    def create_object(self, type="CUBE", name=None, location=(0, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1),
-                    align="WORLD", major_segments=48, minor_segments=12, mode="MAJOR_MINOR",
-                    major_radius=1.0, minor_radius=0.25, abso_major_rad=1.25, abso_minor_rad=0.75, generate_uvs=True):
-        """Create a new object in the scene"""
+        return boxes
+
+    @classmethod
+    def _collection_aabb(cls, collection, depth):
+        """AABB of a collection's contents in the instancing object's local space"""
+        contents = [box for box in cls._compute_world_aabbs(list(collection.all_objects), depth) if box is not None]
+        if not contents:
+            return None
+        contents = np.array(contents)
+        offset = np.array(collection.instance_offset, dtype=np.float64)
+        return np.stack((contents[:, 0].min(axis=0) - offset, contents[:, 1].max(axis=0) - offset))
+
+    @classmethod
+    def _get_world_aabbs(cls, objects):
+        """World AABBs as JSON-ready [[min], [max]] lists (None when an object has no extent)"""
+        return [box.tolist() if box is not None else None for box in cls._compute_world_aabbs(objects)]
+
+    @classmethod
+    def _get_aabb(cls, obj):
+        """ Returns the world-space axis-aligned bounding box (AABB) of an object, or None. """
+        return cls._get_world_aabbs([obj])[0]
+
+    def _refreshed_index(self):
+        self.spatial_index.refresh()
+        return self.spatial_index
+
+    def _spatial_query(self, query):
+        """Run query(index) -> (result, names it mentions) against the refreshed index.
+
+        Renames don't show up as depsgraph updates, so when the answer names an
+        object that no longer exists (or misses the one asked about) the index
+        is resynced with the scene and the query runs once more.
+        """
+        index = self._refreshed_index()
         try:
-            # Deselect all objects first
-            bpy.ops.object.select_all(action='DESELECT')
-            
-            # Create the object based on type
+            result, names = query(index)
+            if index.is_current(names):
+                return result
+        except ValueError:
+            pass
+        index.resync()
+        return query(index)[0]
+
+    @staticmethod
+    def _indexed_box(index, name):
+        box = index.boxes.get(name)
+        if box is None:
+            raise ValueError(f"Object not found or has no bounding box: {name}")
+        return box
+
+    def find_overlaps(self, name=None, margin=0.0, ignore=None):
+        """Find objects whose world bounding boxes intersect"""
+        ignore = set(ignore or ())
+
+        def query(index):
+            if name:
+                box = self._indexed_box(index, name)
+                others = [other for other in index.query(box[0], box[1], margin, ignore) if other != name]
+                return {"object": name, "overlapping": others, "count": len(others)}, others
+
+            pairs = index.overlapping_pairs(margin, ignore)
+            return {"pairs": [list(pair) for pair in pairs], "count": len(pairs)}, [n for pair in pairs for n in pair]
+
+        return self._spatial_query(query)
+
+    def query_region(self, box_min, box_max, margin=0.0, ignore=None):
+        """List the objects whose world bounding boxes intersect a region"""
+        ignore = set(ignore or ())
+
+        def query(index):
+            names = index.query(box_min, box_max, margin, ignore)
+            return {
+                "objects": [{"name": name, "world_bounding_box": index.boxes[name]} for name in names],
+                "count": len(names),
+            }, names
+
+        return self._spatial_query(query)
+
+    def nearest_objects(self, location=None, name=None, count=5, max_distance=None):
+        """Find the objects closest to a point or to another object"""
+        if not name and location is None:
+            raise ValueError("Either location or name is required")
+
+        def query(index):
+            point = location
+            if name:
+                box = self._indexed_box(index, name)
+                point = [(low + high) / 2 for low, high in zip(*box)]
+            nearest = index.nearest(point, count, max_distance, {name} if name else ())
+            return {
+                "location": list(point),
+                "objects": [
+                    {"name": other, "distance": distance, "world_bounding_box": index.boxes[other]}
+                    for other, distance in nearest
+                ],
+            }, [other for other, _ in nearest]
+
+        return self._spatial_query(query)
+
+    def find_free_placement(self, size, near=(0, 0, 0), search_radius=10.0, step=None, margin=0.0, ignore=None):
+        """Find the free spot closest to `near` (searching in the XY plane) for a box of the given size"""
+        index = self._refreshed_index()
+        ignore = set(ignore or ())
+        half = [value / 2 for value in size]
+        if step is None:
+            step = max(max(size[0], size[1]) / 2, 0.05)
+        rings = int(math.ceil(search_radius / step))
+
+        for ring in range(rings + 1):
+            # Try the spots of this ring closest to `near` first
+            offsets = sorted(
+                ((i, j) for i in range(-ring, ring + 1) for j in range(-ring, ring + 1)
+                 if max(abs(i), abs(j)) == ring),
+                key=lambda offset: offset[0] ** 2 + offset[1] ** 2
+            )
+            for i, j in offsets:
+                center = [near[0] + i * step, near[1] + j * step, near[2]]
+                if math.hypot(i * step, j * step) > search_radius:
+                    continue
+                box_min = [center[axis] - half[axis] for axis in range(3)]
+                box_max = [center[axis] + half[axis] for axis in range(3)]
+                if not index.query(box_min, box_max, margin, ignore):
+                    return {
+                        "found": True,
+                        "location": center,
+                        "world_bounding_box": [box_min, box_max],
+                    }
+
+        return {"found": False, "message": f"No free spot within {search_radius} of {list(near)}"}
+
+    TRANSACTION_COMMANDS = ("begin_transaction", "commit_transaction", "rollback_transaction", "execute_batch")
+
+    def _touch(self, block):
+        """Let an open transaction back up a datablock before it is edited in place"""
+        if self.transaction:
+            self.transaction.touch(block)
+
+    def begin_transaction(self, name="MCP transaction", rollback_on_error=True):
+        """Start recording changes so they can be committed or rolled back as one step"""
+        if self.transaction:
+            raise ValueError(f"Transaction '{self.transaction.name}' is already open")
+        self.transaction = _Transaction(name, owner=self._current_client, rollback_on_error=rollback_on_error)
+        return {"transaction": name, "rollback_on_error": rollback_on_error}
+
+    def _owns_transaction(self):
+        return self.transaction is not None and self.transaction.owner is self._current_client
+
+    def _check_transaction_owner(self):
+        if not self.transaction:
+            raise ValueError("No transaction is open")
+        if not self._owns_transaction():
+            raise ValueError(f"Transaction '{self.transaction.name}' was started by another client")
+
+    def commit_transaction(self):
+        """Keep the changes made since begin_transaction as a single undo step"""
+        self._check_transaction_owner()
+        transaction, self.transaction = self.transaction, None
+        transaction.commit()
+        return {
+            "committed": transaction.name,
+            "commands": transaction.command_count,
+            "duration": time.time() - transaction.started,
+        }
+
+    def rollback_transaction(self):
+        """Discard every change made since begin_transaction"""
+        self._check_transaction_owner()
+        return self._discard_transaction()
+
+    def _discard_transaction(self):
+        transaction, self.transaction = self.transaction, None
+        removed = transaction.rollback()
+        self.spatial_index.invalidate()
+        return {
+            "rolled_back": transaction.name,
+            "commands": transaction.command_count,
+            "removed_datablocks": removed,
+        }
+
+    def _rollback_abandoned(self, client):
+        """Timer callback: roll back a transaction whose client disconnected"""
+        if self.transaction and self.transaction.owner is client:
+            print(f"Rolling back transaction '{self.transaction.name}' of disconnected client {client.address}")
+            self._discard_transaction()
+        return None
+
+    def execute_batch(self, commands, atomic=True, name="MCP batch"):
+        """Run several commands in one call; with atomic, a failure discards the whole batch"""
+        outer = self.transaction
+        if atomic and outer is not None and not self._owns_transaction():
+            raise ValueError(f"Transaction '{outer.name}' of another client is open")
+        own_transaction = atomic and outer is None
+        if own_transaction:
+            self.begin_transaction(name, rollback_on_error=False)
+
+        results = []
+        for index, command in enumerate(commands):
+            response = self.execute_command(command)
+            results.append(response)
+            if response.get("status") == "error":
+                if own_transaction:
+                    self.rollback_transaction()
+                return {
+                    "completed": False,
+                    "failed_index": index,
+                    "message": response.get("message"),
+                    # An enclosing transaction with rollback_on_error goes away with the failed command
+                    "rolled_back": own_transaction or (outer is not None and self.transaction is not outer),
+                    "results": results,
+                }
+
+        if own_transaction:
+            self.commit_transaction()
+        return {"completed": True, "results": results}
+
+    PRIMITIVE_NAMES = {
+        "CUBE": "Cube", "SPHERE": "Sphere", "CYLINDER": "Cylinder", "PLANE": "Plane", "CONE": "Cone",
+        "TORUS": "Torus", "EMPTY": "Empty", "CAMERA": "Camera", "LIGHT": "Light",
+    }
+
+    @staticmethod
+    def _fill_torus(mesh, major_segments, minor_segments, major_radius, minor_radius, generate_uvs):
+        """Build a torus straight into a mesh with NumPy and foreach_set"""
+        major = np.arange(major_segments)
+        minor = np.arange(minor_segments)
+        u = 2 * np.pi * major / major_segments
+        v = 2 * np.pi * minor / minor_segments
+        ring = major_radius + minor_radius * np.cos(v)
+        vertices = np.empty((major_segments, minor_segments, 3), dtype=np.float32)
+        vertices[..., 0] = np.outer(np.cos(u), ring)
+        vertices[..., 1] = np.outer(np.sin(u), ring)
+        vertices[..., 2] = minor_radius * np.sin(v)[None, :]
+
+        # One quad per (major, minor) pair, wrapping around both rings
+        i, j = np.meshgrid(major, minor, indexing='ij')
+        i_next = (i + 1) % major_segments
+        j_next = (j + 1) % minor_segments
+        quads = np.stack((
+            i * minor_segments + j,
+            i_next * minor_segments + j,
+            i_next * minor_segments + j_next,
+            i * minor_segments + j_next,
+        ), axis=-1).reshape(-1, 4).astype(np.int32)
+
+        mesh.vertices.add(major_segments * minor_segments)
+        mesh.loops.add(quads.size)
+        mesh.polygons.add(len(quads))
+        mesh.vertices.foreach_set("co", vertices.ravel())
+        mesh.loops.foreach_set("vertex_index", quads.ravel())
+        mesh.polygons.foreach_set("loop_start", np.arange(0, quads.size, 4, dtype=np.int32))
+        try:
+            mesh.polygons.foreach_set("loop_total", np.full(len(quads), 4, dtype=np.int32))
+        except AttributeError:
+            pass  # Blender 4.0+ derives loop_total from loop_start
+        mesh.update(calc_edges=True)
+
+        if generate_uvs:
+            # UVs are unwrapped, so the seam gets coordinates 1.0 instead of wrapping to 0.0
+            uv_u = np.stack((i, i + 1, i + 1, i), axis=-1) / major_segments
+            uv_v = np.stack((j, j, j + 1, j + 1), axis=-1) / minor_segments
+            uvs = np.stack((uv_u, uv_v), axis=-1).astype(np.float32)
+            mesh.uv_layers.new(name="UVMap").data.foreach_set("uv", uvs.ravel())
+
+    @classmethod
+    def _build_primitive_mesh(cls, type, name, major_segments=48, minor_segments=12, mode="MAJOR_MINOR",
+                              major_radius=1.0, minor_radius=0.25, abso_major_rad=1.25, abso_minor_rad=0.75,
+                              generate_uvs=True):
+        """Build a primitive mesh with the same defaults as the mesh.primitive_*_add operators"""
+        mesh = bpy.data.meshes.new(name)
+        if type == "TORUS":
+            if mode == "EXT_INT":
+                major_radius = (abso_major_rad + abso_minor_rad) / 2
+                minor_radius = (abso_major_rad - abso_minor_rad) / 2
+            cls._fill_torus(mesh, major_segments, minor_segments, major_radius, minor_radius, generate_uvs)
+            return mesh
+
+        bm = bmesh.new()
+        try:
+            if generate_uvs:
+                # The create ops only fill UVs into an existing layer
+                bm.loops.layers.uv.new("UVMap")
             if type == "CUBE":
-                bpy.ops.mesh.primitive_cube_add(location=location, rotation=rotation, scale=scale)
+                bmesh.ops.create_cube(bm, size=2.0, calc_uvs=generate_uvs)
             elif type == "SPHERE":
-                bpy.ops.mesh.primitive_uv_sphere_add(location=location, rotation=rotation, scale=scale)
+                bmesh.ops.create_uvsphere(bm, u_segments=32, v_segments=16, radius=1.0, calc_uvs=generate_uvs)
             elif type == "CYLINDER":
-                bpy.ops.mesh.primitive_cylinder_add(location=location, rotation=rotation, scale=scale)
-            elif type == "PLANE":
-                bpy.ops.mesh.primitive_plane_add(location=location, rotation=rotation, scale=scale)
+                bmesh.ops.create_cone(bm, cap_ends=True, segments=32, radius1=1.0, radius2=1.0, depth=2.0,
+                                      calc_uvs=generate_uvs)
             elif type == "CONE":
-                bpy.ops.mesh.primitive_cone_add(location=location, rotation=rotation, scale=scale)
-            elif type == "TORUS":
-                bpy.ops.mesh.primitive_torus_add(
-                    align=align,
-                    location=location,
-                    rotation=rotation,
-                    major_segments=major_segments,
-                    minor_segments=minor_segments,
-                    mode=mode,
-                    major_radius=major_radius,
-                    minor_radius=minor_radius,
-                    abso_major_rad=abso_major_rad,
-                    abso_minor_rad=abso_minor_rad,
-                    generate_uvs=generate_uvs
-                )
-            elif type == "EMPTY":
-                bpy.ops.object.empty_add(location=location, rotation=rotation, scale=scale)
-            elif type == "CAMERA":
-                bpy.ops.object.camera_add(location=location, rotation=rotation)
-            elif type == "LIGHT":
-                bpy.ops.object.light_add(type='POINT', location=location, rotation=rotation, scale=scale)
+                bmesh.ops.create_cone(bm, cap_ends=True, segments=32, radius1=1.0, radius2=0.0, depth=2.0,
+                                      calc_uvs=generate_uvs)
+            elif type == "PLANE":
+                bmesh.ops.create_grid(bm, x_segments=1, y_segments=1, size=1.0, calc_uvs=generate_uvs)
             else:
+                raise ValueError(f"Unsupported mesh primitive: {type}")
+            bm.to_mesh(mesh)
+        except Exception:
+            bpy.data.meshes.remove(mesh)
+            raise
+        finally:
+            bm.free()
+        return mesh
+
+    @staticmethod
+    def _primitive_key(type, major_segments, minor_segments, mode, major_radius, minor_radius,
+                       abso_major_rad, abso_minor_rad, generate_uvs):
+        """Parameters that decide the geometry of a primitive, used as its template cache key"""
+        if type != "TORUS":
+            return ("primitive", type, bool(generate_uvs))
+        if mode == "EXT_INT":
+            major_radius = (abso_major_rad + abso_minor_rad) / 2
+            minor_radius = (abso_major_rad - abso_minor_rad) / 2
+        return ("primitive", type, bool(generate_uvs), int(major_segments), int(minor_segments),
+                round(float(major_radius), 6), round(float(minor_radius), 6))
+
+    def _create_object_data(self, type, name, location, rotation, scale, align, shared_mesh=True, **mesh_params):
+        """Create a primitive object through the data API: no operators and no 3D viewport needed"""
+        name = name or self.PRIMITIVE_NAMES[type]
+        if type == "EMPTY":
+            data = None
+        elif type == "CAMERA":
+            data = bpy.data.cameras.new(name)
+        elif type == "LIGHT":
+            data = bpy.data.lights.new(name, type='POINT')
+        elif shared_mesh:
+            # Identical primitives share one mesh; make_single_user splits it off before edits
+            key = self.geometry_cache.key(*self._primitive_key(type, **mesh_params))
+            data, _ = self.geometry_cache.get(key)
+            if data is None:
+                data = self._build_primitive_mesh(type, self.PRIMITIVE_NAMES[type], **mesh_params)
+                self.geometry_cache.put(key, data)
+        else:
+            data = self._build_primitive_mesh(type, name, **mesh_params)
+
+        obj = bpy.data.objects.new(name, data)
+        obj.location = location
+        # Like the operators, only the torus honours align
+        if type == "TORUS" and align == "CURSOR":
+            obj.rotation_euler = bpy.context.scene.cursor.rotation_euler
+        else:
+            obj.rotation_euler = rotation
+        # The operators ignore scale for these types as well
+        if type not in ("TORUS", "CAMERA"):
+            obj.scale = scale
+        bpy.context.collection.objects.link(obj)
+        bpy.context.view_layer.objects.active = obj
+        obj.select_set(True)
+        return obj
+
+    def _create_object_operator(self, type, location, rotation, scale, align, major_segments, minor_segments,
+                                mode, major_radius, minor_radius, abso_major_rad, abso_minor_rad, generate_uvs):
+        """Create a primitive object with the bpy.ops operators (needs a 3D viewport)"""
+        # Deselect all objects first
+        bpy.ops.object.select_all(action='DESELECT')
+        
+        # Create the object based on type
+        if type == "CUBE":
+            bpy.ops.mesh.primitive_cube_add(location=location, rotation=rotation, scale=scale)
+        elif type == "SPHERE":
+            bpy.ops.mesh.primitive_uv_sphere_add(location=location, rotation=rotation, scale=scale)
+        elif type == "CYLINDER":
+            bpy.ops.mesh.primitive_cylinder_add(location=location, rotation=rotation, scale=scale)
+        elif type == "PLANE":
+            bpy.ops.mesh.primitive_plane_add(location=location, rotation=rotation, scale=scale)
+        elif type == "CONE":
+            bpy.ops.mesh.primitive_cone_add(location=location, rotation=rotation, scale=scale)
+        elif type == "TORUS":
+            bpy.ops.mesh.primitive_torus_add(
+                align=align,
+                location=location,
+                rotation=rotation,
+                major_segments=major_segments,
+                minor_segments=minor_segments,
+                mode=mode,
+                major_radius=major_radius,
+                minor_radius=minor_radius,
+                abso_major_rad=abso_major_rad,
+                abso_minor_rad=abso_minor_rad,
+                generate_uvs=generate_uvs
+            )
+        elif type == "EMPTY":
+            bpy.ops.object.empty_add(location=location, rotation=rotation, scale=scale)
+        elif type == "CAMERA":
+            bpy.ops.object.camera_add(location=location, rotation=rotation)
+        elif type == "LIGHT":
+            bpy.ops.object.light_add(type='POINT', location=location, rotation=rotation, scale=scale)
+        
+        # Force update the view layer
+        bpy.context.view_layer.update()
+        
+        # Get the active object (which should be our newly created object)
+        return bpy.context.view_layer.objects.active
+
+    def create_object(self, type="CUBE", name=None, location=(0, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1),
+                    align="WORLD", major_segments=48, minor_segments=12, mode="MAJOR_MINOR",
+                    major_radius=1.0, minor_radius=0.25, abso_major_rad=1.25, abso_minor_rad=0.75, generate_uvs=True,
+                    method="DATA", shared_mesh=True):
+        """Create a new object in the scene"""
+        try:
+            if type not in self.PRIMITIVE_NAMES:
                 raise ValueError(f"Unsupported object type: {type}")
-            
-            # Force update the view layer
-            bpy.context.view_layer.update()
-            
-            # Get the active object (which should be our newly created object)
-            obj = bpy.context.view_layer.objects.active
+
+            # Aligning to the view needs a viewport, which only the operators have
+            if method == "OPERATOR" or (type == "TORUS" and align == "VIEW" and self._view3d_area()):
+                obj = self._create_object_operator(
+                    type, location, rotation, scale, align, major_segments, minor_segments, mode,
+                    major_radius, minor_radius, abso_major_rad, abso_minor_rad, generate_uvs)
+            else:
+                obj = self._create_object_data(
+                    type, name, location, rotation, scale, align,
+                    major_segments=major_segments, minor_segments=minor_segments, mode=mode,
+                    major_radius=major_radius, minor_radius=minor_radius,
+                    abso_major_rad=abso_major_rad, abso_minor_rad=abso_minor_rad, generate_uvs=generate_uvs,
+                    shared_mesh=shared_mesh)
             
             # If we don't have an active object, something went wrong
             if obj is None:
@@ -363,10 +2546,10 @@ class BlenderMCPServer:
             # Make sure it's selected
             obj.select_set(True)
             
-            # Rename if name is provided
+            # Rename if name is provided (shared template meshes keep their own name)
             if name:
                 obj.name = name
-                if obj.data:
+                if obj.data and obj.data.users == 1 and _GeometryCache.TAG not in obj.data:
                     obj.data.name = name
             
             # Return the object info
@@ -377,9 +2560,11 @@ class BlenderMCPServer:
                 "rotation": [obj.rotation_euler.x, obj.rotation_euler.y, obj.rotation_euler.z],
                 "scale": [obj.scale.x, obj.scale.y, obj.scale.z],
             }
+            if obj.data is not None and obj.data.users > 1:
+                result["shared_data"] = obj.data.name
             
-            if obj.type == "MESH":
-                bounding_box = self._get_aabb(obj)
+            bounding_box = self._get_aabb(obj)
+            if bounding_box:
                 result["world_bounding_box"] = bounding_box
             
             return result
@@ -418,12 +2603,92 @@ class BlenderMCPServer:
             "visible": obj.visible_get(),
         }
 
-        if obj.type == "MESH":
-            bounding_box = self._get_aabb(obj)
+        bounding_box = self._get_aabb(obj)
+        if bounding_box:
             result["world_bounding_box"] = bounding_box
 
         return result
 
+    def _select_objects(self, names=None, filter=None):
+        """Resolve an explicit list of names or a filter into objects, keeping the given order"""
+        if names is not None:
+            objects = [bpy.data.objects.get(name) for name in names]
+            missing = [name for name, obj in zip(names, objects) if obj is None]
+            if missing:
+                raise ValueError(f"Objects not found: {', '.join(missing[:20])}"
+                                 + (f" and {len(missing) - 20} more" if len(missing) > 20 else ""))
+            return objects
+        if filter is None:
+            raise ValueError("Either names or filter is required")
+
+        unknown = set(filter) - {"type", "name", "collection"}
+        if unknown:
+            raise ValueError(f"Unknown filter keys: {', '.join(sorted(unknown))}")
+        if "collection" in filter:
+            collection = bpy.data.collections.get(filter["collection"])
+            if collection is None:
+                raise ValueError(f"Collection not found: {filter['collection']}")
+            candidates = collection.all_objects
+        else:
+            candidates = bpy.context.scene.objects
+        types = filter.get("type")
+        if isinstance(types, str):
+            types = [types]
+        pattern = filter.get("name")
+        return [
+            obj for obj in candidates
+            if (not types or obj.type in types) and (not pattern or fnmatch.fnmatchcase(obj.name, pattern))
+        ]
+
+    def modify_objects(self, names=None, filter=None, locations=None, rotations=None, scales=None, visible=None):
+        """Set transforms and visibility of many objects in one pass.
+
+        Each of locations, rotations and scales is either one [x, y, z] row for all
+        objects or one row per object; visible is a bool or one bool per object.
+        """
+        objects = self._select_objects(names, filter)
+        count = len(objects)
+
+        def rows(value, field):
+            if value is None:
+                return None
+            array = self._as_array(value, np.float64, 3)
+            if len(array) == 1:
+                return [array[0].tolist()] * count
+            if len(array) != count:
+                raise ValueError(f"Got {len(array)} {field} for {count} objects")
+            return array.tolist()
+
+        # Validate everything before the first write so a bad array changes nothing
+        location_rows = rows(locations, "locations")
+        rotation_rows = rows(rotations, "rotations")
+        scale_rows = rows(scales, "scales")
+        if visible is not None:
+            if isinstance(visible, bool):
+                hidden = [not visible] * count
+            else:
+                if len(visible) != count:
+                    raise ValueError(f"Got {len(visible)} visibility flags for {count} objects")
+                hidden = [not flag for flag in visible]
+
+        start = time.perf_counter()
+        for index, obj in enumerate(objects):
+            if location_rows is not None:
+                obj.location = location_rows[index]
+            if rotation_rows is not None:
+                obj.rotation_euler = rotation_rows[index]
+            if scale_rows is not None:
+                obj.scale = scale_rows[index]
+            if visible is not None:
+                obj.hide_viewport = hidden[index]
+                obj.hide_render = hidden[index]
+
+        result = {"count": count, "duration": time.perf_counter() - start}
+        # Listing hundreds of names would only bloat the reply
+        if count <= 100:
+            result["names"] = [obj.name for obj in objects]
+        return result
+
     def delete_object(self, name):
         """Delete an object from the scene"""
         obj = bpy.data.objects.get(name)
@@ -434,7 +2699,10 @@ class BlenderMCPServer:
         obj_name = obj.name
         
         # Select and delete the object
-        if obj:
+        if self.transaction:
+            # Kept around unlinked so a rollback can restore it
+            self.transaction.delete_object(obj)
+        elif obj:
             bpy.data.objects.remove(obj, do_unlink=True)
         
         return {"deleted": obj_name}
@@ -456,8 +2724,8 @@ class BlenderMCPServer:
             "materials": [],
         }
 
-        if obj.type == "MESH":
-            bounding_box = self._get_aabb(obj)
+        bounding_box = self._get_aabb(obj)
+        if bounding_box:
             obj_info["world_bounding_box"] = bounding_box
         
         # Add material slots
@@ -476,17 +2744,458 @@ class BlenderMCPServer:
         
         return obj_info
     
-    def execute_code(self, code):
+    MESH_DATA_FIELDS = ("vertices", "normals", "edges", "loop_vertices", "loop_starts", "loop_totals", "triangles", "uvs")
+
+    @staticmethod
+    def _as_array(value, dtype, width=None):
+        """Turn an attachment, base64 dict or nested list into a NumPy array"""
+        if isinstance(value, BinaryAttachment):
+            array = value.to_array()
+        elif isinstance(value, dict) and "base64" in value:
+            array = np.frombuffer(base64.b64decode(value["base64"]), dtype=value["dtype"]).reshape(value["shape"])
+        else:
+            array = np.asarray(value)
+        array = array.astype(dtype, copy=False)
+        if width is not None:
+            array = array.reshape(-1, width)
+        return np.ascontiguousarray(array)
+
+    def get_mesh_data(self, name, fields=("vertices", "loop_vertices", "loop_starts"), decimate_ratio=None,
+                      max_vertices=None, apply_modifiers=False):
+        """Export mesh geometry as typed arrays read with foreach_get"""
+        obj = bpy.data.objects.get(name)
+        if not obj:
+            raise ValueError(f"Object not found: {name}")
+        if obj.type != 'MESH':
+            raise ValueError(f"Object {name} is not a mesh")
+        unknown = [field for field in fields if field not in self.MESH_DATA_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown mesh data fields: {', '.join(unknown)}")
+
+        # LOD: a vertex budget is turned into a decimation ratio
+        if max_vertices and len(obj.data.vertices) > max_vertices:
+            ratio = max_vertices / len(obj.data.vertices)
+            decimate_ratio = min(decimate_ratio or 1.0, ratio)
+
+        decimate = None
+        evaluated = None
+        try:
+            if decimate_ratio is not None and decimate_ratio < 1.0:
+                decimate = obj.modifiers.new(name="BlenderMCP_Decimate", type='DECIMATE')
+                decimate.decimate_type = 'COLLAPSE'
+                decimate.ratio = max(float(decimate_ratio), 0.0)
+
+            if decimate or apply_modifiers:
+                depsgraph = bpy.context.evaluated_depsgraph_get()
+                evaluated = obj.evaluated_get(depsgraph)
+                mesh = evaluated.to_mesh()
+            else:
+                mesh = obj.data
+
+            vertex_count = len(mesh.vertices)
+            loop_count = len(mesh.loops)
+            polygon_count = len(mesh.polygons)
+            arrays = {}
+            for field in fields:
+                if field == "vertices":
+                    array = np.empty(vertex_count * 3, dtype=np.float32)
+                    mesh.vertices.foreach_get("co", array)
+                    array = array.reshape(-1, 3)
+                elif field == "normals":
+                    array = np.empty(vertex_count * 3, dtype=np.float32)
+                    mesh.vertices.foreach_get("normal", array)
+                    array = array.reshape(-1, 3)
+                elif field == "edges":
+                    array = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+                    mesh.edges.foreach_get("vertices", array)
+                    array = array.reshape(-1, 2)
+                elif field == "loop_vertices":
+                    array = np.empty(loop_count, dtype=np.int32)
+                    mesh.loops.foreach_get("vertex_index", array)
+                elif field == "loop_starts":
+                    array = np.empty(polygon_count, dtype=np.int32)
+                    mesh.polygons.foreach_get("loop_start", array)
+                elif field == "loop_totals":
+                    array = np.empty(polygon_count, dtype=np.int32)
+                    mesh.polygons.foreach_get("loop_total", array)
+                elif field == "triangles":
+                    mesh.calc_loop_triangles()
+                    array = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+                    mesh.loop_triangles.foreach_get("vertices", array)
+                    array = array.reshape(-1, 3)
+                elif field == "uvs":
+                    if not mesh.uv_layers.active:
+                        continue
+                    array = np.empty(loop_count * 2, dtype=np.float32)
+                    mesh.uv_layers.active.data.foreach_get("uv", array)
+                    array = array.reshape(-1, 2)
+                arrays[field] = BinaryAttachment.from_array(array)
+
+            return {
+                "name": obj.name,
+                "vertex_count": vertex_count,
+                "edge_count": len(mesh.edges),
+                "polygon_count": polygon_count,
+                "loop_count": loop_count,
+                "decimate_ratio": decimate.ratio if decimate else None,
+                "arrays": arrays,
+            }
+        finally:
+            if evaluated is not None:
+                evaluated.to_mesh_clear()
+            if decimate is not None:
+                obj.modifiers.remove(decimate)
+
+    def make_single_user(self, name):
+        """Give an object its own copy of shared data so edits stop affecting the other users"""
+        obj = bpy.data.objects.get(name)
+        if not obj:
+            raise ValueError(f"Object not found: {name}")
+        data = obj.data
+        if data is None:
+            raise ValueError(f"Object {name} has no data")
+        shared = data.users > 1
+        if shared:
+            obj.data = data.copy()
+            if _GeometryCache.TAG in obj.data:
+                del obj.data[_GeometryCache.TAG]
+            obj.data.name = obj.name
+        else:
+            # Sole user of a template: just stop handing it out
+            self.geometry_cache.release(data)
+        return {"name": obj.name, "data": obj.data.name, "was_shared": shared}
+
+    def set_mesh_data(self, name, vertices=None, normals=None, loop_vertices=None, loop_starts=None,
+                      loop_totals=None, triangles=None, uvs=None, create=False):
+        """Write mesh geometry from typed arrays with foreach_set"""
+        obj = bpy.data.objects.get(name)
+        if not obj and not create:
+            raise ValueError(f"Object not found: {name}")
+        if obj and obj.type != 'MESH':
+            raise ValueError(f"Object {name} is not a mesh")
+
+        # Check every array before anything is created or copied, so a bad call leaves no trace
+        if triangles is not None:
+            loop_vertices = self._as_array(triangles, np.int32).ravel()
+            loop_starts = np.arange(0, len(loop_vertices), 3, dtype=np.int32)
+        elif loop_vertices is not None:
+            loop_vertices = self._as_array(loop_vertices, np.int32).ravel()
+            if loop_starts is None:
+                raise ValueError("loop_starts is required together with loop_vertices")
+            loop_starts = self._as_array(loop_starts, np.int32).ravel()
+
+        topology_changed = loop_vertices is not None
+        vertex_count = len(obj.data.vertices) if obj else 0
+        if vertices is not None:
+            vertices = self._as_array(vertices, np.float32, 3)
+            if not topology_changed and len(vertices) != vertex_count:
+                raise ValueError(
+                    f"Got {len(vertices)} vertices for a mesh with {vertex_count}; "
+                    "pass loop_vertices/loop_starts or triangles to replace the topology")
+        elif topology_changed:
+            raise ValueError("vertices are required when replacing the topology")
+
+        if topology_changed:
+            vertex_count = len(vertices)
+            if loop_totals is None:
+                loop_totals = np.diff(np.append(loop_starts, len(loop_vertices))).astype(np.int32)
+            else:
+                loop_totals = self._as_array(loop_totals, np.int32).ravel()
+        if uvs is not None:
+            uvs = self._as_array(uvs, np.float32, 2)
+            loop_count = len(loop_vertices) if topology_changed else len(obj.data.loops) if obj else 0
+            if len(uvs) != loop_count:
+                raise ValueError(f"Got {len(uvs)} UVs for a mesh with {loop_count} loops")
+        if normals is not None:
+            normals = self._as_array(normals, np.float32, 3)
+            if len(normals) != vertex_count:
+                raise ValueError(f"Got {len(normals)} normals for a mesh with {vertex_count} vertices")
+
+        if not obj:
+            obj = bpy.data.objects.new(name, bpy.data.meshes.new(name))
+            bpy.context.collection.objects.link(obj)
+        # Never write through to other objects sharing the mesh or to a cached template
+        self.make_single_user(obj.name)
+        mesh = obj.data
+        self._touch(mesh)
+
+        if topology_changed:
+            mesh.clear_geometry()
+            mesh.vertices.add(len(vertices))
+            mesh.loops.add(len(loop_vertices))
+            mesh.polygons.add(len(loop_starts))
+            mesh.vertices.foreach_set("co", vertices.ravel())
+            mesh.loops.foreach_set("vertex_index", loop_vertices)
+            mesh.polygons.foreach_set("loop_start", loop_starts)
+            try:
+                mesh.polygons.foreach_set("loop_total", loop_totals)
+            except AttributeError:
+                pass  # Blender 4.0+ derives loop_total from loop_start
+            mesh.update(calc_edges=True)
+        elif vertices is not None:
+            mesh.vertices.foreach_set("co", vertices.ravel())
+
+        if uvs is not None:
+            if not mesh.uv_layers:
+                mesh.uv_layers.new(name="UVMap")
+            mesh.uv_layers.active.data.foreach_set("uv", uvs.ravel())
+
+        if normals is not None:
+            if hasattr(mesh, "use_auto_smooth"):
+                mesh.use_auto_smooth = True  # Needed for custom normals before Blender 4.1
+            mesh.normals_split_custom_set_from_vertices(normals)
+
+        mesh.update()
+        return {
+            "name": obj.name,
+            "vertex_count": len(mesh.vertices),
+            "edge_count": len(mesh.edges),
+            "polygon_count": len(mesh.polygons),
+            "loop_count": len(mesh.loops),
+        }
+
+    def scatter_instances(self, source, locations, rotations=None, scales=None, mode="LINKED",
+                          collection=None, name_prefix=None):
+        """Place many linked duplicates or collection instances without operators"""
+        if mode == "LINKED":
+            source_obj = bpy.data.objects.get(source)
+            if not source_obj:
+                raise ValueError(f"Object not found: {source}")
+            data = source_obj.data
+        elif mode == "COLLECTION":
+            source_collection = bpy.data.collections.get(source)
+            if not source_collection:
+                raise ValueError(f"Collection not found: {source}")
+        else:
+            raise ValueError(f"Unsupported scatter mode: {mode}. Must be LINKED or COLLECTION")
+
+        locations = self._as_array(locations, np.float64, 3)
+        count = len(locations)
+        if rotations is not None:
+            rotations = self._as_array(rotations, np.float64, 3)
+            if len(rotations) != count:
+                raise ValueError(f"Got {len(rotations)} rotations for {count} locations")
+        if scales is not None:
+            scales = self._as_array(scales, np.float64)
+            if scales.ndim == 1:
+                # One uniform scale per instance
+                scales = np.repeat(scales[:, None], 3, axis=1)
+            if len(scales) != count:
+                raise ValueError(f"Got {len(scales)} scales for {count} locations")
+
+        # Instances go into their own collection so they can be hidden or removed together
+        collection_name = collection or f"{source}_instances"
+        target = bpy.data.collections.get(collection_name)
+        if target is None:
+            target = bpy.data.collections.new(collection_name)
+            bpy.context.scene.collection.children.link(target)
+
+        prefix = name_prefix or source
+        location_rows = locations.tolist()
+        rotation_rows = rotations.tolist() if rotations is not None else None
+        scale_rows = scales.tolist() if scales is not None else None
+        link = target.objects.link
+        names = []
+        start = time.perf_counter()
+        for index in range(count):
+            if mode == "LINKED":
+                obj = bpy.data.objects.new(f"{prefix}_{index:05d}", data)
+                if rotation_rows is None:
+                    obj.rotation_euler = source_obj.rotation_euler
+                if scale_rows is None:
+                    obj.scale = source_obj.scale
+            else:
+                obj = bpy.data.objects.new(f"{prefix}_{index:05d}", None)
+                obj.instance_type = 'COLLECTION'
+                obj.instance_collection = source_collection
+            obj.location = location_rows[index]
+            if rotation_rows is not None:
+                obj.rotation_euler = rotation_rows[index]
+            if scale_rows is not None:
+                obj.scale = scale_rows[index]
+            link(obj)
+            names.append(obj.name)
+
+        result = {
+            "count": count,
+            "collection": target.name,
+            "mode": mode,
+            "duration": time.perf_counter() - start,
+        }
+        # Listing thousands of names would only bloat the reply
+        if count <= 100:
+            result["names"] = names
+        else:
+            result["first"] = names[0]
+            result["last"] = names[-1]
+        return result
+
+    def execute_code(self, code, session=None, timeout=None, reset_session=False):
         """Execute arbitrary Blender Python code"""
         # This is powerful but potentially dangerous - use with caution
+        if reset_session:
+            if not session:
+                raise ValueError("reset_session needs the name of the session to reset")
+            self.code_executor.reset(session)
+        # Stop at the client's deadline too, since nobody reads the result after it
+        remaining = self._remaining_time()
+        if remaining is not None:
+            # Never round down to 0, which would mean no limit at all
+            timeout = max(round(min(timeout, remaining) if timeout else remaining, 2), 0.01)
         try:
-            # Create a local namespace for execution
-            namespace = {"bpy": bpy}
-            exec(code, namespace)
-            return {"executed": True}
+            return self.code_executor.run(code, session=session, timeout=timeout)
         except Exception as e:
             raise Exception(f"Code execution error: {str(e)}")
     
+    @staticmethod
+    def _principled_node(mat):
+        """Return the material's Principled BSDF, creating and wiring one if needed"""
+        if not mat.use_nodes:
+            mat.use_nodes = True
+        
+        # Get or create Principled BSDF
+        principled = mat.node_tree.nodes.get('Principled BSDF')
+        if not principled:
+            principled = mat.node_tree.nodes.new('ShaderNodeBsdfPrincipled')
+            # Get or create Material Output
+            output = mat.node_tree.nodes.get('Material Output')
+            if not output:
+                output = mat.node_tree.nodes.new('ShaderNodeOutputMaterial')
+            # Link if not already linked
+            if not principled.outputs[0].links:
+                mat.node_tree.links.new(principled.outputs[0], output.inputs[0])
+        return principled
+
+    @staticmethod
+    def _assign_material(obj, mat):
+        """Put a material in the first slot of an object"""
+        if obj.data.users > 1:
+            # Shared data: link the material to the object so other users keep theirs
+            if not obj.material_slots:
+                obj.data.materials.append(None)
+            slot = obj.material_slots[0]
+            slot.link = 'OBJECT'
+            slot.material = mat
+        elif not obj.data.materials:
+            obj.data.materials.append(mat)
+        else:
+            # Only modify first material slot
+            obj.data.materials[0] = mat
+
+    MATERIAL_PARAMS_TAG = "blendermcp_params"
+
+    @staticmethod
+    def _material_params(spec):
+        """Normalize a bulk material spec: a color list, a material name or a dict"""
+        if isinstance(spec, str):
+            return {"material": spec}
+        if isinstance(spec, (list, tuple)):
+            spec = {"color": spec}
+        params = {}
+        for key, value in spec.items():
+            if key == "color":
+                if len(value) < 3:
+                    raise ValueError(f"Color needs at least 3 components: {value}")
+                # Rounded so colors computed slightly differently still share a material
+                value = [round(float(component), 4) for component in value[:4]] + [1.0] * (4 - len(value[:4]))
+            elif key in ("metallic", "roughness"):
+                value = round(float(value), 4)
+            elif key != "material":
+                raise ValueError(f"Unknown material parameter: {key}")
+            params[key] = value
+        return params
+
+    def set_materials_bulk(self, assignments):
+        """Assign materials to many objects, sharing one material per distinct set of parameters.
+
+        assignments maps object names to a color list, a material name or a dict
+        with any of material, color, metallic and roughness. Unnamed materials are
+        found again by a hash of their parameters, also across calls.
+        """
+        if isinstance(assignments, list):
+            assignments = {item["object"]: {key: value for key, value in item.items() if key != "object"}
+                           for item in assignments}
+        objects = dict(zip(assignments, self._select_objects(list(assignments))))
+        for name, obj in objects.items():
+            if not hasattr(obj.data, 'materials'):
+                raise ValueError(f"Object {name} cannot accept materials")
+        specs = {name: self._material_params(spec) for name, spec in assignments.items()}
+
+        # A named material can only take one set of values per call
+        named_values = {}
+        for name, params in specs.items():
+            values = {key: value for key, value in params.items() if key != "material"}
+            if "material" in params and values:
+                first = named_values.setdefault(params["material"], (name, values))
+                if first[1] != values:
+                    raise ValueError(f"Material {params['material']} is given different values for "
+                                     f"{first[0]} and {name}")
+
+        # Materials made by earlier bulk calls, by parameter hash
+        by_hash = {}
+        for mat in bpy.data.materials:
+            key = mat.get(self.MATERIAL_PARAMS_TAG)
+            if key is not None:
+                by_hash.setdefault(key, mat)
+
+        created, reused, updated = [], [], set()
+        materials = {}  # parameter hash or material name -> material, for this call
+        for name, params in specs.items():
+            values = {key: value for key, value in params.items() if key != "material"}
+            if "material" in params:
+                lookup = ("name", params["material"], json.dumps(values, sort_keys=True))
+            else:
+                lookup = ("hash", hashlib.sha1(json.dumps(values, sort_keys=True).encode('utf-8')).hexdigest())
+            mat = materials.get(lookup)
+            if mat is None:
+                if lookup[0] == "hash":
+                    mat = by_hash.get(lookup[1])
+                    if mat is None:
+                        mat = bpy.data.materials.new(name=f"MCP_{lookup[1][:8]}")
+                        mat[self.MATERIAL_PARAMS_TAG] = lookup[1]
+                        created.append(mat.name)
+                    else:
+                        reused.append(mat.name)
+                else:
+                    mat = bpy.data.materials.get(params["material"])
+                    if mat is None:
+                        mat = bpy.data.materials.new(name=params["material"])
+                        created.append(mat.name)
+                    elif mat.name not in created and mat.name not in reused:
+                        reused.append(mat.name)
+                    if values and mat.name not in updated:
+                        # Named materials take the given values; every user of the material sees them
+                        self._touch(mat)
+                        key = mat.get(self.MATERIAL_PARAMS_TAG)
+                        if key is not None:
+                            # Its values no longer match the hash it was created for
+                            del mat[self.MATERIAL_PARAMS_TAG]
+                            if by_hash.get(key) is mat:
+                                del by_hash[key]
+                        updated.add(mat.name)
+                # New hashed materials and updated named ones get their node values set once
+                if mat.name in created or mat.name in updated:
+                    principled = self._principled_node(mat)
+                    if "color" in values:
+                        principled.inputs['Base Color'].default_value = values["color"]
+                    if "metallic" in values:
+                        principled.inputs['Metallic'].default_value = values["metallic"]
+                    if "roughness" in values:
+                        principled.inputs['Roughness'].default_value = values["roughness"]
+                materials[lookup] = mat
+            self._assign_material(objects[name], mat)
+
+        result = {
+            "assigned": len(objects),
+            "materials_used": len({mat.name for mat in materials.values()}),
+            "created": created,
+            "reused": reused,
+        }
+        if len(objects) <= 100:
+            result["assignments"] = {name: obj.active_material.name if obj.active_material else None
+                                     for name, obj in objects.items()}
+        return result
+
     def set_material(self, object_name, material_name=None, create_if_missing=True, color=None):
         """Set or create a material for an object"""
         try:
@@ -516,20 +3225,8 @@ class BlenderMCPServer:
             
             # Set up material nodes if needed
             if mat:
-                if not mat.use_nodes:
-                    mat.use_nodes = True
-                
-                # Get or create Principled BSDF
-                principled = mat.node_tree.nodes.get('Principled BSDF')
-                if not principled:
-                    principled = mat.node_tree.nodes.new('ShaderNodeBsdfPrincipled')
-                    # Get or create Material Output
-                    output = mat.node_tree.nodes.get('Material Output')
-                    if not output:
-                        output = mat.node_tree.nodes.new('ShaderNodeOutputMaterial')
-                    # Link if not already linked
-                    if not principled.outputs[0].links:
-                        mat.node_tree.links.new(principled.outputs[0], output.inputs[0])
+                self._touch(mat)
+                principled = self._principled_node(mat)
                 
                 # Set color if provided
                 if color and len(color) >= 3:
@@ -539,15 +3236,14 @@ class BlenderMCPServer:
                         color[2],
                         1.0 if len(color) < 4 else color[3]
                     )
+                    # A bulk-created material no longer has the values its hash stands for
+                    if mat.get(self.MATERIAL_PARAMS_TAG) is not None:
+                        del mat[self.MATERIAL_PARAMS_TAG]
                     print(f"Set material color to {color}")
             
             # Assign material to object if not already assigned
             if mat:
-                if not obj.data.materials:
-                    obj.data.materials.append(mat)
-                else:
-                    # Only modify first material slot
-                    obj.data.materials[0] = mat
+                self._assign_material(obj, mat)
                 
                 print(f"Assigned material {mat.name} to object {object_name}")
                 
@@ -635,6 +3331,52 @@ class BlenderMCPServer:
         except Exception as e:
             return {"error": str(e)}
     
+    def _download_texture_maps(self, asset_id, files_data, resolution, file_format, image_prefix):
+        """Download every map of a texture at one resolution into the texture cache and load it"""
+        downloaded_maps = {}
+        for map_type in files_data:
+            if map_type not in ["blend", "gltf"]:  # Skip non-texture files
+                if resolution in files_data[map_type] and file_format in files_data[map_type][resolution]:
+                    file_info = files_data[map_type][resolution][file_format]
+                    file_url = file_info["url"]
+                    
+                    # Files are kept in the texture cache so they can be referenced
+                    # instead of packed, and are not downloaded twice
+                    file_path = os.path.join(
+                        _texture_cache_dir(), f"{asset_id}_{map_type}_{resolution}.{file_format}")
+                    if not os.path.exists(file_path):
+                        response = requests.get(file_url)
+                        if response.status_code != 200:
+                            continue
+                        with open(file_path + ".part", "wb") as f:
+                            f.write(response.content)
+                        os.replace(file_path + ".part", file_path)
+                    
+                    image = bpy.data.images.load(file_path, check_existing=True)
+                    image.name = f"{image_prefix}_{map_type}.{file_format}"
+                    # Lets upgrade_textures find the texture behind an image node
+                    image["blendermcp_texture"] = asset_id
+                    image["blendermcp_map"] = map_type
+                    image["blendermcp_resolution"] = resolution
+                    
+                    # Pack the image into .blend file, depending on the storage policy
+                    _store_texture_image(image)
+                    
+                    # Set color space based on map type
+                    if map_type in ['color', 'diffuse', 'albedo']:
+                        try:
+                            image.colorspace_settings.name = 'sRGB'
+                        except:
+                            pass
+                    else:
+                        try:
+                            image.colorspace_settings.name = 'Non-Color'
+                        except:
+                            pass
+                    
+                    downloaded_maps[map_type] = image
+        return downloaded_maps
+
     def download_polyhaven_asset(self, asset_id, asset_type, resolution="1k", file_format=None):
         try:
             # First get the files information
@@ -742,53 +3484,16 @@ class BlenderMCPServer:
                 if not file_format:
                     file_format = "jpg"  # Default format for textures
                 
-                downloaded_maps = {}
-                
                 try:
-                    for map_type in files_data:
-                        if map_type not in ["blend", "gltf"]:  # Skip non-texture files
-                            if resolution in files_data[map_type] and file_format in files_data[map_type][resolution]:
-                                file_info = files_data[map_type][resolution][file_format]
-                                file_url = file_info["url"]
-                                
-                                # Use NamedTemporaryFile like we do for HDRIs
-                                with tempfile.NamedTemporaryFile(suffix=f".{file_format}", delete=False) as tmp_file:
-                                    # Download the file
-                                    response = requests.get(file_url)
-                                    if response.status_code == 200:
-                                        tmp_file.write(response.content)
-                                        tmp_path = tmp_file.name
-                                        
-                                        # Load image from temporary file
-                                        image = bpy.data.images.load(tmp_path)
-                                        image.name = f"{asset_id}_{map_type}.{file_format}"
-                                        
-                                        # Pack the image into .blend file
-                                        image.pack()
-                                        
-                                        # Set color space based on map type
-                                        if map_type in ['color', 'diffuse', 'albedo']:
-                                            try:
-                                                image.colorspace_settings.name = 'sRGB'
-                                            except:
-                                                pass
-                                        else:
-                                            try:
-                                                image.colorspace_settings.name = 'Non-Color'
-                                            except:
-                                                pass
-                                        
-                                        downloaded_maps[map_type] = image
-                                        
-                                        # Clean up temporary file
-                                        try:
-                                            os.unlink(tmp_path)
-                                        except:
-                                            pass
+                    downloaded_maps = self._download_texture_maps(
+                        asset_id, files_data, resolution, file_format, image_prefix=asset_id)
                 
                     if not downloaded_maps:
                         return {"error": f"No texture maps found for the requested resolution and format"}
                     
+                    # Images are loaded, packed and have their color space set already
+                    self.texture_registry.register(asset_id, downloaded_maps.values(), resolution)["prepared"] = True
+                    
                     # Create a new material with the downloaded textures
                     mat = bpy.data.materials.new(name=asset_id)
                     mat.use_nodes = True
@@ -936,12 +3641,17 @@ class BlenderMCPServer:
                             return {"error": f"Unsupported model format: {file_format}"}
                         
                         # Get the names of imported objects
-                        imported_objects = [obj.name for obj in bpy.context.selected_objects]
+                        imported = list(bpy.context.selected_objects)
+                        imported_objects = [obj.name for obj in imported]
+                        bounding_boxes = self._get_world_aabbs(imported)
                         
                         return {
                             "success": True, 
                             "message": f"Model {asset_id} imported successfully",
-                            "imported_objects": imported_objects
+                            "imported_objects": imported_objects,
+                            "world_bounding_boxes": {
+                                name: box for name, box in zip(imported_objects, bounding_boxes) if box
+                            }
                         }
                     except Exception as e:
                         return {"error": f"Failed to import model: {str(e)}"}
@@ -960,6 +3670,295 @@ class BlenderMCPServer:
         except Exception as e:
             return {"error": f"Failed to download asset: {str(e)}"}
 
+    def _build_texture_material(self, name, texture_images):
+        """Build a material wiring texture maps into a Principled BSDF"""
+        new_mat = bpy.data.materials.new(name=name)
+        new_mat.use_nodes = True
+
+        # Set up the material nodes
+        nodes = new_mat.node_tree.nodes
+        links = new_mat.node_tree.links
+
+        # Clear default nodes
+        nodes.clear()
+
+        # Create output node
+        output = nodes.new(type='ShaderNodeOutputMaterial')
+        output.location = (600, 0)
+
+        # Create principled BSDF node
+        principled = nodes.new(type='ShaderNodeBsdfPrincipled')
+        principled.location = (300, 0)
+        links.new(principled.outputs[0], output.inputs[0])
+
+        # Add texture nodes based on available maps
+        tex_coord = nodes.new(type='ShaderNodeTexCoord')
+        tex_coord.location = (-800, 0)
+
+        mapping = nodes.new(type='ShaderNodeMapping')
+        mapping.location = (-600, 0)
+        mapping.vector_type = 'TEXTURE'  # Changed from default 'POINT' to 'TEXTURE'
+        links.new(tex_coord.outputs['UV'], mapping.inputs['Vector'])
+
+        # Position offset for texture nodes
+        x_pos = -400
+        y_pos = 300
+
+        # Connect different texture maps
+        for map_type, image in texture_images.items():
+            tex_node = nodes.new(type='ShaderNodeTexImage')
+            tex_node.location = (x_pos, y_pos)
+            tex_node.image = image
+
+            # Set color space based on map type
+            if map_type.lower() in ['color', 'diffuse', 'albedo']:
+                try:
+                    tex_node.image.colorspace_settings.name = 'sRGB'
+                except:
+                    pass  # Use default if sRGB not available
+            else:
+                try:
+                    tex_node.image.colorspace_settings.name = 'Non-Color'
+                except:
+                    pass  # Use default if Non-Color not available
+
+            links.new(mapping.outputs['Vector'], tex_node.inputs['Vector'])
+
+            # Connect to appropriate input on Principled BSDF
+            if map_type.lower() in ['color', 'diffuse', 'albedo']:
+                links.new(tex_node.outputs['Color'], principled.inputs['Base Color'])
+            elif map_type.lower() in ['roughness', 'rough']:
+                links.new(tex_node.outputs['Color'], principled.inputs['Roughness'])
+            elif map_type.lower() in ['metallic', 'metalness', 'metal']:
+                links.new(tex_node.outputs['Color'], principled.inputs['Metallic'])
+            # Normal and displacement maps get their converter nodes in the second pass
+
+            y_pos -= 250
+
+        # Second pass: Connect nodes with proper handling for special cases
+        texture_nodes = {}
+
+        # First find all texture nodes and store them by map type
+        for node in nodes:
+            if node.type == 'TEX_IMAGE' and node.image:
+                for map_type, image in texture_images.items():
+                    if node.image == image:
+                        texture_nodes[map_type] = node
+                        break
+
+        # Now connect everything using the nodes instead of images
+        # Handle base color (diffuse)
+        for map_name in ['color', 'diffuse', 'albedo']:
+            if map_name in texture_nodes:
+                links.new(texture_nodes[map_name].outputs['Color'], principled.inputs['Base Color'])
+                break
+
+        # Handle roughness
+        for map_name in ['roughness', 'rough']:
+            if map_name in texture_nodes:
+                links.new(texture_nodes[map_name].outputs['Color'], principled.inputs['Roughness'])
+                break
+
+        # Handle metallic
+        for map_name in ['metallic', 'metalness', 'metal']:
+            if map_name in texture_nodes:
+                links.new(texture_nodes[map_name].outputs['Color'], principled.inputs['Metallic'])
+                break
+
+        # Handle normal maps
+        for map_name in ['gl', 'dx', 'nor', 'normal']:
+            if map_name in texture_nodes:
+                normal_map_node = nodes.new(type='ShaderNodeNormalMap')
+                normal_map_node.location = (100, 100)
+                links.new(texture_nodes[map_name].outputs['Color'], normal_map_node.inputs['Color'])
+                links.new(normal_map_node.outputs['Normal'], principled.inputs['Normal'])
+                break
+
+        # Handle displacement
+        for map_name in ['displacement', 'disp', 'height']:
+            if map_name in texture_nodes:
+                disp_node = nodes.new(type='ShaderNodeDisplacement')
+                disp_node.location = (300, -200)
+                disp_node.inputs['Scale'].default_value = 0.1  # Reduce displacement strength
+                links.new(texture_nodes[map_name].outputs['Color'], disp_node.inputs['Height'])
+                links.new(disp_node.outputs['Displacement'], output.inputs['Displacement'])
+                break
+
+        # Handle ARM texture (Ambient Occlusion, Roughness, Metallic)
+        if 'arm' in texture_nodes:
+            separate_rgb = nodes.new(type='ShaderNodeSeparateRGB')
+            separate_rgb.location = (-200, -100)
+            links.new(texture_nodes['arm'].outputs['Color'], separate_rgb.inputs['Image'])
+
+            # Connect Roughness (G) if no dedicated roughness map
+            if not any(map_name in texture_nodes for map_name in ['roughness', 'rough']):
+                links.new(separate_rgb.outputs['G'], principled.inputs['Roughness'])
+
+            # Connect Metallic (B) if no dedicated metallic map
+            if not any(map_name in texture_nodes for map_name in ['metallic', 'metalness', 'metal']):
+                links.new(separate_rgb.outputs['B'], principled.inputs['Metallic'])
+
+            # For AO (R channel), multiply with base color if we have one
+            base_color_node = None
+            for map_name in ['color', 'diffuse', 'albedo']:
+                if map_name in texture_nodes:
+                    base_color_node = texture_nodes[map_name]
+                    break
+
+            if base_color_node:
+                mix_node = nodes.new(type='ShaderNodeMixRGB')
+                mix_node.location = (100, 200)
+                mix_node.blend_type = 'MULTIPLY'
+                mix_node.inputs['Fac'].default_value = 0.8  # 80% influence
+
+                # Disconnect direct connection to base color
+                for link in base_color_node.outputs['Color'].links:
+                    if link.to_socket == principled.inputs['Base Color']:
+                        links.remove(link)
+
+                # Connect through the mix node
+                links.new(base_color_node.outputs['Color'], mix_node.inputs[1])
+                links.new(separate_rgb.outputs['R'], mix_node.inputs[2])
+                links.new(mix_node.outputs['Color'], principled.inputs['Base Color'])
+
+        # Handle AO (Ambient Occlusion) if separate
+        if 'ao' in texture_nodes:
+            base_color_node = None
+            for map_name in ['color', 'diffuse', 'albedo']:
+                if map_name in texture_nodes:
+                    base_color_node = texture_nodes[map_name]
+                    break
+
+            if base_color_node:
+                mix_node = nodes.new(type='ShaderNodeMixRGB')
+                mix_node.location = (100, 200)
+                mix_node.blend_type = 'MULTIPLY'
+                mix_node.inputs['Fac'].default_value = 0.8  # 80% influence
+
+                # Disconnect direct connection to base color
+                for link in base_color_node.outputs['Color'].links:
+                    if link.to_socket == principled.inputs['Base Color']:
+                        links.remove(link)
+
+                # Connect through the mix node
+                links.new(base_color_node.outputs['Color'], mix_node.inputs[1])
+                links.new(texture_nodes['ao'].outputs['Color'], mix_node.inputs[2])
+                links.new(mix_node.outputs['Color'], principled.inputs['Base Color'])
+        
+        return new_mat
+
+    TEXTURE_RESOLUTIONS = ("1k", "2k", "4k", "8k")
+
+    def _screen_sizes(self, objects, camera):
+        """Approximate size in pixels of each object's bounding sphere in the camera view, 0 when not visible"""
+        render = bpy.context.scene.render
+        scale = render.resolution_percentage / 100
+        width, height = render.resolution_x * scale, render.resolution_y * scale
+        frame = max(width, height)
+
+        boxes = self._get_world_aabbs(objects)
+        sizes = np.zeros(len(objects))
+        present = [index for index, box in enumerate(boxes) if box is not None]
+        if not present:
+            return sizes.tolist()
+        boxes = np.array([boxes[index] for index in present], dtype=np.float64)
+        to_camera = np.array(camera.matrix_world.inverted(), dtype=np.float64)
+        centers = (boxes[:, 0] + boxes[:, 1]) / 2 @ to_camera[:3, :3].T + to_camera[:3, 3]
+        radii = np.linalg.norm(boxes[:, 1] - boxes[:, 0], axis=1) / 2
+        depth = -centers[:, 2]  # Cameras look down their local -Z
+
+        data = camera.data
+        if data.type == 'ORTHO':
+            half_view = np.full(len(present), data.ortho_scale / 2)
+            projected = 2 * radii / data.ortho_scale * frame
+        else:
+            half_view = np.maximum(depth, data.clip_start) * math.tan(data.angle / 2)
+            projected = radii / half_view * frame
+        visible = (
+            (depth + radii > data.clip_start)
+            & (np.abs(centers[:, 0]) - radii <= half_view * width / frame)
+            & (np.abs(centers[:, 1]) - radii <= half_view * height / frame)
+        )
+        sizes[present] = np.where(visible, projected, 0.0)
+        return sizes.tolist()
+
+    def upgrade_textures(self, object_names=None, max_resolution="4k", camera=None, texel_ratio=1.0, dry_run=False):
+        """Swap downloaded textures for higher resolutions where objects are large in the camera view.
+
+        Textures are assumed to span an object about once, so an object covering
+        N pixels gets the smallest resolution with at least N * texel_ratio texels.
+        Materials shared by several objects follow the largest of them.
+        """
+        if max_resolution not in self.TEXTURE_RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {max_resolution}. Must be one of {', '.join(self.TEXTURE_RESOLUTIONS)}")
+        scene = bpy.context.scene
+        camera_obj = bpy.data.objects.get(camera) if camera else scene.camera
+        if camera_obj is None or camera_obj.type != 'CAMERA':
+            raise ValueError(f"Camera not found: {camera}" if camera else "The scene has no active camera")
+
+        if object_names:
+            objects = self._select_objects(object_names)
+        else:
+            objects = [obj for obj in scene.objects if obj.type == 'MESH' and obj.visible_get()]
+        sizes = self._screen_sizes(objects, camera_obj)
+
+        # Largest on-screen size among the users of each material
+        needed = {}
+        users = collections.defaultdict(list)
+        for obj, size in zip(objects, sizes):
+            for slot in obj.material_slots:
+                mat = slot.material
+                if mat is not None and mat.use_nodes:
+                    needed[mat.name] = max(needed.get(mat.name, 0.0), size)
+                    users[mat.name].append(obj.name)
+
+        resolutions = [res for res in self.TEXTURE_RESOLUTIONS
+                       if int(res[:-1]) <= int(max_resolution[:-1])]
+        plan = collections.defaultdict(list)  # (texture_id, resolution, file format) -> [(material, node)]
+        for mat_name, size in needed.items():
+            mat = bpy.data.materials[mat_name]
+            target = next((res for res in resolutions if int(res[:-1]) * 1024 >= size * texel_ratio),
+                          resolutions[-1])
+            for node in mat.node_tree.nodes:
+                image = node.image if node.type == 'TEX_IMAGE' else None
+                if image is None or "blendermcp_texture" not in image:
+                    continue
+                current = image.get("blendermcp_resolution") or f"{max(1, round(max(image.size) / 1024))}k"
+                if int(target[:-1]) <= int(current[:-1]):
+                    continue
+                file_format = os.path.splitext(image.filepath)[1][1:] or "jpg"
+                plan[(image["blendermcp_texture"], target, file_format)].append((mat, node))
+
+        upgrades = [
+            {
+                "texture": texture_id,
+                "resolution": resolution,
+                "materials": sorted({mat.name for mat, _ in nodes}),
+                "objects": sorted({name for mat, _ in nodes for name in users[mat.name]}),
+            }
+            for (texture_id, resolution, _), nodes in plan.items()
+        ]
+        if dry_run:
+            return {"camera": camera_obj.name, "dry_run": True, "upgrades": upgrades}
+
+        files = {}
+        for (texture_id, resolution, file_format), nodes in plan.items():
+            if texture_id not in files:
+                response = requests.get(f"https://api.polyhaven.com/files/{texture_id}")
+                if response.status_code != 200:
+                    raise RuntimeError(f"Failed to get files of texture {texture_id}: {response.status_code}")
+                files[texture_id] = response.json()
+            # A different name prefix keeps these out of the registry lookup by texture_id
+            maps = self._download_texture_maps(texture_id, files[texture_id], resolution, file_format,
+                                               image_prefix=f"{texture_id}@{resolution}")
+            for mat, node in nodes:
+                image = maps.get(node.image["blendermcp_map"])
+                if image is not None:
+                    self._touch(mat)
+                    node.image = image
+
+        return {"camera": camera_obj.name, "dry_run": False, "upgrades": upgrades}
+
     def set_texture(self, object_name, texture_id):
         """Apply a previously downloaded Polyhaven texture to an object by creating a new material"""
         try:
@@ -973,14 +3972,16 @@ class BlenderMCPServer:
                 return {"error": f"Object {object_name} cannot accept materials"}
             
             # Find all images related to this texture and ensure they're properly loaded
-            texture_images = {}
-            for img in bpy.data.images:
-                if img.name.startswith(texture_id + "_"):
-                    # Extract the map type from the image name
-                    map_type = img.name.split('_')[-1].split('.')[0]
-                    
-                    # Force a reload of the image
-                    img.reload()
+            entry, texture_images = self.texture_registry.lookup(texture_id)
+            if not texture_images:
+                return {"error": f"No texture images found for: {texture_id}. Please download the texture first."}
+
+            # Color space and packing only need to be set up once per texture
+            if not entry["prepared"]:
+                for map_type, img in texture_images.items():
+                    # Load the image if it was never read
+                    if not img.has_data:
+                        img.reload()
                     
                     # Ensure proper color space
                     if map_type.lower() in ['color', 'diffuse', 'albedo']:
@@ -994,21 +3995,12 @@ class BlenderMCPServer:
                         except:
                             pass
                     
-                    # Ensure the image is packed
-                    if not img.packed_file:
-                        img.pack()
+                    # Ensure the image is packed, depending on the storage policy
+                    _store_texture_image(img)
                     
-                    texture_images[map_type] = img
-                    print(f"Loaded texture map: {map_type} - {img.name}")
-                    
-                    # Debug info
-                    print(f"Image size: {img.size[0]}x{img.size[1]}")
-                    print(f"Color space: {img.colorspace_settings.name}")
-                    print(f"File format: {img.file_format}")
-                    print(f"Is packed: {bool(img.packed_file)}")
-
-            if not texture_images:
-                return {"error": f"No texture images found for: {texture_id}. Please download the texture first."}
+                    print(f"Loaded texture map: {map_type} - {img.name} ({img.size[0]}x{img.size[1]}, "
+                          f"{img.colorspace_settings.name}, packed: {bool(img.packed_file)})")
+                entry["prepared"] = True
             
             # Create a new material
             new_mat_name = f"{texture_id}_material_{object_name}"
@@ -1018,206 +4010,25 @@ class BlenderMCPServer:
             if existing_mat:
                 bpy.data.materials.remove(existing_mat)
             
-            new_mat = bpy.data.materials.new(name=new_mat_name)
-            new_mat.use_nodes = True
-            
-            # Set up the material nodes
-            nodes = new_mat.node_tree.nodes
-            links = new_mat.node_tree.links
-            
-            # Clear default nodes
-            nodes.clear()
-            
-            # Create output node
-            output = nodes.new(type='ShaderNodeOutputMaterial')
-            output.location = (600, 0)
-            
-            # Create principled BSDF node
-            principled = nodes.new(type='ShaderNodeBsdfPrincipled')
-            principled.location = (300, 0)
-            links.new(principled.outputs[0], output.inputs[0])
-            
-            # Add texture nodes based on available maps
-            tex_coord = nodes.new(type='ShaderNodeTexCoord')
-            tex_coord.location = (-800, 0)
-            
-            mapping = nodes.new(type='ShaderNodeMapping')
-            mapping.location = (-600, 0)
-            mapping.vector_type = 'TEXTURE'  # Changed from default 'POINT' to 'TEXTURE'
-            links.new(tex_coord.outputs['UV'], mapping.inputs['Vector'])
+            # The node setup is built once per texture and copied for every object
+            template = self.texture_registry.template(entry, texture_id)
+            if template is None:
+                template = self._build_texture_material(f"{texture_id}_template", texture_images)
+                self.texture_registry.set_template(entry, texture_id, template)
+            new_mat = template.copy()
+            del new_mat[_TextureRegistry.TEMPLATE_TAG]
+            new_mat.name = new_mat_name
             
-            # Position offset for texture nodes
-            x_pos = -400
-            y_pos = 300
-            
-            # Connect different texture maps
-            for map_type, image in texture_images.items():
-                tex_node = nodes.new(type='ShaderNodeTexImage')
-                tex_node.location = (x_pos, y_pos)
-                tex_node.image = image
-                
-                # Set color space based on map type
-                if map_type.lower() in ['color', 'diffuse', 'albedo']:
-                    try:
-                        tex_node.image.colorspace_settings.name = 'sRGB'
-                    except:
-                        pass  # Use default if sRGB not available
-                else:
-                    try:
-                        tex_node.image.colorspace_settings.name = 'Non-Color'
-                    except:
-                        pass  # Use default if Non-Color not available
-                
-                links.new(mapping.outputs['Vector'], tex_node.inputs['Vector'])
-                
-                # Connect to appropriate input on Principled BSDF
-                if map_type.lower() in ['color', 'diffuse', 'albedo']:
-                    links.new(tex_node.outputs['Color'], principled.inputs['Base Color'])
-                elif map_type.lower() in ['roughness', 'rough']:
-                    links.new(tex_node.outputs['Color'], principled.inputs['Roughness'])
-                elif map_type.lower() in ['metallic', 'metalness', 'metal']:
-                    links.new(tex_node.outputs['Color'], principled.inputs['Metallic'])
-                elif map_type.lower() in ['normal', 'nor', 'dx', 'gl']:
-                    # Add normal map node
-                    normal_map = nodes.new(type='ShaderNodeNormalMap')
-                    normal_map.location = (x_pos + 200, y_pos)
-                    links.new(tex_node.outputs['Color'], normal_map.inputs['Color'])
-                    links.new(normal_map.outputs['Normal'], principled.inputs['Normal'])
-                elif map_type.lower() in ['displacement', 'disp', 'height']:
-                    # Add displacement node
-                    disp_node = nodes.new(type='ShaderNodeDisplacement')
-                    disp_node.location = (x_pos + 200, y_pos - 200)
-                    disp_node.inputs['Scale'].default_value = 0.1  # Reduce displacement strength
-                    links.new(tex_node.outputs['Color'], disp_node.inputs['Height'])
-                    links.new(disp_node.outputs['Displacement'], output.inputs['Displacement'])
-                
-                y_pos -= 250
-            
-            # Second pass: Connect nodes with proper handling for special cases
-            texture_nodes = {}
-            
-            # First find all texture nodes and store them by map type
-            for node in nodes:
-                if node.type == 'TEX_IMAGE' and node.image:
-                    for map_type, image in texture_images.items():
-                        if node.image == image:
-                            texture_nodes[map_type] = node
-                            break
-            
-            # Now connect everything using the nodes instead of images
-            # Handle base color (diffuse)
-            for map_name in ['color', 'diffuse', 'albedo']:
-                if map_name in texture_nodes:
-                    links.new(texture_nodes[map_name].outputs['Color'], principled.inputs['Base Color'])
-                    print(f"Connected {map_name} to Base Color")
-                    break
-            
-            # Handle roughness
-            for map_name in ['roughness', 'rough']:
-                if map_name in texture_nodes:
-                    links.new(texture_nodes[map_name].outputs['Color'], principled.inputs['Roughness'])
-                    print(f"Connected {map_name} to Roughness")
-                    break
-            
-            # Handle metallic
-            for map_name in ['metallic', 'metalness', 'metal']:
-                if map_name in texture_nodes:
-                    links.new(texture_nodes[map_name].outputs['Color'], principled.inputs['Metallic'])
-                    print(f"Connected {map_name} to Metallic")
-                    break
-            
-            # Handle normal maps
-            for map_name in ['gl', 'dx', 'nor']:
-                if map_name in texture_nodes:
-                    normal_map_node = nodes.new(type='ShaderNodeNormalMap')
-                    normal_map_node.location = (100, 100)
-                    links.new(texture_nodes[map_name].outputs['Color'], normal_map_node.inputs['Color'])
-                    links.new(normal_map_node.outputs['Normal'], principled.inputs['Normal'])
-                    print(f"Connected {map_name} to Normal")
-                    break
-            
-            # Handle displacement
-            for map_name in ['displacement', 'disp', 'height']:
-                if map_name in texture_nodes:
-                    disp_node = nodes.new(type='ShaderNodeDisplacement')
-                    disp_node.location = (300, -200)
-                    disp_node.inputs['Scale'].default_value = 0.1  # Reduce displacement strength
-                    links.new(texture_nodes[map_name].outputs['Color'], disp_node.inputs['Height'])
-                    links.new(disp_node.outputs['Displacement'], output.inputs['Displacement'])
-                    print(f"Connected {map_name} to Displacement")
-                    break
-            
-            # Handle ARM texture (Ambient Occlusion, Roughness, Metallic)
-            if 'arm' in texture_nodes:
-                separate_rgb = nodes.new(type='ShaderNodeSeparateRGB')
-                separate_rgb.location = (-200, -100)
-                links.new(texture_nodes['arm'].outputs['Color'], separate_rgb.inputs['Image'])
-                
-                # Connect Roughness (G) if no dedicated roughness map
-                if not any(map_name in texture_nodes for map_name in ['roughness', 'rough']):
-                    links.new(separate_rgb.outputs['G'], principled.inputs['Roughness'])
-                    print("Connected ARM.G to Roughness")
-                
-                # Connect Metallic (B) if no dedicated metallic map
-                if not any(map_name in texture_nodes for map_name in ['metallic', 'metalness', 'metal']):
-                    links.new(separate_rgb.outputs['B'], principled.inputs['Metallic'])
-                    print("Connected ARM.B to Metallic")
-                
-                # For AO (R channel), multiply with base color if we have one
-                base_color_node = None
-                for map_name in ['color', 'diffuse', 'albedo']:
-                    if map_name in texture_nodes:
-                        base_color_node = texture_nodes[map_name]
-                        break
-                
-                if base_color_node:
-                    mix_node = nodes.new(type='ShaderNodeMixRGB')
-                    mix_node.location = (100, 200)
-                    mix_node.blend_type = 'MULTIPLY'
-                    mix_node.inputs['Fac'].default_value = 0.8  # 80% influence
-                    
-                    # Disconnect direct connection to base color
-                    for link in base_color_node.outputs['Color'].links:
-                        if link.to_socket == principled.inputs['Base Color']:
-                            links.remove(link)
-                    
-                    # Connect through the mix node
-                    links.new(base_color_node.outputs['Color'], mix_node.inputs[1])
-                    links.new(separate_rgb.outputs['R'], mix_node.inputs[2])
-                    links.new(mix_node.outputs['Color'], principled.inputs['Base Color'])
-                    print("Connected ARM.R to AO mix with Base Color")
-            
-            # Handle AO (Ambient Occlusion) if separate
-            if 'ao' in texture_nodes:
-                base_color_node = None
-                for map_name in ['color', 'diffuse', 'albedo']:
-                    if map_name in texture_nodes:
-                        base_color_node = texture_nodes[map_name]
-                        break
+            if obj.data.users > 1:
+                # Shared data: only this object gets the texture
+                self._assign_material(obj, new_mat)
+            else:
+                # CRITICAL: Make sure to clear all existing materials from the object
+                while len(obj.data.materials) > 0:
+                    obj.data.materials.pop(index=0)
                 
-                if base_color_node:
-                    mix_node = nodes.new(type='ShaderNodeMixRGB')
-                    mix_node.location = (100, 200)
-                    mix_node.blend_type = 'MULTIPLY'
-                    mix_node.inputs['Fac'].default_value = 0.8  # 80% influence
-                    
-                    # Disconnect direct connection to base color
-                    for link in base_color_node.outputs['Color'].links:
-                        if link.to_socket == principled.inputs['Base Color']:
-                            links.remove(link)
-                    
-                    # Connect through the mix node
-                    links.new(base_color_node.outputs['Color'], mix_node.inputs[1])
-                    links.new(texture_nodes['ao'].outputs['Color'], mix_node.inputs[2])
-                    links.new(mix_node.outputs['Color'], principled.inputs['Base Color'])
-                    print("Connected AO to mix with Base Color")
-            
-            # CRITICAL: Make sure to clear all existing materials from the object
-            while len(obj.data.materials) > 0:
-                obj.data.materials.pop(index=0)
-            
-            # Assign the new material to the object
-            obj.data.materials.append(new_mat)
+                # Assign the new material to the object
+                obj.data.materials.append(new_mat)
             
             # CRITICAL: Make the object active and select it
             bpy.context.view_layer.objects.active = obj
@@ -1264,6 +4075,82 @@ class BlenderMCPServer:
             traceback.print_exc()
             return {"error": f"Failed to apply texture: {str(e)}"}
 
+    def consolidate_textures(self, storage=None):
+        """Pack all textures referenced from the texture cache, optionally changing the storage policy"""
+        scene = bpy.context.scene
+        if storage is not None:
+            if storage not in ("PACK", "REFERENCE", "PACK_ON_SAVE"):
+                raise ValueError(f"Unknown texture storage: {storage}. Must be PACK, REFERENCE or PACK_ON_SAVE")
+            scene.blendermcp_texture_storage = storage
+        if scene.blendermcp_texture_storage == "REFERENCE":
+            packed, size = [], 0
+        else:
+            packed, size = _pack_cached_textures()
+        return {
+            "storage": scene.blendermcp_texture_storage,
+            "packed": len(packed),
+            "packed_bytes": size,
+            "cache_dir": _texture_cache_dir(),
+        }
+
+    def hello(self, client, shared_memory=None, codecs=None, compression=None, compress_threshold=None, **features):
+        """Negotiate optional protocol features with the connecting client.
+
+        Unknown features are ignored, so newer clients still connect. The
+        result lists what this connection will use.
+        """
+        client.codec = _choose_codec(codecs)
+        client.compression = _choose_compression(compression)
+        if compress_threshold is not None:
+            client.compress_threshold = max(int(compress_threshold), 0)
+        result = {
+            "protocol": FRAME_VERSION,
+            "codec": client.codec,
+            "compression": client.compression,
+            "shared_memory": False,
+        }
+        if shared_memory:
+            try:
+                rx_ring = _SharedMemoryRing(shared_memory["request"])
+                try:
+                    tx_ring = _SharedMemoryRing(shared_memory["response"])
+                except Exception:
+                    rx_ring.close()
+                    raise
+            except Exception as e:
+                # Typically a client on another machine; attachments stay on the socket
+                print(f"Could not attach shared memory: {str(e)}")
+                result["shared_memory_error"] = str(e)
+            else:
+                self._detach_rings(client)
+                client.rx_ring, client.tx_ring = rx_ring, tx_ring
+                result["shared_memory"] = True
+        return result
+
+    def get_metrics(self, format="json", reset=False):
+        """Per-command latency percentiles for each phase, or the raw histograms for Prometheus"""
+        if format == "prometheus":
+            result = {"format": "prometheus", "text": self.metrics.prometheus()}
+        elif format == "json":
+            result = self.metrics.snapshot()
+        else:
+            raise ValueError(f"Unknown metrics format: {format}. Must be json or prometheus")
+        if reset:
+            self.metrics.reset()
+        return result
+
+    def start_profiling(self, mode="cprofile", commands=None, interval=0.005):
+        """Start profiling command handlers until stop_profiling is called"""
+        self.profiler.start(mode, commands, interval)
+        return {"mode": mode, "commands": commands or "all"}
+
+    def stop_profiling(self, top=30, sort="cumulative", save=False, save_path=None):
+        """Stop profiling and return the top functions; save writes .pstats (or collapsed stacks when sampling)"""
+        if save and not save_path:
+            suffix = ".pstats" if self.profiler.mode == "cprofile" else ".folded"
+            save_path = os.path.join(tempfile.gettempdir(), f"blendermcp_profile_{int(time.time())}{suffix}")
+        return self.profiler.stop(top=top, sort=sort, save_path=save_path)
+
     def get_polyhaven_status(self):
         """Get the current status of PolyHaven integration"""
         enabled = bpy.context.scene.blendermcp_use_polyhaven
@@ -1463,6 +4350,44 @@ class BlenderMCPServer:
         
         return mesh_obj
 
+    def _instantiate_cached_asset(self, key, name):
+        """Create a new object sharing the mesh of an asset that was already imported"""
+        mesh, matrix = self.geometry_cache.get(key)
+        if mesh is None:
+            return None
+        obj = bpy.data.objects.new(name or mesh.name, mesh)
+        if matrix is not None:
+            obj.matrix_basis = matrix
+        bpy.context.collection.objects.link(obj)
+        return obj
+
+    def _imported_asset_result(self, obj):
+        result = {
+            "name": obj.name,
+            "type": obj.type,
+            "location": [obj.location.x, obj.location.y, obj.location.z],
+            "rotation": [obj.rotation_euler.x, obj.rotation_euler.y, obj.rotation_euler.z],
+            "scale": [obj.scale.x, obj.scale.y, obj.scale.z],
+        }
+
+        bounding_box = self._get_aabb(obj)
+        if bounding_box:
+            result["world_bounding_box"] = bounding_box
+
+        return {
+            "succeed": True, **result
+        }
+
+    def _import_generated_glb(self, key, filepath, name):
+        obj = self._clean_imported_glb(
+            filepath=filepath,
+            mesh_name=name
+        )
+        if obj is None:
+            raise RuntimeError("Failed to import the generated model")
+        self.geometry_cache.put(key, obj.data, obj.matrix_basis)
+        return self._imported_asset_result(obj)
+
     def import_generated_asset(self, *args, **kwargs):
         match bpy.context.scene.blendermcp_hyper3d_mode:
             case "MAIN_SITE":
@@ -1474,6 +4399,12 @@ class BlenderMCPServer:
 
     def import_generated_asset_main_site(self, task_uuid: str, name: str):
         """Fetch the generated asset, import into blender"""
+        # Importing the same task again reuses the mesh instead of downloading it
+        key = self.geometry_cache.key("hyper3d", task_uuid)
+        obj = self._instantiate_cached_asset(key, name)
+        if obj is not None:
+            return {**self._imported_asset_result(obj), "cached": True}
+
         response = requests.post(
             "https://hyperhuman.deemos.com/api/v2/download",
             headers={
@@ -1514,30 +4445,17 @@ class BlenderMCPServer:
                 break
         
         try:
-            obj = self._clean_imported_glb(
-                filepath=temp_file.name,
-                mesh_name=name
-            )
-            result = {
-                "name": obj.name,
-                "type": obj.type,
-                "location": [obj.location.x, obj.location.y, obj.location.z],
-                "rotation": [obj.rotation_euler.x, obj.rotation_euler.y, obj.rotation_euler.z],
-                "scale": [obj.scale.x, obj.scale.y, obj.scale.z],
-            }
-
-            if obj.type == "MESH":
-                bounding_box = self._get_aabb(obj)
-                result["world_bounding_box"] = bounding_box
-            
-            return {
-                "succeed": True, **result
-            }
+            return self._import_generated_glb(key, temp_file.name, name)
         except Exception as e:
             return {"succeed": False, "error": str(e)}
     
     def import_generated_asset_fal_ai(self, request_id: str, name: str):
         """Fetch the generated asset, import into blender"""
+        key = self.geometry_cache.key("hyper3d", request_id)
+        obj = self._instantiate_cached_asset(key, name)
+        if obj is not None:
+            return {**self._imported_asset_result(obj), "cached": True}
+
         response = requests.get(
             f"https://queue.fal.run/fal-ai/hyper3d/requests/{request_id}",
             headers={
@@ -1572,29 +4490,85 @@ class BlenderMCPServer:
             return {"succeed": False, "error": str(e)}
 
         try:
-            obj = self._clean_imported_glb(
-                filepath=temp_file.name,
-                mesh_name=name
-            )
-            result = {
-                "name": obj.name,
-                "type": obj.type,
-                "location": [obj.location.x, obj.location.y, obj.location.z],
-                "rotation": [obj.rotation_euler.x, obj.rotation_euler.y, obj.rotation_euler.z],
-                "scale": [obj.scale.x, obj.scale.y, obj.scale.z],
-            }
-
-            if obj.type == "MESH":
-                bounding_box = self._get_aabb(obj)
-                result["world_bounding_box"] = bounding_box
-            
-            return {
-                "succeed": True, **result
-            }
+            return self._import_generated_glb(key, temp_file.name, name)
         except Exception as e:
             return {"succeed": False, "error": str(e)}
     #endregion
 
+@bpy.app.handlers.persistent
+def _on_depsgraph_update(scene, depsgraph):
+    server = getattr(bpy.types, "blendermcp_server", None)
+    if server:
+        server.spatial_index.on_depsgraph_update(depsgraph)
+
+@bpy.app.handlers.persistent
+def _on_load_post(*args):
+    server = getattr(bpy.types, "blendermcp_server", None)
+    if server:
+        server.spatial_index.invalidate()
+        server.geometry_cache.clear()
+        server.texture_registry.clear()
+
+def _texture_cache_dir():
+    """Directory downloaded textures are kept in, from the addon setting or Blender's user data"""
+    path = bpy.context.scene.blendermcp_texture_cache_dir
+    if path:
+        path = bpy.path.abspath(path)
+    else:
+        path = bpy.utils.user_resource('DATAFILES', path="blendermcp_textures")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _store_texture_image(image):
+    """Pack a texture right away only when the storage policy asks for it"""
+    if bpy.context.scene.blendermcp_texture_storage == "PACK" and not image.packed_file:
+        image.pack()
+
+def _pack_cached_textures():
+    """Pack every downloaded texture that still references its cache file; returns (images packed, bytes).
+
+    Downloaded images carry the blendermcp_texture tag, so this doesn't
+    depend on where the cache directory is now.
+    """
+    packed, size = [], 0
+    for image in bpy.data.images:
+        if image.get("blendermcp_texture") is None:
+            continue
+        if image.packed_file or image.source != 'FILE' or not image.filepath:
+            continue
+        if not os.path.exists(bpy.path.abspath(image.filepath)):
+            continue
+        image.pack()
+        packed.append(image)
+        size += image.packed_file.size
+    return packed, size
+
+_packed_for_save = []  # Names of the images _on_save_pre packed, to go back to references after saving
+
+@bpy.app.handlers.persistent
+def _on_save_pre(*args):
+    try:
+        if bpy.context.scene.blendermcp_texture_storage == "PACK_ON_SAVE":
+            packed, size = _pack_cached_textures()
+            _packed_for_save[:] = [image.name for image in packed]
+            if packed:
+                print(f"Packed {len(packed)} textures ({size / 1e6:.1f} MB) before saving")
+    except Exception as e:
+        print(f"Failed to pack textures before saving: {str(e)}")
+
+@bpy.app.handlers.persistent
+def _on_save_post(*args):
+    """Reference the cache files again, so only the saved file holds the packed copies"""
+    try:
+        for name in _packed_for_save:
+            image = bpy.data.images.get(name)
+            if image is not None and image.packed_file:
+                image.unpack(method='USE_ORIGINAL')
+    except Exception as e:
+        print(f"Failed to unpack textures after saving: {str(e)}")
+    finally:
+        _packed_for_save.clear()
+
 # Blender UI Panel
 class BLENDERMCP_PT_Panel(bpy.types.Panel):
     bl_label = "Blender MCP"
@@ -1608,7 +4582,12 @@ class BLENDERMCP_PT_Panel(bpy.types.Panel):
         scene = context.scene
         
         layout.prop(scene, "blendermcp_port")
+        layout.prop(scene, "blendermcp_socket_path")
+        layout.prop(scene, "blendermcp_max_clients")
         layout.prop(scene, "blendermcp_use_polyhaven", text="Use assets from Poly Haven")
+        if scene.blendermcp_use_polyhaven:
+            layout.prop(scene, "blendermcp_texture_storage", text="Textures")
+            layout.prop(scene, "blendermcp_texture_cache_dir", text="Cache")
 
         layout.prop(scene, "blendermcp_use_hyper3d", text="Use Hyper3D Rodin 3D model generation")
         if scene.blendermcp_use_hyper3d:
@@ -1621,6 +4600,8 @@ class BLENDERMCP_PT_Panel(bpy.types.Panel):
         else:
             layout.operator("blendermcp.stop_server", text="Stop MCP Server")
             layout.label(text=f"Running on port {scene.blendermcp_port}")
+            if scene.blendermcp_socket_path:
+                layout.label(text=f"and on {scene.blendermcp_socket_path}")
 
 # Operator to set Hyper3D API Key
 class BLENDERMCP_OT_SetFreeTrialHyper3DAPIKey(bpy.types.Operator):
@@ -1644,7 +4625,11 @@ class BLENDERMCP_OT_StartServer(bpy.types.Operator):
         
         # Create a new server instance
         if not hasattr(bpy.types, "blendermcp_server") or not bpy.types.blendermcp_server:
-            bpy.types.blendermcp_server = BlenderMCPServer(port=scene.blendermcp_port)
+            bpy.types.blendermcp_server = BlenderMCPServer(
+                port=scene.blendermcp_port,
+                max_clients=scene.blendermcp_max_clients,
+                socket_path=bpy.path.abspath(scene.blendermcp_socket_path) if scene.blendermcp_socket_path else None
+            )
         
         # Start the server
         bpy.types.blendermcp_server.start()
@@ -1679,6 +4664,21 @@ def register():
         min=1024,
         max=65535
     )
+
+    bpy.types.Scene.blendermcp_socket_path = StringProperty(
+        name="Socket Path",
+        description="Also listen on this Unix domain socket (e.g. /tmp/blender.sock); "
+                    "local clients connecting there can exchange large data through shared memory",
+        default=""
+    )
+
+    bpy.types.Scene.blendermcp_max_clients = IntProperty(
+        name="Max Clients",
+        description="Maximum number of clients that can be connected at the same time",
+        default=8,
+        min=1,
+        max=64
+    )
     
     bpy.types.Scene.blendermcp_server_running = bpy.props.BoolProperty(
         name="Server Running",
@@ -1691,6 +4691,24 @@ def register():
         default=False
     )
 
+    bpy.types.Scene.blendermcp_texture_storage = bpy.props.EnumProperty(
+        name="Texture Storage",
+        description="How downloaded textures are stored in the .blend file",
+        items=[
+            ("PACK", "Pack", "Pack textures into the .blend file as soon as they are downloaded"),
+            ("REFERENCE", "Reference", "Reference the files in the texture cache directory, never pack"),
+            ("PACK_ON_SAVE", "Pack on Save", "Reference the cached files while working and pack them when saving"),
+        ],
+        default="PACK_ON_SAVE"
+    )
+
+    bpy.types.Scene.blendermcp_texture_cache_dir = bpy.props.StringProperty(
+        name="Texture Cache",
+        subtype="DIR_PATH",
+        description="Directory for downloaded textures (empty: Blender's user data directory)",
+        default=""
+    )
+
     bpy.types.Scene.blendermcp_use_hyper3d = bpy.props.BoolProperty(
         name="Use Hyper3D Rodin",
         description="Enable Hyper3D Rodin generatino integration",
@@ -1718,6 +4736,11 @@ def register():
     bpy.utils.register_class(BLENDERMCP_OT_SetFreeTrialHyper3DAPIKey)
     bpy.utils.register_class(BLENDERMCP_OT_StartServer)
     bpy.utils.register_class(BLENDERMCP_OT_StopServer)
+
+    bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update)
+    bpy.app.handlers.load_post.append(_on_load_post)
+    bpy.app.handlers.save_pre.append(_on_save_pre)
+    bpy.app.handlers.save_post.append(_on_save_post)
     
     print("BlenderMCP addon registered")
 
@@ -1731,10 +4754,23 @@ def unregister():
     bpy.utils.unregister_class(BLENDERMCP_OT_SetFreeTrialHyper3DAPIKey)
     bpy.utils.unregister_class(BLENDERMCP_OT_StartServer)
     bpy.utils.unregister_class(BLENDERMCP_OT_StopServer)
+
+    if _on_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update)
+    if _on_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_load_post)
+    if _on_save_pre in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.remove(_on_save_pre)
+    if _on_save_post in bpy.app.handlers.save_post:
+        bpy.app.handlers.save_post.remove(_on_save_post)
     
     del bpy.types.Scene.blendermcp_port
+    del bpy.types.Scene.blendermcp_socket_path
+    del bpy.types.Scene.blendermcp_max_clients
     del bpy.types.Scene.blendermcp_server_running
     del bpy.types.Scene.blendermcp_use_polyhaven
+    del bpy.types.Scene.blendermcp_texture_storage
+    del bpy.types.Scene.blendermcp_texture_cache_dir
     del bpy.types.Scene.blendermcp_use_hyper3d
     del bpy.types.Scene.blendermcp_hyper3d_mode
     del bpy.types.Scene.blendermcp_hyper3d_api_key
@@ -0,0 +1,404 @@
+# protocol.py
+"""Framed wire protocol shared with the Blender addon.
+
+A frame is a fixed prefix, a header and the raw bytes of any binary
+attachments. The header is UTF-8 JSON, or MessagePack when both ends
+negotiated it. Large frames can be compressed as a whole: the prefix then
+keeps the uncompressed lengths and is followed by the compressed length.
+Attachments are referenced from the header through placeholders, so large
+arrays never go through base64 or ``json.dumps``.
+On the same machine, large attachments can instead travel through a
+shared-memory ring, leaving only their placeholders on the socket.
+The addon keeps its own copy of this code since it ships as a single file.
+"""
+import ast
+import json
+import struct
+import zlib
+from typing import Any, List, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FRAME_MAGIC = b"BMCP"
+FRAME_VERSION = 1
+FRAME_PREFIX = struct.Struct("!4sBBIQ")  # magic, version, flags, header length, attachments length
+ATTACHMENT_KEY = "__attachment__"
+_ATTACHMENT_MARKER = ATTACHMENT_KEY.encode('ascii')
+FLAG_SHARED_MEMORY = 0x01  # Some attachments are in the sender's shared-memory ring
+FLAG_MSGPACK = 0x02  # The header is MessagePack instead of JSON
+FLAG_ZLIB = 0x04  # Header and attachments are one zlib stream
+FLAG_ZSTD = 0x08  # Header and attachments are one Zstandard stream
+COMPRESSION_FLAGS = FLAG_ZLIB | FLAG_ZSTD
+COMPRESSED_LENGTH = struct.Struct("!Q")  # Follows the prefix of a compressed frame
+
+# Frames whose header and socket attachments are smaller than this are sent as they are
+COMPRESSION_THRESHOLD = 64 * 1024
+_INFLATE_CHUNK = 1024 * 1024  # Largest piece of output zlib produces at a time
+
+# Attachments smaller than this stay in the socket stream even when a ring is available
+SHARED_MEMORY_THRESHOLD = 64 * 1024
+
+_DTYPE_SIZES = {
+    "uint8": 1, "int8": 1, "bool": 1,
+    "uint16": 2, "int16": 2, "float16": 2,
+    "uint32": 4, "int32": 4, "float32": 4,
+    "uint64": 8, "int64": 8, "float64": 8,
+}
+
+
+def available_codecs() -> List[str]:
+    """Header codecs this side can decode, offered in the handshake in order of preference"""
+    return (["msgpack"] if msgpack is not None else []) + ["json"]
+
+
+def available_compressions() -> List[str]:
+    """Frame compressions this side supports, in order of preference"""
+    return (["zstd"] if zstandard is not None else []) + ["zlib"]
+
+
+def _default(value):
+    """Serialize NumPy scalars and arrays, which results sometimes contain"""
+    if hasattr(value, "item") and hasattr(value, "dtype"):
+        return value.item() if getattr(value, "ndim", 0) == 0 else value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def dumps_json(value: Any, default=_default) -> bytes:
+    """Compact JSON, encoded by orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits, which the stdlib encoder handles
+    return json.dumps(value, default=default, separators=(",", ":")).encode('utf-8')
+
+
+def loads_json(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(bytes(data).decode('utf-8'))
+
+
+def encode_header(value: Any, codec: str = "json", default=_default):
+    """Encode a frame header, returning (bytes, frame flags)"""
+    if codec == "msgpack":
+        return msgpack.packb(value, default=default, use_bin_type=True), FLAG_MSGPACK
+    return dumps_json(value, default), 0
+
+
+def decode_header(data: bytes, flags: int = 0) -> Any:
+    if flags & FLAG_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Received a MessagePack frame, but msgpack is not installed")
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    return loads_json(data)
+
+
+class BinaryAttachment:
+    """Raw binary data sent next to a JSON message instead of inside it"""
+
+    def __init__(self, data: Any, dtype: str = "uint8", shape: Optional[Sequence[int]] = None):
+        # Keep a view over the caller's buffer (bytes, bytearray, NumPy array) - no copy
+        view = memoryview(data)
+        self.data = view.cast("B") if view.nbytes else memoryview(b"")
+        self.dtype = str(dtype)
+        if shape is None:
+            shape = [len(self.data) // _DTYPE_SIZES.get(self.dtype, 1)]
+        self.shape = list(shape)
+
+    @classmethod
+    def from_array(cls, array) -> "BinaryAttachment":
+        """Wrap a C-contiguous NumPy array"""
+        return cls(array, dtype=array.dtype.name, shape=array.shape)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data)
+
+    def to_array(self):
+        """View the attachment as a NumPy array without copying (requires numpy)"""
+        import numpy as np
+        return np.frombuffer(self.data, dtype=self.dtype).reshape(self.shape)
+
+    def __repr__(self) -> str:
+        return f"BinaryAttachment(dtype={self.dtype!r}, shape={self.shape!r}, nbytes={self.nbytes})"
+
+
+class SharedMemoryRing:
+    """Single-producer, single-consumer byte ring in a shared-memory segment.
+
+    A 24-byte header holds the capacity and the write and read positions,
+    which only ever grow; data follows. Payloads never wrap around: one that
+    does not fit before the end starts over at the beginning. The MCP server
+    creates both rings of a connection and owns them; the addon attaches.
+    """
+    HEADER = struct.Struct("<QQQ")  # capacity, write position, read position
+
+    def __init__(self, name: Optional[str] = None, size: int = 64 * 1024 * 1024):
+        from multiprocessing import shared_memory
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.HEADER.size + size)
+            self.HEADER.pack_into(self.shm.buf, 0, size, 0, 0)
+            self.owner = True
+        else:
+            self.shm = _attach_shared_memory(shared_memory, name)
+            self.owner = False
+        self.capacity = self.HEADER.unpack_from(self.shm.buf, 0)[0]
+        self.data = self.shm.buf[self.HEADER.size:self.HEADER.size + self.capacity]
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def write(self, data: memoryview) -> Optional[int]:
+        """Copy data into the ring and return its position, or None when there is no room"""
+        _, written, read = self.HEADER.unpack_from(self.shm.buf, 0)
+        size = len(data)
+        start = written
+        if start % self.capacity + size > self.capacity:
+            start += self.capacity - start % self.capacity
+        if size > self.capacity or start + size - read > self.capacity:
+            return None
+        offset = start % self.capacity
+        self.data[offset:offset + size] = data
+        struct.pack_into("<Q", self.shm.buf, 8, start + size)
+        return start
+
+    def read(self, position: int, size: int) -> bytearray:
+        """Copy data out of the ring"""
+        offset = position % self.capacity
+        return bytearray(self.data[offset:offset + size])
+
+    def release(self, end: int) -> None:
+        """Give the space up to position `end` back to the producer"""
+        struct.pack_into("<Q", self.shm.buf, 16, end)
+
+    def close(self) -> None:
+        self.data.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _attach_shared_memory(shared_memory, name):
+    """Attach to a segment without registering it with this process's resource tracker"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        segment = shared_memory.SharedMemory(name=name)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
+
+
+def encode_frame(message: Any, ring: Optional[SharedMemoryRing] = None, codec: str = "json") -> List[memoryview]:
+    """Encode a message into a list of buffers ready to be written in order.
+
+    With a ring, large attachments are copied into it and only their
+    placeholders are sent; they fall back to the socket when the ring is full.
+    Attachments are swapped for placeholders by the encoder's default hook,
+    so the message is walked once, in C.
+    """
+    attachments = []
+    offset = 0
+    flags = 0
+    placeholders = {}  # id(attachment) -> placeholder, in case the encoder retries
+
+    def extract(value):
+        nonlocal offset, flags
+        if not isinstance(value, BinaryAttachment):
+            return _default(value)
+        placeholder = placeholders.get(id(value))
+        if placeholder is not None:
+            return placeholder
+        placeholder = placeholders[id(value)] = {
+            ATTACHMENT_KEY: len(attachments),
+            "nbytes": value.nbytes,
+            "dtype": value.dtype,
+            "shape": value.shape,
+        }
+        if ring is not None and value.nbytes >= SHARED_MEMORY_THRESHOLD:
+            position = ring.write(value.data)
+            if position is not None:
+                placeholder["shm"] = position
+                flags |= FLAG_SHARED_MEMORY
+                return placeholder
+        placeholder["offset"] = offset
+        attachments.append(value.data)
+        offset += value.nbytes
+        return placeholder
+
+    header, codec_flags = encode_header(message, codec, extract)
+    flags |= codec_flags
+    prefix = FRAME_PREFIX.pack(FRAME_MAGIC, FRAME_VERSION, flags, len(header), offset)
+    return [memoryview(prefix + header), *attachments]
+
+
+def compress_frame(buffers: List[memoryview], compression: Optional[str] = None,
+                   threshold: int = COMPRESSION_THRESHOLD) -> List[memoryview]:
+    """Compress an encoded frame's header and attachments when that makes it smaller.
+
+    Frames below the threshold, and ones that barely shrink (images are
+    already compressed), are returned unchanged.
+    """
+    if not compression:
+        return buffers
+    payload = [buffers[0][FRAME_PREFIX.size:], *buffers[1:]]
+    size = sum(len(buffer) for buffer in payload)
+    if size < threshold:
+        return buffers
+    if compression == "zstd":
+        compressor, flag = zstandard.ZstdCompressor(level=3).compressobj(), FLAG_ZSTD
+    else:
+        compressor, flag = zlib.compressobj(1), FLAG_ZLIB
+    parts = [compressor.compress(buffer) for buffer in payload]
+    parts.append(compressor.flush())
+    compressed = sum(len(part) for part in parts)
+    if compressed > size * 0.9:
+        return buffers
+    magic, version, flags, header_length, attachments_length = FRAME_PREFIX.unpack(buffers[0][:FRAME_PREFIX.size])
+    head = FRAME_PREFIX.pack(magic, version, flags | flag, header_length, attachments_length)
+    return [memoryview(head + COMPRESSED_LENGTH.pack(compressed)), *(memoryview(part) for part in parts if part)]
+
+
+class Inflater:
+    """Decompresses a frame as it arrives, straight into its preallocated buffer.
+
+    Only the decompressed frame is ever held in full; compressed data is
+    fed in socket-sized chunks.
+    """
+
+    def __init__(self, flags: int, header_length: int, attachments_length: int, compressed_length: int):
+        if flags & FLAG_ZSTD:
+            if zstandard is None:
+                raise ValueError("Received a Zstandard frame, but zstandard is not installed")
+            self.decompressor = zstandard.ZstdDecompressor().decompressobj()
+        else:
+            self.decompressor = zlib.decompressobj()
+        self.zlib = not flags & FLAG_ZSTD
+        self.header_length = header_length
+        self.plain = bytearray(header_length + attachments_length)
+        self.filled = 0
+        self.remaining = compressed_length
+
+    def feed(self, data) -> bool:
+        """Decompress the next chunk; True once the whole frame is in"""
+        self.remaining -= len(data)
+        if self.zlib:
+            # Bound each piece of output, so a highly compressed chunk doesn't expand all at once
+            while data:
+                self._write(self.decompressor.decompress(data, _INFLATE_CHUNK))
+                data = self.decompressor.unconsumed_tail
+            if not self.remaining:
+                self._write(self.decompressor.flush())
+        else:
+            self._write(self.decompressor.decompress(data))
+        return not self.remaining
+
+    def _write(self, chunk: bytes) -> None:
+        end = self.filled + len(chunk)
+        if end > len(self.plain):
+            raise ValueError("Decompressed frame is larger than its prefix says")
+        self.plain[self.filled:end] = chunk
+        self.filled = end
+
+    def frame(self):
+        """(header, body) of the decompressed frame, for decode_frame"""
+        if self.filled != len(self.plain):
+            raise ValueError("Decompressed frame is shorter than its prefix says")
+        return bytes(self.plain[:self.header_length]), memoryview(self.plain)[self.header_length:]
+
+
+def decode_frame(header: bytes, body: bytearray, ring: Optional[SharedMemoryRing] = None, flags: int = 0) -> Any:
+    """Decode a frame header, turning attachment placeholders into views over body.
+
+    Attachments in the peer's shared-memory ring are copied out, and their
+    space is released before returning.
+    """
+    view = memoryview(body)
+    ring_end = None
+
+    def resolve(value):
+        nonlocal ring_end
+        if isinstance(value, dict):
+            if ATTACHMENT_KEY in value:
+                if "shm" in value:
+                    if ring is None:
+                        raise ValueError("Frame refers to shared memory, but none was negotiated")
+                    data = ring.read(value["shm"], value["nbytes"])
+                    ring_end = max(ring_end or 0, value["shm"] + value["nbytes"])
+                    return BinaryAttachment(data, value["dtype"], value["shape"])
+                start = value["offset"]
+                return BinaryAttachment(view[start:start + value["nbytes"]], value["dtype"], value["shape"])
+            return {key: resolve(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [resolve(item) for item in value]
+        return value
+
+    message = decode_header(header, flags)
+    if _ATTACHMENT_MARKER not in header:
+        # Most frames carry no attachments; don't walk them
+        return message
+    message = resolve(message)
+    if ring_end is not None:
+        ring.release(ring_end)
+    return message
+
+
+# Attachments are stored on disk as .npy files so they can be read with
+# numpy.load, without the server itself depending on NumPy.
+_NPY_MAGIC = b"\x93NUMPY"
+_NPY_DESCR = {
+    "uint8": "|u1", "int8": "|i1", "bool": "|b1",
+    "uint16": "<u2", "int16": "<i2", "float16": "<f2",
+    "uint32": "<u4", "int32": "<i4", "float32": "<f4",
+    "uint64": "<u8", "int64": "<i8", "float64": "<f8",
+}
+
+
+def write_npy(path: str, attachment: BinaryAttachment) -> None:
+    """Write an attachment as a version 1.0 .npy file"""
+    shape = "(" + "".join(f"{size}, " for size in attachment.shape) + ")"
+    header = f"{{'descr': '{_NPY_DESCR[attachment.dtype]}', 'fortran_order': False, 'shape': {shape}, }}"
+    # Header is padded with spaces and ends with a newline so data is 64-byte aligned
+    padding = 64 - (len(_NPY_MAGIC) + 4 + len(header) + 1) % 64
+    header = (header + " " * padding + "\n").encode('latin1')
+    with open(path, "wb") as f:
+        f.write(_NPY_MAGIC + b"\x01\x00" + struct.pack("<H", len(header)) + header)
+        f.write(attachment.data)
+
+
+def read_npy(path: str) -> BinaryAttachment:
+    """Read a C-ordered .npy file into an attachment"""
+    with open(path, "rb") as f:
+        magic = f.read(len(_NPY_MAGIC) + 2)
+        if not magic.startswith(_NPY_MAGIC):
+            raise ValueError(f"Not a .npy file: {path}")
+        length_format = "<H" if magic[-2] == 1 else "<I"
+        (header_length,) = struct.unpack(length_format, f.read(struct.calcsize(length_format)))
+        header = ast.literal_eval(f.read(header_length).decode('latin1'))
+        if header["fortran_order"]:
+            raise ValueError(f"Fortran-ordered arrays are not supported: {path}")
+        dtype = next((name for name, descr in _NPY_DESCR.items() if descr == header["descr"]), None)
+        if dtype is None:
+            raise ValueError(f"Unsupported dtype {header['descr']} in {path}")
+        shape = list(header["shape"])
+        count = _DTYPE_SIZES[dtype]
+        for size in shape:
+            count *= size
+        data = bytearray(count)
+        f.readinto(data)
+    return BinaryAttachment(data, dtype, shape)
@@ -4,42 +4,255 @@ import socket
 import json
 import asyncio
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+import ipaddress
 from contextlib import asynccontextmanager
-from typing import AsyncIterator, Dict, Any, List
+from typing import AsyncIterator, Dict, Any, List, Union
 import os
+import random
+import tempfile
+import threading
+import time
 from pathlib import Path
 import base64
-from urllib.parse import urlparse
+from urllib.parse import parse_qs, urlparse
+
+from .protocol import (
+    BinaryAttachment, COMPRESSED_LENGTH, COMPRESSION_FLAGS, COMPRESSION_THRESHOLD, FRAME_MAGIC, FRAME_PREFIX, Inflater,
+    SharedMemoryRing, available_codecs, available_compressions, compress_frame, decode_frame, dumps_json,
+    encode_frame, loads_json, read_npy, write_npy,
+)
+from .timeouts import AdaptiveTimeouts
+from .tracing import tracer, traced
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("BlenderMCPServer")
 
+# Longest wait for the next chunk once a response has started arriving, or for a send to progress
+STALL_TIMEOUT = 15.0
+CONNECT_TIMEOUT = 5.0
+HANDSHAKE_TIMEOUT = 10.0
+
+DEFAULT_URL = "tcp://localhost:9876"
+
+# Arrays set_mesh_data reads from <name>.npy files; get_mesh_data can write edges.npy too
+MESH_ARRAYS = ("vertices", "normals", "loop_vertices", "loop_starts", "loop_totals", "triangles", "uvs")
+
+# Read-only commands: sent again on a new connection when the old one dies while they are in flight
+IDEMPOTENT_COMMANDS = frozenset({
+    "get_scene_info", "get_object_info", "get_mesh_data", "find_overlaps", "query_region",
+    "nearest_objects", "find_free_placement", "get_polyhaven_status", "get_hyper3d_status",
+    "get_polyhaven_categories", "search_polyhaven_assets", "poll_rodin_job_status",
+})
+
+
+class ResponseTimeout(Exception):
+    """No response started arriving before the deadline; the connection is still in sync"""
+
+
+class BlenderCommandError(Exception):
+    """Blender answered with an error status"""
+
+
+class ConnectionLost(Exception):
+    """The connection died while a command was in flight"""
+
+
 @dataclass
 class BlenderConnection:
-    host: str
-    port: int
+    host: str = "localhost"
+    port: int = 9876
     sock: socket.socket = None  # Changed from 'socket' to 'sock' to avoid naming conflict
-    
+    timeouts: AdaptiveTimeouts = field(default_factory=AdaptiveTimeouts)
+    # Same-machine transport: a Unix domain socket instead of TCP, and shared-memory rings
+    # for large attachments (None: use them on Unix sockets only)
+    socket_path: str = None
+    use_shared_memory: bool = None
+    shm_size: int = 64 * 1024 * 1024
+    # Frame header codec: None negotiates the fastest one both ends have, "json" or "msgpack" forces one
+    codec: str = None
+    _codec: str = field(default="json", init=False, repr=False)
+    # Frame compression: None compresses over TCP to other machines only, "none" turns it off,
+    # "zlib" or "zstd" asks for that one
+    compression: str = None
+    compress_threshold: int = COMPRESSION_THRESHOLD
+    _compression: str = field(default=None, init=False, repr=False)
+    _request_ring: SharedMemoryRing = field(default=None, init=False, repr=False)
+    _response_ring: SharedMemoryRing = field(default=None, init=False, repr=False)
+    _next_id: int = field(default=0, init=False, repr=False)
+    _abandoned: set = field(default_factory=set, init=False, repr=False)  # Ids of requests that timed out
+    _echoes_ids: bool = field(default=False, init=False, repr=False)  # Whether the addon returns request ids
+    # Reconnecting: after the connection is lost, a background thread retries with capped
+    # exponential backoff while commands fail fast
+    reconnect_min_delay: float = 0.5
+    reconnect_max_delay: float = 30.0
+    replay_wait: float = 5.0  # How long a read-only command waits for a reconnect to be sent again
+    _connect_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _connected: threading.Event = field(default_factory=threading.Event, init=False, repr=False)
+    _wake: threading.Event = field(default_factory=threading.Event, init=False, repr=False)
+    _reconnect_thread: threading.Thread = field(default=None, init=False, repr=False)
+    _reconnect_attempts: int = field(default=0, init=False, repr=False)
+    _next_attempt_at: float = field(default=0.0, init=False, repr=False)
+    _last_error: str = field(default=None, init=False, repr=False)
+    _closed: bool = field(default=False, init=False, repr=False)
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "BlenderConnection":
+        """Create a connection from tcp://host:port or unix:///path/to/socket.
+
+        A ?shm=1 or ?shm=0 query turns the shared-memory transport on or off,
+        ?codec=json or ?codec=msgpack pins the header codec, and ?compress=none,
+        zlib or zstd sets the frame compression.
+        """
+        parsed = urlparse(url)
+        query = parse_qs(parsed.query)
+        if "shm" in query:
+            kwargs["use_shared_memory"] = query["shm"][-1].lower() in ("1", "true", "yes", "on")
+        if "codec" in query:
+            kwargs["codec"] = query["codec"][-1]
+        if "compress" in query:
+            kwargs["compression"] = query["compress"][-1]
+        if parsed.scheme == "unix":
+            if not parsed.path:
+                raise ValueError(f"No socket path in {url}")
+            return cls(socket_path=parsed.path, **kwargs)
+        if parsed.scheme == "tcp":
+            return cls(host=parsed.hostname or "localhost", port=parsed.port or 9876, **kwargs)
+        raise ValueError(f"Unsupported Blender URL: {url}. Use tcp://host:port or unix:///path")
+
+    @property
+    def address(self) -> str:
+        return f"unix://{self.socket_path}" if self.socket_path else f"{self.host}:{self.port}"
+
     def connect(self) -> bool:
         """Connect to the Blender addon socket server"""
-        if self.sock:
-            return True
+        with self._connect_lock:
+            if self.sock:
+                return True
             
-        try:
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.sock.connect((self.host, self.port))
-            logger.info(f"Connected to Blender at {self.host}:{self.port}")
+            if self.socket_path:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                address = self.socket_path
+            else:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                address = (self.host, self.port)
+            try:
+                sock.settimeout(CONNECT_TIMEOUT)
+                sock.connect(address)
+            except Exception as e:
+                logger.error(f"Failed to connect to Blender: {str(e)}")
+                sock.close()
+                self._last_error = str(e)
+                return False
+            # Late responses from an earlier socket can no longer arrive
+            self._abandoned.clear()
+            self._echoes_ids = False
+            self._closed = False
+            self._codec = "json"
+            self._compression = None
+            self.sock = sock
+            try:
+                self._handshake()
+            except Exception as e:
+                logger.error(f"Handshake with Blender failed: {str(e)}")
+                self.sock = None
+                self._close_rings()
+                sock.close()
+                self._last_error = f"handshake failed: {str(e)}"
+                return False
+            self._connected.set()
+            logger.info(f"Connected to Blender at {self.address} ({self._features()})")
             return True
-        except Exception as e:
-            logger.error(f"Failed to connect to Blender: {str(e)}")
-            self.sock = None
+
+    def _handshake(self):
+        """Negotiate the header codec and frame compression, and offer shared-memory rings.
+
+        The hello frame itself is always JSON. Addons without the handshake
+        answer with an unknown-command error and the connection goes on with
+        plain JSON frames and no shared memory.
+        """
+        wants_shared_memory = self.use_shared_memory
+        if wants_shared_memory is None:
+            wants_shared_memory = bool(self.socket_path)
+        params = {"codecs": [self.codec] if self.codec else available_codecs()}
+        compressions = self._offered_compressions()
+        if compressions:
+            params["compression"] = compressions
+            params["compress_threshold"] = self.compress_threshold
+        if wants_shared_memory:
+            self._request_ring = SharedMemoryRing(size=self.shm_size)
+            self._response_ring = SharedMemoryRing(size=self.shm_size)
+            params["shared_memory"] = {"request": self._request_ring.name, "response": self._response_ring.name}
+
+        self.sock.settimeout(STALL_TIMEOUT)
+        for buffer in encode_frame({"type": "hello", "params": params, "id": 0}):
+            self.sock.sendall(buffer)
+        response = self.receive_full_response(self.sock, timeout=HANDSHAKE_TIMEOUT)
+        if response.pop("id", None) is not None:
+            # Later timeouts can then leave the connection open
+            self._echoes_ids = True
+        if response.get("status") != "success":
+            message = response.get("message", "")
+            if not message.startswith("Unknown command type"):
+                # e.g. the addon refusing the connection because it is busy
+                raise Exception(message or "Blender refused the connection")
+            logger.info("Blender does not support the handshake, using JSON without shared memory")
+            self._close_rings()
+            return
+        result = response.get("result") or {}
+        if result.get("codec") in available_codecs():
+            self._codec = result["codec"]
+        if result.get("compression") in compressions:
+            self._compression = result["compression"]
+        if wants_shared_memory and not result.get("shared_memory"):
+            logger.info(f"Blender does not use shared memory on this connection: {result.get('shared_memory_error')}")
+            self._close_rings()
+
+    def _offered_compressions(self) -> List[str]:
+        if self.compression == "none":
+            return []
+        if self.compression:
+            return [self.compression]
+        if self.socket_path or self._is_loopback(self.host):
+            # Compressing costs more than sending on the same machine
+            return []
+        return available_compressions()
+
+    @staticmethod
+    def _is_loopback(host: str) -> bool:
+        if host == "localhost":
+            return True
+        try:
+            return ipaddress.ip_address(host).is_loopback
+        except ValueError:
             return False
+
+    def _features(self) -> str:
+        features = [f"{self._codec} headers"]
+        if self._request_ring:
+            features.append("shared memory")
+        if self._compression:
+            features.append(f"{self._compression} compression")
+        return ", ".join(features)
+
+    def _close_rings(self):
+        rings = (self._request_ring, self._response_ring)
+        self._request_ring = self._response_ring = None
+        for ring in rings:
+            if ring:
+                try:
+                    ring.close()
+                except Exception as e:
+                    logger.error(f"Error releasing shared memory: {str(e)}")
     
     def disconnect(self):
         """Disconnect from the Blender addon"""
+        # Deliberate disconnects also stop reconnecting
+        self._closed = True
+        self._wake.set()
+        self._connected.clear()
         if self.sock:
             try:
                 self.sock.close()
@@ -47,117 +260,272 @@ class BlenderConnection:
                 logger.error(f"Error disconnecting from Blender: {str(e)}")
             finally:
                 self.sock = None
+        self._close_rings()
 
-    def receive_full_response(self, sock, buffer_size=8192):
-        """Receive the complete response, potentially in multiple chunks"""
-        chunks = []
-        # Use a consistent timeout value that matches the addon's timeout
-        sock.settimeout(15.0)  # Match the addon's timeout
-        
+    def _connection_lost(self, error):
+        """Drop a broken socket and start reconnecting in the background"""
+        sock, self.sock = self.sock, None
+        self._connected.clear()
+        self._last_error = str(error)
+        if sock:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._close_rings()
+        self._start_reconnect()
+
+    def _start_reconnect(self):
+        with self._connect_lock:
+            if self._closed or (self._reconnect_thread and self._reconnect_thread.is_alive()):
+                return
+            self._reconnect_attempts = 0
+            self._reconnect_thread = threading.Thread(target=self._reconnect_loop, name="blender-reconnect", daemon=True)
+            self._reconnect_thread.start()
+
+    def _reconnect_loop(self):
+        """Retry connecting with capped exponential backoff and jitter until it works"""
+        delay = self.reconnect_min_delay
+        while not self._closed:
+            if self.sock or self.connect():
+                logger.info(f"Reconnected to Blender after {self._reconnect_attempts + 1} attempts")
+                self._reconnect_attempts = 0
+                return
+            self._reconnect_attempts += 1
+            wait = delay * random.uniform(0.5, 1.0)
+            self._next_attempt_at = time.monotonic() + wait
+            # A command arriving meanwhile wakes the loop up for an early attempt
+            self._wake.wait(wait)
+            self._wake.clear()
+            delay = min(delay * 2, self.reconnect_max_delay)
+
+    @property
+    def reconnecting(self) -> bool:
+        return bool(self._reconnect_thread and self._reconnect_thread.is_alive())
+
+    def status(self) -> str:
+        """One-line description of the connection state"""
+        if self.sock:
+            return f"Connected to Blender at {self.address} ({self._features()})"
+        message = f"Blender is not reachable at {self.address}"
+        if self._last_error:
+            message += f" ({self._last_error})"
+        if self.reconnecting:
+            next_attempt = max(self._next_attempt_at - time.monotonic(), 0.0)
+            message += (f"; reconnecting in the background, {self._reconnect_attempts} failed attempts, "
+                        f"next in {next_attempt:.1f}s")
+        return message + ". Make sure Blender is running with the addon's server started."
+
+    def ensure_connected(self):
+        """Connect if needed, raising ConnectionError right away while Blender is unreachable"""
+        if self.sock:
+            return
+        if self.reconnecting:
+            # Ask for an early attempt, but don't wait out the backoff
+            self._wake.set()
+            if self._connected.wait(0.5):
+                return
+            raise ConnectionError(self.status())
+        if not self.connect():
+            self._start_reconnect()
+            raise ConnectionError(self.status())
+
+    @staticmethod
+    def _recv_into(sock, view):
+        """Fill a memoryview completely from the socket"""
+        received = 0
+        while received < len(view):
+            count = sock.recv_into(view[received:])
+            if not count:
+                raise ConnectionError("Connection closed while receiving data")
+            received += count
+
+    def receive_full_response(self, sock, buffer_size=8192, timeout=15.0):
+        """Receive one complete response frame, reading attachments into a preallocated buffer.
+
+        `timeout` bounds the wait for the response to start. Nothing has been read
+        when it runs out, so ResponseTimeout leaves the stream intact; a stall
+        in the middle of a response raises socket.timeout instead.
+        """
+        sock.settimeout(max(timeout, 0.001))
         try:
-            while True:
-                try:
-                    chunk = sock.recv(buffer_size)
-                    if not chunk:
-                        # If we get an empty chunk, the connection might be closed
-                        if not chunks:  # If we haven't received anything yet, this is an error
-                            raise Exception("Connection closed before receiving any data")
-                        break
-                    
-                    chunks.append(chunk)
-                    
-                    # Check if we've received a complete JSON object
-                    try:
-                        data = b''.join(chunks)
-                        json.loads(data.decode('utf-8'))
-                        # If we get here, it parsed successfully
-                        logger.info(f"Received complete response ({len(data)} bytes)")
-                        return data
-                    except json.JSONDecodeError:
-                        # Incomplete JSON, continue receiving
-                        continue
-                except socket.timeout:
-                    # If we hit a timeout during receiving, break the loop and try to use what we have
-                    logger.warning("Socket timeout during chunked receive")
-                    break
-                except (ConnectionError, BrokenPipeError, ConnectionResetError) as e:
-                    logger.error(f"Socket connection error during receive: {str(e)}")
-                    raise  # Re-raise to be handled by the caller
+            first = sock.recv(1)
         except socket.timeout:
-            logger.warning("Socket timeout during chunked receive")
-        except Exception as e:
-            logger.error(f"Error during receive: {str(e)}")
-            raise
-            
-        # If we get here, we either timed out or broke out of the loop
-        # Try to use what we have
-        if chunks:
-            data = b''.join(chunks)
-            logger.info(f"Returning data after receive completion ({len(data)} bytes)")
+            raise ResponseTimeout(f"No response within {timeout:.1f}s") from None
+        sock.settimeout(STALL_TIMEOUT)
+        if not first:
+            raise ConnectionError("Connection closed before receiving any data")
+        if first != FRAME_MAGIC[:1]:
+            # Older addons (and the addon's "busy" refusal) reply with bare JSON
+            return self._receive_legacy_response(sock, first, buffer_size)
+
+        prefix = bytearray(FRAME_PREFIX.size)
+        prefix[0:1] = first
+        self._recv_into(sock, memoryview(prefix)[1:])
+        magic, version, flags, header_length, attachments_length = FRAME_PREFIX.unpack(prefix)
+        if magic != FRAME_MAGIC:
+            raise Exception("Invalid frame received from Blender")
+
+        if flags & COMPRESSION_FLAGS:
+            header, body = self._receive_compressed(sock, flags, header_length, attachments_length)
+        else:
+            header = bytearray(header_length)
+            self._recv_into(sock, memoryview(header))
+            body = bytearray(attachments_length)
+            self._recv_into(sock, memoryview(body))
+        logger.info(f"Received complete response ({header_length} header bytes, {attachments_length} attachment bytes)")
+        return decode_frame(header, body, self._response_ring, flags)
+
+    def _receive_compressed(self, sock, flags, header_length, attachments_length):
+        """Receive a compressed frame, decompressing each chunk as it arrives"""
+        length = bytearray(COMPRESSED_LENGTH.size)
+        self._recv_into(sock, memoryview(length))
+        inflater = Inflater(flags, header_length, attachments_length, COMPRESSED_LENGTH.unpack(length)[0])
+        chunk = memoryview(bytearray(min(inflater.remaining, 256 * 1024)))
+        while inflater.remaining:
+            count = sock.recv_into(chunk[:inflater.remaining])
+            if not count:
+                raise ConnectionError("Connection closed while receiving data")
+            inflater.feed(chunk[:count])
+        return inflater.frame()
+
+    def _receive_legacy_response(self, sock, data, buffer_size):
+        """Receive a bare JSON response, potentially in multiple chunks"""
+        chunks = [data]
+        while True:
             try:
-                # Try to parse what we have
-                json.loads(data.decode('utf-8'))
-                return data
+                data = b''.join(chunks)
+                response = loads_json(data)
+                logger.info(f"Received complete legacy response ({len(data)} bytes)")
+                return response
             except json.JSONDecodeError:
-                # If we can't parse it, it's incomplete
-                raise Exception("Incomplete JSON response received")
-        else:
-            raise Exception("No data received")
+                # Incomplete JSON, continue receiving
+                pass
+            chunk = sock.recv(buffer_size)
+            if not chunk:
+                raise ConnectionError("Connection closed in the middle of a JSON response")
+            chunks.append(chunk)
+
+    def _receive_response(self, request_id: int, deadline: float) -> Dict[str, Any]:
+        """Receive the response to request_id, dropping late responses to requests that timed out"""
+        while True:
+            response = self.receive_full_response(self.sock, timeout=deadline - time.perf_counter())
+            response_id = response.pop("id", None)
+            if response_id is None:
+                # Addons without request ids answer strictly in order
+                return response
+            self._echoes_ids = True
+            if response_id == request_id:
+                return response
+            if response_id in self._abandoned:
+                self._abandoned.discard(response_id)
+                logger.info(f"Discarded late response to request {response_id}")
+                continue
+            raise Exception(f"Response for unknown request {response_id} (waiting for {request_id})")
+
+    def send_command(self, command_type: str, params: Dict[str, Any] = None, timeout: float = None) -> Dict[str, Any]:
+        """Send a command to Blender and return the response.
+
+        Without an explicit timeout the budget comes from the command's class
+        and recent latency. The addon receives it too, and skips the command
+        if it is still queued when the budget runs out.
+
+        While Blender is unreachable this fails right away. When the connection
+        dies with a read-only command in flight, the command is sent again once
+        the background reconnect succeeds.
+        """
+        self.ensure_connected()
+        params = params or {}
+        replay_until = None
+        while True:
+            try:
+                return self._send(command_type, params, timeout)
+            except ConnectionLost as e:
+                if command_type not in IDEMPOTENT_COMMANDS:
+                    raise Exception(f"Connection to Blender lost: {str(e)}. {command_type} may or may not have been applied")
+                if replay_until is None:
+                    replay_until = time.monotonic() + self.replay_wait
+                remaining = replay_until - time.monotonic()
+                if remaining <= 0 or not self._connected.wait(remaining):
+                    raise Exception(f"Connection to Blender lost: {str(e)}. {self.status()}")
+                logger.warning(f"Connection lost during {command_type}, sending it again after reconnecting")
+
+    def _send(self, command_type: str, params: Dict[str, Any], timeout: float = None) -> Dict[str, Any]:
+        """Send one command on the current socket and wait for its response"""
+        if timeout is None:
+            timeout = self.timeouts.budget(command_type)
+            # Commands with their own time limit (execute_code) get it plus some slack
+            if isinstance(params.get("timeout"), (int, float)):
+                timeout = max(timeout, params["timeout"] + 5.0)
+        self._next_id += 1
+        request_id = self._next_id
 
-    def send_command(self, command_type: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Send a command to Blender and return the response"""
-        if not self.sock and not self.connect():
-            raise ConnectionError("Not connected to Blender")
-        
         command = {
             "type": command_type,
-            "params": params or {}
+            "params": params,
+            "id": request_id,
+            "timeout": timeout,
         }
         
-        try:
-            # Log the command being sent
-            logger.info(f"Sending command: {command_type} with params: {params}")
-            
-            # Send the command
-            self.sock.sendall(json.dumps(command).encode('utf-8'))
-            logger.info(f"Command sent, waiting for response...")
+        with tracer.span(f"send_command:{command_type}", timeout=timeout) as span:
+            # The addon continues the trace and returns its spans with the response
+            command["trace"] = {"trace_id": span.trace_id, "parent_id": span.span_id}
             
-            # Set a timeout for receiving - use the same timeout as in receive_full_response
-            self.sock.settimeout(15.0)  # Match the addon's timeout
+            try:
+                # Log the command being sent
+                logger.info(f"Sending command: {command_type} with params: {params}")
             
-            # Receive the response using the improved receive_full_response method
-            response_data = self.receive_full_response(self.sock)
-            logger.info(f"Received {len(response_data)} bytes of data")
+                # Send the command; attachments are written straight from their buffers
+                sent_at = time.perf_counter()
+                with tracer.span("send"):
+                    self.sock.settimeout(STALL_TIMEOUT)
+                    buffers = encode_frame(command, self._request_ring, self._codec)
+                    for buffer in compress_frame(buffers, self._compression, self.compress_threshold):
+                        self.sock.sendall(buffer)
+                logger.info(f"Command sent, waiting for response...")
             
-            response = json.loads(response_data.decode('utf-8'))
-            logger.info(f"Response parsed, status: {response.get('status', 'unknown')}")
+                with tracer.span("wait_response"):
+                    response = self._receive_response(request_id, sent_at + timeout)
+                self.timeouts.record(command_type, time.perf_counter() - sent_at)
+                remote = response.pop("trace", None)
+                if remote:
+                    tracer.add_remote_spans(remote.get("spans", []))
+                logger.info(f"Response parsed, status: {response.get('status', 'unknown')}")
             
-            if response.get("status") == "error":
-                logger.error(f"Blender error: {response.get('message')}")
-                raise Exception(response.get("message", "Unknown error from Blender"))
+                if response.get("status") == "error":
+                    logger.error(f"Blender error: {response.get('message')}")
+                    raise BlenderCommandError(response.get("message", "Unknown error from Blender"))
             
-            return response.get("result", {})
-        except socket.timeout:
-            logger.error("Socket timeout while waiting for response from Blender")
-            # Don't try to reconnect here - let the get_blender_connection handle reconnection
-            # Just invalidate the current socket so it will be recreated next time
-            self.sock = None
-            raise Exception("Timeout waiting for Blender response - try simplifying your request")
-        except (ConnectionError, BrokenPipeError, ConnectionResetError) as e:
-            logger.error(f"Socket connection error: {str(e)}")
-            self.sock = None
-            raise Exception(f"Connection to Blender lost: {str(e)}")
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON response from Blender: {str(e)}")
-            # Try to log what was received
-            if 'response_data' in locals() and response_data:
-                logger.error(f"Raw response (first 200 bytes): {response_data[:200]}")
-            raise Exception(f"Invalid response from Blender: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error communicating with Blender: {str(e)}")
-            # Don't try to reconnect here - let the get_blender_connection handle reconnection
-            self.sock = None
-            raise Exception(f"Communication error with Blender: {str(e)}")
+                return response.get("result", {})
+            except ResponseTimeout:
+                logger.error(f"No response from Blender to {command_type} within {timeout:.1f}s")
+                self.timeouts.record_timeout(command_type, timeout)
+                if self._echoes_ids:
+                    # The response may still come; it is recognized by its id and dropped then
+                    self._abandoned.add(request_id)
+                else:
+                    # Without ids a late response cannot be told apart from the next one
+                    self._connection_lost("response timed out")
+                raise Exception(f"Timeout waiting for Blender response after {timeout:.1f}s - try simplifying your request")
+            except socket.timeout:
+                logger.error("Socket timeout while receiving response from Blender")
+                # The stream stopped mid-response and cannot be resynchronized
+                self._connection_lost("response stalled")
+                raise ConnectionLost(f"no data for {STALL_TIMEOUT:.0f}s in the middle of a response")
+            except (ConnectionError, BrokenPipeError, ConnectionResetError) as e:
+                logger.error(f"Socket connection error: {str(e)}")
+                self._connection_lost(e)
+                raise ConnectionLost(str(e))
+            except json.JSONDecodeError as e:
+                logger.error(f"Invalid JSON response from Blender: {str(e)}")
+                raise Exception(f"Invalid response from Blender: {str(e)}")
+            except BlenderCommandError:
+                # The command failed in Blender; the connection itself is fine
+                raise
+            except Exception as e:
+                logger.error(f"Error communicating with Blender: {str(e)}")
+                self._connection_lost(e)
+                raise Exception(f"Communication error with Blender: {str(e)}")
 
 @asynccontextmanager
 async def server_lifespan(server: FastMCP) -> AsyncIterator[Dict[str, Any]]:
@@ -200,42 +568,34 @@ mcp = FastMCP(
 
 # Global connection for resources (since resources can't access context)
 _blender_connection = None
-_polyhaven_enabled = False  # Add this global variable
+_blender_url = os.environ.get("BLENDER_MCP_URL", DEFAULT_URL)
 
 def get_blender_connection():
-    """Get or create a persistent Blender connection"""
-    global _blender_connection, _polyhaven_enabled  # Add _polyhaven_enabled to globals
-    
-    # If we have an existing connection, check if it's still valid
-    if _blender_connection is not None:
-        try:
-            # First check if PolyHaven is enabled by sending a ping command
-            result = _blender_connection.send_command("get_polyhaven_status")
-            # Store the PolyHaven status globally
-            _polyhaven_enabled = result.get("enabled", False)
-            return _blender_connection
-        except Exception as e:
-            # Connection is dead, close it and create a new one
-            logger.warning(f"Existing connection is no longer valid: {str(e)}")
-            try:
-                _blender_connection.disconnect()
-            except:
-                pass
-            _blender_connection = None
-    
-    # Create a new connection if needed
+    """Get the persistent Blender connection.
+
+    The connection watches itself: when Blender goes away it reconnects in the
+    background, so no health check is needed per call. While Blender is
+    unreachable this raises right away with the reconnect status.
+    """
+    global _blender_connection
+
     if _blender_connection is None:
-        _blender_connection = BlenderConnection(host="localhost", port=9876)
-        if not _blender_connection.connect():
-            logger.error("Failed to connect to Blender")
-            _blender_connection = None
-            raise Exception("Could not connect to Blender. Make sure the Blender addon is running.")
-        logger.info("Created new persistent connection to Blender")
-    
+        _blender_connection = BlenderConnection.from_url(_blender_url)
+    try:
+        _blender_connection.ensure_connected()
+    except ConnectionError as e:
+        logger.error(f"Failed to connect to Blender: {str(e)}")
+        raise Exception(f"Could not connect to Blender: {str(e)}")
     return _blender_connection
 
 
+def _result_text(result) -> str:
+    """Tool output for a command result: compact JSON, encoded in one pass (by orjson when installed)"""
+    return dumps_json(result).decode('utf-8')
+
+
 @mcp.tool()
+@traced
 def get_scene_info(ctx: Context) -> str:
     """Get detailed information about the current Blender scene"""
     try:
@@ -243,12 +603,13 @@ def get_scene_info(ctx: Context) -> str:
         result = blender.send_command("get_scene_info")
         
         # Just return the JSON representation of what Blender sent us
-        return json.dumps(result, indent=2)
+        return _result_text(result)
     except Exception as e:
         logger.error(f"Error getting scene info from Blender: {str(e)}")
         return f"Error getting scene info: {str(e)}"
 
 @mcp.tool()
+@traced
 def get_object_info(ctx: Context, object_name: str) -> str:
     """
     Get detailed information about a specific object in the Blender scene.
@@ -261,7 +622,7 @@ def get_object_info(ctx: Context, object_name: str) -> str:
         result = blender.send_command("get_object_info", {"name": object_name})
         
         # Just return the JSON representation of what Blender sent us
-        return json.dumps(result, indent=2)
+        return _result_text(result)
     except Exception as e:
         logger.error(f"Error getting object info from Blender: {str(e)}")
         return f"Error getting object info: {str(e)}"
@@ -269,6 +630,7 @@ def get_object_info(ctx: Context, object_name: str) -> str:
 
 
 @mcp.tool()
+@traced
 def create_object(
     ctx: Context,
     type: str = "CUBE",
@@ -285,7 +647,9 @@ def create_object(
     minor_radius: float = 0.25,
     abso_major_rad: float = 1.25,
     abso_minor_rad: float = 0.75,
-    generate_uvs: bool = True
+    generate_uvs: bool = True,
+    method: str = "DATA",
+    shared_mesh: bool = True
 ) -> str:
     """
     Create a new object in the Blender scene.
@@ -296,6 +660,10 @@ def create_object(
     - location: Optional [x, y, z] location coordinates
     - rotation: Optional [x, y, z] rotation in radians
     - scale: Optional [x, y, z] scale factors (not used for TORUS)
+    - method: "DATA" (default) builds the object directly without operators, which is much faster
+      and works without a 3D viewport; "OPERATOR" uses the bpy.ops primitive operators
+    - shared_mesh: With method "DATA", primitives with the same parameters share one mesh
+      to keep memory and file size flat; use make_single_user before editing the geometry
     
     Torus-specific parameters (only used when type == "TORUS"):
     - align: How to align the torus ('WORLD', 'VIEW', or 'CURSOR')
@@ -324,6 +692,8 @@ def create_object(
             "type": type,
             "location": loc,
             "rotation": rot,
+            "method": method,
+            "shared_mesh": shared_mesh,
         }
         
         if name:
@@ -355,6 +725,7 @@ def create_object(
 
 
 @mcp.tool()
+@traced
 def modify_object(
     ctx: Context,
     name: str,
@@ -395,6 +766,47 @@ def modify_object(
         return f"Error modifying object: {str(e)}"
 
 @mcp.tool()
+@traced
+def modify_objects(
+    ctx: Context,
+    names: List[str] = None,
+    filter: Dict[str, Any] = None,
+    locations: List[List[float]] = None,
+    rotations: List[List[float]] = None,
+    scales: List[List[float]] = None,
+    visible: Union[bool, List[bool]] = None
+) -> str:
+    """
+    Modify the transforms and visibility of many objects in one call. Use this instead of calling
+    modify_object repeatedly, e.g. when laying out a scene.
+    
+    Parameters:
+    - names: Names of the objects to modify
+    - filter: Instead of names, select objects with any of {"type": "MESH" or a list of types,
+      "name": a glob pattern like "Chair*", "collection": a collection name}
+    - locations: Either a single [x, y, z] applied to all objects or one [x, y, z] per object
+    - rotations: Same as locations, in radians
+    - scales: Same as locations
+    - visible: A boolean for all objects or one boolean per object
+    """
+    try:
+        blender = get_blender_connection()
+        params = {}
+        for key, value in (("names", names), ("filter", filter), ("locations", locations),
+                           ("rotations", rotations), ("scales", scales), ("visible", visible)):
+            if value is not None:
+                params[key] = value
+        if "names" not in params and "filter" not in params:
+            return "Error: names or filter is required"
+        
+        result = blender.send_command("modify_objects", params)
+        return f"Modified {result['count']} objects"
+    except Exception as e:
+        logger.error(f"Error modifying objects: {str(e)}")
+        return f"Error modifying objects: {str(e)}"
+
+@mcp.tool()
+@traced
 def delete_object(ctx: Context, name: str) -> str:
     """
     Delete an object from the Blender scene.
@@ -413,6 +825,7 @@ def delete_object(ctx: Context, name: str) -> str:
         return f"Error deleting object: {str(e)}"
 
 @mcp.tool()
+@traced
 def set_material(
     ctx: Context,
     object_name: str,
@@ -445,24 +858,567 @@ def set_material(
         return f"Error setting material: {str(e)}"
 
 @mcp.tool()
-def execute_blender_code(ctx: Context, code: str) -> str:
+@traced
+def set_materials_bulk(
+    ctx: Context,
+    assignments: Dict[str, Any]
+) -> str:
+    """
+    Assign materials to many objects in one call. Objects given the same parameters share one
+    material instead of each getting a copy. Use this instead of calling set_material repeatedly.
+    
+    Parameters:
+    - assignments: Maps object names to either an [R, G, B] or [R, G, B, A] color (0.0-1.0),
+      the name of a material to use or create, or a dict with any of "material", "color",
+      "metallic" and "roughness". Example:
+      {"Chair_1": [0.8, 0.1, 0.1], "Chair_2": [0.8, 0.1, 0.1], "Table": {"color": [0.4, 0.25, 0.1], "roughness": 0.6}}
+    
+    Returns the materials that were created and the existing ones that were reused.
+    """
+    try:
+        blender = get_blender_connection()
+        result = blender.send_command("set_materials_bulk", {"assignments": assignments})
+        return _result_text(result)
+    except Exception as e:
+        logger.error(f"Error setting materials: {str(e)}")
+        return f"Error setting materials: {str(e)}"
+
+@mcp.tool()
+@traced
+def get_mesh_data(
+    ctx: Context,
+    object_name: str,
+    output_dir: str,
+    fields: List[str] = None,
+    decimate_ratio: float = None,
+    max_vertices: int = None,
+    apply_modifiers: bool = False
+) -> str:
+    """
+    Export the geometry of a mesh object as NumPy .npy files, one per field.
+    Use this instead of reading vertices through execute_blender_code.
+    
+    Parameters:
+    - object_name: Name of the mesh object
+    - output_dir: Directory the .npy files are written to (created if missing)
+    - fields: Optional list of arrays to export. Any of: vertices, normals, edges,
+      loop_vertices, loop_starts, loop_totals, triangles, uvs.
+      Default: vertices, loop_vertices, loop_starts
+    - decimate_ratio: Optional ratio (0-1) to export a decimated copy; the object is not changed
+    - max_vertices: Optional vertex budget, the mesh is decimated to stay under it
+    - apply_modifiers: Export the evaluated mesh with modifiers applied
+    
+    Returns the element counts and the path of each written file.
+    """
+    try:
+        blender = get_blender_connection()
+        params = {"name": object_name, "apply_modifiers": apply_modifiers}
+        if fields:
+            params["fields"] = fields
+        if decimate_ratio is not None:
+            params["decimate_ratio"] = decimate_ratio
+        if max_vertices is not None:
+            params["max_vertices"] = max_vertices
+        result = blender.send_command("get_mesh_data", params)
+        
+        os.makedirs(output_dir, exist_ok=True)
+        # Files left by an earlier export would otherwise be mixed with this one by set_mesh_data
+        for array_name in MESH_ARRAYS + ("edges",):
+            path = os.path.join(output_dir, f"{array_name}.npy")
+            if os.path.exists(path):
+                os.remove(path)
+        files = {}
+        for array_name, attachment in result.pop("arrays", {}).items():
+            path = os.path.join(output_dir, f"{array_name}.npy")
+            write_npy(path, attachment)
+            files[array_name] = {"path": path, "dtype": attachment.dtype, "shape": attachment.shape}
+        result["files"] = files
+        return _result_text(result)
+    except Exception as e:
+        logger.error(f"Error getting mesh data: {str(e)}")
+        return f"Error getting mesh data: {str(e)}"
+
+@mcp.tool()
+@traced
+def set_mesh_data(
+    ctx: Context,
+    object_name: str,
+    input_dir: str,
+    create: bool = False
+) -> str:
+    """
+    Replace the geometry of a mesh object from NumPy .npy files, as written by get_mesh_data.
+    
+    Parameters:
+    - object_name: Name of the mesh object
+    - input_dir: Directory holding the arrays. Recognized files: vertices.npy (N x 3),
+      normals.npy (N x 3), loop_vertices.npy with loop_starts.npy (and optionally loop_totals.npy)
+      or triangles.npy (T x 3), uvs.npy (one [u, v] per loop).
+      With only vertices.npy the vertex positions are updated in place.
+    - create: Create a new mesh object if it doesn't exist
+    """
+    try:
+        blender = get_blender_connection()
+        params = {"name": object_name, "create": create}
+        for array_name in MESH_ARRAYS:
+            path = os.path.join(input_dir, f"{array_name}.npy")
+            if os.path.exists(path):
+                params[array_name] = read_npy(path)
+        if len(params) == 2:
+            return f"Error: no mesh data files found in {input_dir}"
+        
+        result = blender.send_command("set_mesh_data", params)
+        return _result_text(result)
+    except Exception as e:
+        logger.error(f"Error setting mesh data: {str(e)}")
+        return f"Error setting mesh data: {str(e)}"
+
+@mcp.tool()
+@traced
+def make_single_user(ctx: Context, object_name: str) -> str:
+    """
+    Give an object its own copy of data it shares with other objects (shared primitive meshes,
+    repeated imports, linked duplicates), so editing it no longer changes the others.
+    set_mesh_data does this automatically.
+    
+    Parameters:
+    - object_name: Name of the object
+    """
+    try:
+        blender = get_blender_connection()
+        result = blender.send_command("make_single_user", {"name": object_name})
+        return _result_text(result)
+    except Exception as e:
+        logger.error(f"Error making data single user: {str(e)}")
+        return f"Error making data single user: {str(e)}"
+
+@mcp.tool()
+@traced
+def scatter_instances(
+    ctx: Context,
+    source: str,
+    locations: List[List[float]] = None,
+    rotations: List[List[float]] = None,
+    scales: List[float] = None,
+    transforms_dir: str = None,
+    mode: str = "LINKED",
+    collection: str = None,
+    name_prefix: str = None
+) -> str:
+    """
+    Place many copies of an object or collection in one call. Copies share the source's mesh data,
+    so thousands of instances are cheap. Use this instead of calling create_object repeatedly.
+    
+    Parameters:
+    - source: Name of the object (mode LINKED) or collection (mode COLLECTION) to instance
+    - locations: List of [x, y, z] locations, one per instance
+    - rotations: Optional list of [x, y, z] rotations in radians, one per instance
+    - scales: Optional list with one scale per instance, either a number (uniform) or [x, y, z]
+    - transforms_dir: Optional directory with locations.npy (N x 3) and optionally rotations.npy and
+      scales.npy, used instead of the lists above for large counts
+    - mode: LINKED (linked duplicates of an object) or COLLECTION (collection instances)
+    - collection: Optional collection the instances are put in (default: "<source>_instances")
+    - name_prefix: Optional prefix for instance names (default: the source name)
+    """
+    try:
+        blender = get_blender_connection()
+        params = {"source": source, "mode": mode}
+        if transforms_dir:
+            for array_name in ("locations", "rotations", "scales"):
+                path = os.path.join(transforms_dir, f"{array_name}.npy")
+                if os.path.exists(path):
+                    params[array_name] = read_npy(path)
+        else:
+            params["locations"] = locations
+            if rotations is not None:
+                params["rotations"] = rotations
+            if scales is not None:
+                params["scales"] = scales
+        if params.get("locations") is None:
+            return "Error: locations (or transforms_dir/locations.npy) are required"
+        if collection:
+            params["collection"] = collection
+        if name_prefix:
+            params["name_prefix"] = name_prefix
+        
+        result = blender.send_command("scatter_instances", params)
+        return _result_text(result)
+    except Exception as e:
+        logger.error(f"Error scattering instances: {str(e)}")
+        return f"Error scattering instances: {str(e)}"
+
+@mcp.tool()
+@traced
+def find_overlaps(
+    ctx: Context,
+    object_name: str = None,
+    margin: float = 0.0,
+    ignore: List[str] = None
+) -> str:
+    """
+    Find objects whose world bounding boxes intersect, in a single call.
+    Objects that only touch (e.g. resting on the ground) are not reported.
+    
+    Parameters:
+    - object_name: Optional object to check; without it all overlapping pairs in the scene are returned
+    - margin: Optional extra clearance; boxes closer than this also count as overlapping
+    - ignore: Optional list of object names to leave out (e.g. the ground plane)
+    """
+    try:
+        blender = get_blender_connection()
+        params = {"margin": margin}
+        if object_name:
+            params["name"] = object_name
+        if ignore:
+            params["ignore"] = ignore
+        result = blender.send_command("find_overlaps", params)
+        return _result_text(result)
+    except Exception as e:
+        logger.error(f"Error finding overlaps: {str(e)}")
+        return f"Error finding overlaps: {str(e)}"
+
+@mcp.tool()
+@traced
+def query_region(
+    ctx: Context,
+    box_min: List[float],
+    box_max: List[float],
+    margin: float = 0.0,
+    ignore: List[str] = None
+) -> str:
+    """
+    List the objects whose world bounding boxes intersect an axis-aligned region.
+    
+    Parameters:
+    - box_min: [x, y, z] minimum corner of the region
+    - box_max: [x, y, z] maximum corner of the region
+    - margin: Optional extra clearance around the region
+    - ignore: Optional list of object names to leave out
+    """
+    try:
+        blender = get_blender_connection()
+        params = {"box_min": box_min, "box_max": box_max, "margin": margin}
+        if ignore:
+            params["ignore"] = ignore
+        result = blender.send_command("query_region", params)
+        return _result_text(result)
+    except Exception as e:
+        logger.error(f"Error querying region: {str(e)}")
+        return f"Error querying region: {str(e)}"
+
+@mcp.tool()
+@traced
+def nearest_objects(
+    ctx: Context,
+    location: List[float] = None,
+    object_name: str = None,
+    count: int = 5,
+    max_distance: float = None
+) -> str:
+    """
+    Find the objects closest to a point or to another object, measured to their world bounding boxes.
+    
+    Parameters:
+    - location: Optional [x, y, z] point to search from
+    - object_name: Optional object to search from (its bounding box center is used); give this or location
+    - count: Number of objects to return
+    - max_distance: Optional maximum distance
+    """
+    try:
+        blender = get_blender_connection()
+        params = {"count": count}
+        if location is not None:
+            params["location"] = location
+        if object_name:
+            params["name"] = object_name
+        if max_distance is not None:
+            params["max_distance"] = max_distance
+        result = blender.send_command("nearest_objects", params)
+        return _result_text(result)
+    except Exception as e:
+        logger.error(f"Error finding nearest objects: {str(e)}")
+        return f"Error finding nearest objects: {str(e)}"
+
+@mcp.tool()
+@traced
+def find_free_placement(
+    ctx: Context,
+    size: List[float],
+    near: List[float] = None,
+    search_radius: float = 10.0,
+    step: float = None,
+    margin: float = 0.0,
+    ignore: List[str] = None
+) -> str:
+    """
+    Find the closest spot to a point where a box of the given size fits without overlapping anything.
+    The search moves outward in the XY plane and keeps the Z of `near`.
+    
+    Parameters:
+    - size: [x, y, z] size of the box to place
+    - near: Optional [x, y, z] preferred center (default: origin)
+    - search_radius: How far from `near` to search
+    - step: Optional grid step for candidate positions (default: half the box footprint)
+    - margin: Optional clearance to keep around other objects
+    - ignore: Optional list of object names to leave out (e.g. the ground plane)
+    
+    Returns the center location and world bounding box of the free spot.
+    """
+    try:
+        blender = get_blender_connection()
+        params = {
+            "size": size,
+            "near": near or [0, 0, 0],
+            "search_radius": search_radius,
+            "margin": margin,
+        }
+        if step is not None:
+            params["step"] = step
+        if ignore:
+            params["ignore"] = ignore
+        result = blender.send_command("find_free_placement", params)
+        return _result_text(result)
+    except Exception as e:
+        logger.error(f"Error finding free placement: {str(e)}")
+        return f"Error finding free placement: {str(e)}"
+
+@mcp.tool()
+@traced
+def execute_blender_code(
+    ctx: Context,
+    code: str,
+    session: str = None,
+    timeout: float = None,
+    reset_session: bool = False
+) -> str:
     """
     Execute arbitrary Python code in Blender.
+    Printed output is returned, and if the last statement is an expression its value is returned too.
     
     Parameters:
     - code: The Python code to execute
+    - session: Optional session name. Functions, imports and variables defined in a session stay
+      available to later calls with the same session, so define helpers once and just call them afterwards.
+    - timeout: Optional maximum run time in seconds (pure Python loops are interrupted; a single long
+      operator call is not). Without it the code is only stopped once the server stops waiting for the response.
+    - reset_session: Clear the session's variables before running (requires session)
     """
     try:
         # Get the global connection
         blender = get_blender_connection()
         
-        result = blender.send_command("execute_code", {"code": code})
-        return f"Code executed successfully: {result.get('result', '')}"
+        params = {"code": code}
+        if timeout is not None:
+            params["timeout"] = timeout
+        if session:
+            params["session"] = session
+        if reset_session:
+            params["reset_session"] = True
+        result = blender.send_command("execute_code", params)
+        
+        output = "Code executed successfully"
+        if result.get("result") is not None:
+            output += f": {_result_text(result['result'])}"
+        if result.get("stdout"):
+            output += f"\n\nOutput:\n{result['stdout']}"
+        if result.get("stderr"):
+            output += f"\n\nErrors:\n{result['stderr']}"
+        return output
     except Exception as e:
         logger.error(f"Error executing code: {str(e)}")
         return f"Error executing code: {str(e)}"
 
 @mcp.tool()
+@traced
+def begin_transaction(ctx: Context, name: str = "MCP transaction", rollback_on_error: bool = True) -> str:
+    """
+    Start a transaction. Changes made by the following tool calls can then be kept with
+    commit_transaction() (as a single undo step) or discarded with rollback_transaction().
+    
+    Parameters:
+    - name: Name of the transaction, shown in Blender's undo history
+    - rollback_on_error: Automatically roll back everything if any command in the transaction fails
+    """
+    try:
+        blender = get_blender_connection()
+        result = blender.send_command("begin_transaction", {"name": name, "rollback_on_error": rollback_on_error})
+        return f"Transaction '{result['transaction']}' started"
+    except Exception as e:
+        logger.error(f"Error beginning transaction: {str(e)}")
+        return f"Error beginning transaction: {str(e)}"
+
+@mcp.tool()
+@traced
+def commit_transaction(ctx: Context) -> str:
+    """Keep all changes made since begin_transaction()."""
+    try:
+        blender = get_blender_connection()
+        result = blender.send_command("commit_transaction")
+        return f"Transaction '{result['committed']}' committed ({result['commands']} commands)"
+    except Exception as e:
+        logger.error(f"Error committing transaction: {str(e)}")
+        return f"Error committing transaction: {str(e)}"
+
+@mcp.tool()
+@traced
+def rollback_transaction(ctx: Context) -> str:
+    """Discard all changes made since begin_transaction() in one step."""
+    try:
+        blender = get_blender_connection()
+        result = blender.send_command("rollback_transaction")
+        return (f"Transaction '{result['rolled_back']}' rolled back "
+                f"({result['commands']} commands, {result['removed_datablocks']} datablocks removed)")
+    except Exception as e:
+        logger.error(f"Error rolling back transaction: {str(e)}")
+        return f"Error rolling back transaction: {str(e)}"
+
+@mcp.tool()
+@traced
+def execute_batch(
+    ctx: Context,
+    commands: List[Dict[str, Any]],
+    atomic: bool = True
+) -> str:
+    """
+    Run several Blender commands in one call.
+    
+    Parameters:
+    - commands: List of commands, each {"type": <command>, "params": {...}}, using the same
+      command names and parameters as the addon (e.g. {"type": "create_object", "params": {"type": "CUBE", "name": "Box"}})
+    - atomic: If any command fails, discard the changes of the whole batch
+    
+    Returns the result of every command that ran.
+    """
+    try:
+        blender = get_blender_connection()
+        result = blender.send_command("execute_batch", {"commands": commands, "atomic": atomic})
+        return _result_text(result)
+    except Exception as e:
+        logger.error(f"Error executing batch: {str(e)}")
+        return f"Error executing batch: {str(e)}"
+
+@mcp.tool()
+@traced
+def get_metrics(ctx: Context, format: str = "summary", reset: bool = False) -> str:
+    """
+    Get latency statistics of the Blender addon, per command type and per phase:
+    recv (receiving the request), queue (waiting for Blender's main thread),
+    handler (running the command) and serialize (encoding the response).
+    The summary also lists the response timeout currently used for each command.
+    
+    Parameters:
+    - format: "summary" for p50/p95/p99/max in milliseconds, "json" for the raw summary
+      in seconds, or "prometheus" for the histograms in Prometheus text format
+    - reset: Clear the statistics after reading them
+    """
+    try:
+        blender = get_blender_connection()
+        if format == "prometheus":
+            result = blender.send_command("get_metrics", {"format": "prometheus", "reset": reset})
+            return result["text"]
+        result = blender.send_command("get_metrics", {"format": "json", "reset": reset})
+        if format == "json":
+            return _result_text(result)
+
+        lines = []
+        for command_type, phases in sorted(result["commands"].items(), key=lambda item: str(item[0])):
+            errors = phases.pop("errors", 0)
+            expired = phases.pop("expired", 0)
+            count = phases.get("handler", {}).get("count", 0)
+            lines.append(f"{command_type}: {count} calls" + (f", {errors} errors" if errors else "")
+                         + (f", {expired} skipped after their deadline" if expired else ""))
+            for phase, stats in phases.items():
+                lines.append(
+                    f"  {phase:<9} p50 {stats['p50'] * 1000:8.2f} ms  p95 {stats['p95'] * 1000:8.2f} ms  "
+                    f"p99 {stats['p99'] * 1000:8.2f} ms  max {stats['max'] * 1000:8.2f} ms")
+        timeouts = blender.timeouts.snapshot()
+        if timeouts:
+            lines.append("Response timeouts:")
+            for command_type, budget in sorted(timeouts.items()):
+                lines.append(f"  {command_type:<24} {budget['timeout']:7.2f} s  ({budget['class']})")
+        return "\n".join(lines) if lines else "No commands recorded yet"
+    except Exception as e:
+        logger.error(f"Error getting metrics: {str(e)}")
+        return f"Error getting metrics: {str(e)}"
+
+@mcp.tool()
+@traced
+def start_profiling(
+    ctx: Context,
+    mode: str = "cprofile",
+    commands: List[str] = None,
+    interval: float = 0.005
+) -> str:
+    """
+    Start profiling command handlers in Blender until stop_profiling is called.
+    
+    Parameters:
+    - mode: "cprofile" (exact call counts and times, slows handlers down) or "sampling"
+      (samples the stack every `interval` seconds, low overhead)
+    - commands: Optional command types to profile, e.g. ["set_texture"] (default: all)
+    - interval: Sampling interval in seconds for the sampling mode
+    """
+    try:
+        blender = get_blender_connection()
+        params = {"mode": mode, "interval": interval}
+        if commands:
+            params["commands"] = commands
+        blender.send_command("start_profiling", params)
+        return f"Profiling started ({mode}" + (f", commands: {', '.join(commands)})" if commands else ")")
+    except Exception as e:
+        logger.error(f"Error starting profiling: {str(e)}")
+        return f"Error starting profiling: {str(e)}"
+
+@mcp.tool()
+@traced
+def stop_profiling(ctx: Context, top: int = 30, sort: str = "cumulative", save: bool = False) -> str:
+    """
+    Stop profiling and return the functions where the handlers spent the most time.
+    
+    Parameters:
+    - top: Number of functions to return
+    - sort: "cumulative" (time including callees), "self" (time in the function itself)
+      or "calls" (call count; in sampling mode, the number of samples a function appears in)
+    - save: Also save the raw data in Blender's temp directory: a .pstats file in cprofile mode,
+      or collapsed stacks for flame graph tools in sampling mode
+    """
+    try:
+        blender = get_blender_connection()
+        result = blender.send_command("stop_profiling", {"top": top, "sort": sort, "save": save})
+        return _result_text(result)
+    except Exception as e:
+        logger.error(f"Error stopping profiling: {str(e)}")
+        return f"Error stopping profiling: {str(e)}"
+
+@mcp.tool()
+@traced
+def export_trace(ctx: Context, output_path: str = None, last_traces: int = None, clear: bool = False) -> str:
+    """
+    Export recorded traces of tool calls as Chrome trace-event JSON, viewable in chrome://tracing
+    or https://ui.perfetto.dev. Each tool call is one row, with spans for sending the command,
+    waiting for the response and, inside Blender, receiving, queueing and running the handler.
+    
+    Parameters:
+    - output_path: File to write (default: a new file in the temp directory)
+    - last_traces: Only export the most recent N tool calls
+    - clear: Discard the recorded spans after exporting
+    """
+    try:
+        document = tracer.chrome_trace(last_traces)
+        if not output_path:
+            output_path = os.path.join(tempfile.gettempdir(), f"blender_mcp_trace_{int(time.time())}.json")
+        with open(output_path, "w") as f:
+            json.dump(document, f)
+        if clear:
+            tracer.clear()
+        spans = sum(1 for event in document["traceEvents"] if event["ph"] == "X")
+        return f"Wrote {spans} spans to {output_path}"
+    except Exception as e:
+        logger.error(f"Error exporting trace: {str(e)}")
+        return f"Error exporting trace: {str(e)}"
+
+@mcp.tool()
+@traced
 def get_polyhaven_categories(ctx: Context, asset_type: str = "hdris") -> str:
     """
     Get a list of categories for a specific asset type on Polyhaven.
@@ -472,7 +1428,7 @@ def get_polyhaven_categories(ctx: Context, asset_type: str = "hdris") -> str:
     """
     try:
         blender = get_blender_connection()
-        if not _polyhaven_enabled:
+        if not blender.send_command("get_polyhaven_status").get("enabled", False):
             return "PolyHaven integration is disabled. Select it in the sidebar in BlenderMCP, then run it again."
         result = blender.send_command("get_polyhaven_categories", {"asset_type": asset_type})
         
@@ -495,6 +1451,7 @@ def get_polyhaven_categories(ctx: Context, asset_type: str = "hdris") -> str:
         return f"Error getting Polyhaven categories: {str(e)}"
 
 @mcp.tool()
+@traced
 def search_polyhaven_assets(
     ctx: Context,
     asset_type: str = "all",
@@ -544,6 +1501,7 @@ def search_polyhaven_assets(
         return f"Error searching Polyhaven assets: {str(e)}"
 
 @mcp.tool()
+@traced
 def download_polyhaven_asset(
     ctx: Context,
     asset_id: str,
@@ -557,7 +1515,8 @@ def download_polyhaven_asset(
     Parameters:
     - asset_id: The ID of the asset to download
     - asset_type: The type of asset (hdris, textures, models)
-    - resolution: The resolution to download (e.g., 1k, 2k, 4k)
+    - resolution: The resolution to download (e.g., 1k, 2k, 4k). For textures keep the default 1k
+      and call upgrade_textures once the camera is set up; it raises the resolution only where needed
     - file_format: Optional file format (e.g., hdr, exr for HDRIs; jpg, png for textures; gltf, fbx for models)
     
     Returns a message indicating success or failure.
@@ -595,6 +1554,7 @@ def download_polyhaven_asset(
         return f"Error downloading Polyhaven asset: {str(e)}"
 
 @mcp.tool()
+@traced
 def set_texture(
     ctx: Context,
     object_name: str,
@@ -655,6 +1615,66 @@ def set_texture(
         return f"Error applying texture: {str(e)}"
 
 @mcp.tool()
+@traced
+def upgrade_textures(
+    ctx: Context,
+    object_names: List[str] = None,
+    max_resolution: str = "4k",
+    camera: str = None,
+    texel_ratio: float = 1.0,
+    dry_run: bool = False
+) -> str:
+    """
+    Replace low-resolution Poly Haven textures with higher resolutions on the objects that appear
+    large in the camera view. Download textures at 1k first, then call this once the camera and
+    layout are final. Objects that are small in frame keep the low-resolution textures.
+    
+    Parameters:
+    - object_names: Optional objects to consider (default: all visible mesh objects)
+    - max_resolution: Highest resolution to download (1k, 2k, 4k or 8k)
+    - camera: Optional camera name (default: the scene camera)
+    - texel_ratio: Texture pixels wanted per screen pixel covered by an object
+    - dry_run: Only report which textures would be upgraded
+    """
+    try:
+        blender = get_blender_connection()
+        params = {"max_resolution": max_resolution, "texel_ratio": texel_ratio, "dry_run": dry_run}
+        if object_names:
+            params["object_names"] = object_names
+        if camera:
+            params["camera"] = camera
+        result = blender.send_command("upgrade_textures", params)
+        return _result_text(result)
+    except Exception as e:
+        logger.error(f"Error upgrading textures: {str(e)}")
+        return f"Error upgrading textures: {str(e)}"
+
+@mcp.tool()
+@traced
+def consolidate_textures(ctx: Context, storage: str = None) -> str:
+    """
+    Pack all downloaded textures into the .blend file so it can be moved or shared on its own.
+    By default textures are only referenced from a cache directory while working and are packed
+    when the file is saved, which keeps memory use low.
+    
+    Parameters:
+    - storage: Optionally change the texture storage policy first: PACK (pack on download),
+      REFERENCE (never pack) or PACK_ON_SAVE (pack when saving)
+    """
+    try:
+        blender = get_blender_connection()
+        params = {}
+        if storage:
+            params["storage"] = storage
+        result = blender.send_command("consolidate_textures", params)
+        return (f"Packed {result['packed']} textures ({result['packed_bytes'] / 1e6:.1f} MB). "
+                f"Texture storage: {result['storage']}, cache: {result['cache_dir']}")
+    except Exception as e:
+        logger.error(f"Error consolidating textures: {str(e)}")
+        return f"Error consolidating textures: {str(e)}"
+
+@mcp.tool()
+@traced
 def get_polyhaven_status(ctx: Context) -> str:
     """
     Check if PolyHaven integration is enabled in Blender.
@@ -672,6 +1692,7 @@ def get_polyhaven_status(ctx: Context) -> str:
         return f"Error checking PolyHaven status: {str(e)}"
 
 @mcp.tool()
+@traced
 def get_hyper3d_status(ctx: Context) -> str:
     """
     Check if Hyper3D Rodin integration is enabled in Blender.
@@ -692,6 +1713,7 @@ def get_hyper3d_status(ctx: Context) -> str:
         return f"Error checking Hyper3D status: {str(e)}"
 
 @mcp.tool()
+@traced
 def generate_hyper3d_model_via_text(
     ctx: Context,
     text_prompt: str,
@@ -722,13 +1744,14 @@ def generate_hyper3d_model_via_text(
                 "subscription_key": result["jobs"]["subscription_key"],
             })
         else:
-            return json.dumps(result)
+            return _result_text(result)
     except Exception as e:
         logger.error(f"Error generating Hyper3D task: {str(e)}")
         return f"Error generating Hyper3D task: {str(e)}"
     return f"Placeholder, under development, not implemented yet."
 
 @mcp.tool()
+@traced
 def generate_hyper3d_model_via_images(
     ctx: Context,
     input_image_paths: list[str]=None,
@@ -779,12 +1802,13 @@ def generate_hyper3d_model_via_images(
                 "subscription_key": result["jobs"]["subscription_key"],
             })
         else:
-            return json.dumps(result)
+            return _result_text(result)
     except Exception as e:
         logger.error(f"Error generating Hyper3D task: {str(e)}")
         return f"Error generating Hyper3D task: {str(e)}"
 
 @mcp.tool()
+@traced
 def poll_rodin_job_status(
     ctx: Context,
     subscription_key: str=None,
@@ -828,6 +1852,7 @@ def poll_rodin_job_status(
         return f"Error generating Hyper3D task: {str(e)}"
 
 @mcp.tool()
+@traced
 def import_generated_asset(
     ctx: Context,
     name: str,
@@ -901,13 +1926,18 @@ def asset_creation_strategy() -> str:
        
     2. If all integrations are disabled or when falling back to basic tools:
        - create_object() for basic primitives (CUBE, SPHERE, CYLINDER, etc.)
-       - set_material() for basic colors and materials
+       - scatter_instances() when many copies of the same object are needed
+       - modify_objects() to move, rotate, scale or hide many objects at once
+       - set_material() for basic colors and materials, set_materials_bulk() when coloring many objects
     
     3. When including an object into scene, ALWAYS make sure that the name of the object is meanful.
 
     4. Always check the world_bounding_box for each item so that:
         - Ensure that all objects that should not be clipping are not clipping.
         - Items have right spatial relationship.
+       Use find_overlaps() to check the whole scene for clipping in one call instead of comparing
+       bounding boxes yourself, and find_free_placement() / nearest_objects() / query_region()
+       to pick spots for new items.
     
     5. After giving the tool location/scale/rotation information (via create_object() and modify_object()),
        double check the related object's location, scale, rotation, and world_bounding_box using get_object_info(),
@@ -925,6 +1955,21 @@ def asset_creation_strategy() -> str:
 
 def main():
     """Run the MCP server"""
+    import argparse
+
+    global _blender_url
+    parser = argparse.ArgumentParser(description="BlenderMCP server")
+    parser.add_argument("--url", default=None,
+                        help=f"Blender addon address: tcp://host:port or unix:///path/to/socket, with an "
+                             f"optional ?shm=0/1 (default: $BLENDER_MCP_URL or {DEFAULT_URL})")
+    parser.add_argument("--host", default=None, help="Shorthand for --url tcp://HOST:PORT")
+    parser.add_argument("--port", type=int, default=None, help="Shorthand for --url tcp://HOST:PORT")
+    args = parser.parse_args()
+    if args.url:
+        _blender_url = args.url
+    elif args.host or args.port:
+        _blender_url = f"tcp://{args.host or 'localhost'}:{args.port or 9876}"
+    BlenderConnection.from_url(_blender_url)  # Fail early on a malformed URL
     mcp.run()
 
 if __name__ == "__main__":
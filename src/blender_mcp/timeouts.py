@@ -0,0 +1,79 @@
+# timeouts.py
+"""Adaptive response timeouts for commands sent to Blender.
+
+Each command belongs to a class with a floor, an initial and a ceiling
+timeout. Once a command type has been seen, its timeout follows its recent
+latency the way TCP's retransmission timer does (smoothed latency plus four
+mean deviations, RFC 6298), kept between the class floor and ceiling. A
+timeout doubles the budget of that command type for the next call.
+"""
+import threading
+from typing import Dict, Tuple
+
+# (floor, initial, ceiling) in seconds
+COMMAND_CLASSES: Dict[str, Tuple[float, float, float]] = {
+    "query": (2.0, 5.0, 15.0),
+    "edit": (5.0, 15.0, 60.0),
+    "heavy": (30.0, 180.0, 900.0),
+}
+
+# Commands not listed here are "edit"
+COMMAND_CLASS_OF: Dict[str, str] = {
+    **dict.fromkeys((
+        "get_scene_info", "get_object_info", "get_polyhaven_status", "get_hyper3d_status",
+        "get_metrics", "start_profiling", "find_overlaps", "query_region", "nearest_objects",
+        "find_free_placement", "begin_transaction",
+    ), "query"),
+    **dict.fromkeys((
+        "execute_code", "execute_batch", "get_mesh_data", "set_mesh_data", "scatter_instances",
+        "stop_profiling", "commit_transaction", "rollback_transaction",
+        "download_polyhaven_asset", "set_texture", "upgrade_textures", "consolidate_textures",
+        "create_rodin_job", "import_generated_asset",
+    ), "heavy"),
+}
+
+
+class AdaptiveTimeouts:
+    """Per-command-type timeout budgets that follow observed latency"""
+
+    def __init__(self):
+        self._estimates: Dict[str, Tuple[float, float]] = {}  # command type -> (smoothed, deviation)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def command_class(command_type: str) -> str:
+        return COMMAND_CLASS_OF.get(command_type, "edit")
+
+    def budget(self, command_type: str) -> float:
+        """Seconds to wait for the response to a command"""
+        floor, initial, ceiling = COMMAND_CLASSES[self.command_class(command_type)]
+        with self._lock:
+            estimate = self._estimates.get(command_type)
+        if estimate is None:
+            return initial
+        smoothed, deviation = estimate
+        return min(ceiling, max(floor, smoothed + 4 * deviation))
+
+    def record(self, command_type: str, seconds: float) -> None:
+        """Fold the latency of a completed command into its estimate"""
+        with self._lock:
+            estimate = self._estimates.get(command_type)
+            if estimate is None:
+                self._estimates[command_type] = (seconds, seconds / 2)
+            else:
+                smoothed, deviation = estimate
+                deviation = 0.75 * deviation + 0.25 * abs(smoothed - seconds)
+                self._estimates[command_type] = (0.875 * smoothed + 0.125 * seconds, deviation)
+
+    def record_timeout(self, command_type: str, budget: float) -> None:
+        """Back off after a timeout: the next budget is twice the one that ran out"""
+        with self._lock:
+            self._estimates[command_type] = (budget, budget / 4)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            commands = list(self._estimates)
+        return {
+            command_type: {"class": self.command_class(command_type), "timeout": self.budget(command_type)}
+            for command_type in commands
+        }
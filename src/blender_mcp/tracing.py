@@ -0,0 +1,137 @@
+# tracing.py
+"""Lightweight request tracing for MCP tool calls.
+
+Every tool call opens a span; send_command adds child spans and passes the
+trace context to the addon in the command envelope. The addon returns its own
+spans (receive, queue wait, handler) with the response, and they are merged
+here so one tool call can be viewed as a single timeline. Traces are kept in
+memory and exported as Chrome trace-event JSON (chrome://tracing, Perfetto).
+"""
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+_current_span = contextvars.ContextVar("blender_mcp_span", default=None)
+
+# Chrome trace "process" used for spans recorded on each side of the socket
+PROCESS_IDS = {"mcp-server": 1, "blender": 2}
+
+
+class Span:
+    """One timed operation, microseconds since the epoch"""
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_us", "duration_us", "process", "attributes")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, process: str = "mcp-server",
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_us = time.time_ns() // 1000
+        self.duration_us = 0
+        self.process = process
+        self.attributes = attributes or {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Tracer:
+    """Records finished spans in a bounded buffer"""
+
+    def __init__(self, max_spans: int = 20000):
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        return _current_span.get()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time a block as a child of the current span, or as the root of a new trace"""
+        parent = _current_span.get()
+        span = Span(
+            name,
+            trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes,
+        )
+        token = _current_span.set(span)
+        started = time.perf_counter_ns()
+        try:
+            yield span
+        except BaseException as e:
+            span.attributes["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration_us = (time.perf_counter_ns() - started) // 1000
+            _current_span.reset(token)
+            with self._lock:
+                self.spans.append(span.to_dict())
+
+    def add_remote_spans(self, spans: List[Dict[str, Any]]) -> None:
+        """Merge spans recorded by the addon"""
+        with self._lock:
+            self.spans.extend(spans)
+
+    def chrome_trace(self, last_traces: Optional[int] = None) -> Dict[str, Any]:
+        """Build a Chrome trace-event document, one row (thread) per trace"""
+        with self._lock:
+            spans = list(self.spans)
+
+        trace_order = []
+        seen = set()
+        for span in spans:
+            if span["trace_id"] not in seen:
+                seen.add(span["trace_id"])
+                trace_order.append(span["trace_id"])
+        if last_traces is not None:
+            trace_order = trace_order[-last_traces:] if last_traces > 0 else []
+        rows = {trace_id: index + 1 for index, trace_id in enumerate(trace_order)}
+
+        events = [
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": process}}
+            for process, pid in PROCESS_IDS.items()
+        ]
+        for span in spans:
+            row = rows.get(span["trace_id"])
+            if row is None:
+                continue
+            events.append({
+                "name": span["name"],
+                "cat": span["process"],
+                "ph": "X",
+                "ts": span["start_us"],
+                "dur": span["duration_us"],
+                "pid": PROCESS_IDS.get(span["process"], 0),
+                "tid": row,
+                "args": {
+                    "trace_id": span["trace_id"],
+                    "span_id": span["span_id"],
+                    "parent_id": span["parent_id"],
+                    **span["attributes"],
+                },
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+
+tracer = Tracer()
+
+
+def traced(fn):
+    """Run a tool function inside a span named after it"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with tracer.span(f"tool:{fn.__name__}"):
+            return fn(*args, **kwargs)
+    return wrapper
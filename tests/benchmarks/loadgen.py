@@ -0,0 +1,500 @@
+"""Load generator for BlenderConnection.send_command.
+
+Starts a mock addon server that speaks the addon's wire protocol (framed, or
+bare JSON for old clients) without Blender, then drives it from concurrent
+clients with a weighted mix of commands and reply sizes:
+
+    python tests/benchmarks/loadgen.py --concurrency 8 --duration 10 \\
+        --mix "get_scene_info:80:1KB,get_mesh_data:15:1MB,render:5:50MB:20"
+
+Each mix entry is ``type:weight:reply size[:handler ms]``. The report gives
+req/s, latency percentiles and bytes/s per command type and overall; --json
+prints it machine readable. --target host:port drives a running addon instead
+of the mock, in which case reply sizes are whatever Blender returns.
+
+The mock runs handlers one at a time like Blender's main thread (--parallel
+lifts that) and pre-encodes its replies, so the numbers measure the transport
+and the client rather than JSON encoding on the server side, which
+test_framing.py covers.
+"""
+import argparse
+import base64
+import json
+import logging
+import math
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import blender_mcp  # noqa: F401
+except ImportError:
+    sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from blender_mcp.protocol import (  # noqa: E402
+    BinaryAttachment, FRAME_MAGIC, FRAME_PREFIX, FRAME_VERSION, decode_frame, encode_frame,
+)
+from blender_mcp.server import BlenderConnection  # noqa: E402
+
+_SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    """'512', '1KB', '50MB' -> bytes"""
+    text = text.strip().upper()
+    for unit in sorted(_SIZE_UNITS, key=len, reverse=True):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * _SIZE_UNITS[unit])
+    return int(text)
+
+
+def format_size(count: float) -> str:
+    for unit in ("GB", "MB", "KB"):
+        if count >= _SIZE_UNITS[unit]:
+            return f"{count / _SIZE_UNITS[unit]:.1f}{unit}"
+    return f"{count:.0f}B"
+
+
+@dataclass
+class MixEntry:
+    command_type: str
+    weight: float
+    reply_bytes: int
+    handler_ms: float = 0.0
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return {"reply_bytes": self.reply_bytes, "handler_ms": self.handler_ms}
+
+
+def parse_mix(text: str) -> List[MixEntry]:
+    """'type:weight:size[:handler ms],...' -> mix entries"""
+    entries = []
+    for item in text.split(","):
+        fields = item.strip().split(":")
+        if len(fields) not in (3, 4):
+            raise ValueError(f"Mix entry must be type:weight:size[:handler_ms], got {item!r}")
+        handler_ms = float(fields[3]) if len(fields) == 4 else 0.0
+        entries.append(MixEntry(fields[0], float(fields[1]), parse_size(fields[2]), handler_ms))
+    return entries
+
+
+class MockAddonServer:
+    """Stand-in for the addon's socket server.
+
+    Every command is answered with a payload of params["reply_bytes"] bytes
+    after sleeping params["handler_ms"], echoing the request id. Replies use
+    the protocol the client spoke, or bare JSON when legacy_replies is set. The payload is a JSON
+    string, or a binary attachment with reply_kind="attachment".
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, serial: bool = True,
+                 reply_kind: str = "json", legacy_replies: bool = False):
+        if reply_kind not in ("json", "attachment"):
+            raise ValueError(f"Unknown reply kind: {reply_kind}")
+        self.host = host
+        self.port = port
+        self.serial = serial
+        self.reply_kind = reply_kind
+        self.legacy_replies = legacy_replies
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.commands = 0
+        self._socket = None
+        self._threads = []
+        self._connections = set()
+        self._lock = threading.Lock()
+        self._main_thread = threading.Lock()  # Handlers run one at a time, as in Blender
+        self._replies = {}
+        self.running = False
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._socket.getsockname()
+
+    def start(self) -> "MockAddonServer":
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen(64)
+        self.running = True
+        thread = threading.Thread(target=self._accept_loop, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return self
+
+    def stop(self) -> None:
+        self.running = False
+        try:
+            # Unblock accept()
+            socket.create_connection(self.address, timeout=1.0).close()
+        except OSError:
+            pass
+        with self._lock:
+            connections = list(self._connections)
+        for sock in connections:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._socket.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                sock, _ = self._socket.accept()
+            except OSError:
+                break
+            if not self.running:
+                sock.close()
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self._connections.add(sock)
+            thread = threading.Thread(target=self._serve, args=(sock,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _serve(self, sock):
+        try:
+            reader = _Reader(sock)
+            while self.running:
+                command, framed, size = reader.read_command()
+                if command is None:
+                    break
+                reply = self._reply(command, framed and not self.legacy_replies, time.perf_counter())
+                for buffer in reply:
+                    sock.sendall(buffer)
+                with self._lock:
+                    self.commands += 1
+                    self.bytes_received += size
+                    self.bytes_sent += sum(len(buffer) for buffer in reply)
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._connections.discard(sock)
+            sock.close()
+
+    def _reply(self, command: Dict[str, Any], framed: bool, received_at: float) -> List[memoryview]:
+        params = command.get("params") or {}
+        handler_ms = float(params.get("handler_ms", 0.0))
+        timeout = command.get("timeout")
+        if handler_ms:
+            with self._main_thread if self.serial else nullcontext():
+                # Like the addon, skip commands whose client has stopped waiting
+                if timeout and time.perf_counter() - received_at >= timeout:
+                    return self._frame_reply(command, framed, self._encode_reply(
+                        {"status": "error", "message": "Deadline exceeded"}, framed))
+                time.sleep(handler_ms / 1000)
+
+        key = (int(params.get("reply_bytes", 0)), framed)
+        encoded = self._replies.get(key)
+        if encoded is None:
+            encoded = self._replies[key] = self._encode_reply(self._response(key[0]), framed)
+        return self._frame_reply(command, framed, encoded)
+
+    def _response(self, reply_bytes: int) -> Dict[str, Any]:
+        if self.reply_kind == "attachment":
+            data = BinaryAttachment(bytearray(reply_bytes))
+        else:
+            data = "x" * reply_bytes
+        return {"status": "success", "result": {"data": data}}
+
+    @staticmethod
+    def _encode_reply(response: Dict[str, Any], framed: bool):
+        """Encode a response once: (JSON header without its opening brace, attachments, attachment bytes)"""
+        if framed:
+            buffers = encode_frame(response)
+            attachments = buffers[1:]
+            return buffers[0][FRAME_PREFIX.size + 1:], attachments, sum(len(buffer) for buffer in attachments)
+        data = response.get("result", {}).get("data")
+        if isinstance(data, BinaryAttachment):
+            # Same inlining as the addon does for bare JSON clients
+            response["result"]["data"] = {"base64": base64.b64encode(data.data).decode("ascii"),
+                                          "dtype": data.dtype, "shape": data.shape}
+        return memoryview(json.dumps(response).encode("utf-8"))[1:], [], 0
+
+    @staticmethod
+    def _frame_reply(command: Dict[str, Any], framed: bool, encoded) -> List[memoryview]:
+        """Put the request id in front of a pre-encoded response, as the addon echoes it"""
+        rest, attachments, attachments_length = encoded
+        request_id = command.get("id")
+        head = b"{" if request_id is None else b'{"id": ' + json.dumps(request_id).encode("utf-8") + b", "
+        if not framed:
+            return [memoryview(head), rest]
+        prefix = FRAME_PREFIX.pack(FRAME_MAGIC, FRAME_VERSION, 0, len(head) + len(rest), attachments_length)
+        return [memoryview(prefix + head), rest, *attachments]
+
+
+class _Reader:
+    """Blocking reader for commands in either protocol"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = bytearray()
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, count: int) -> bool:
+        while len(self.buffer) < count:
+            data = self.sock.recv(max(65536, count - len(self.buffer)))
+            if not data:
+                return False
+            self.buffer += data
+        return True
+
+    def read_command(self):
+        """Next (command, framed, wire bytes), or (None, False, 0) when the client left"""
+        if not self._fill(1):
+            return None, False, 0
+        if self.buffer[:1] == FRAME_MAGIC[:1]:
+            if not self._fill(FRAME_PREFIX.size):
+                return None, False, 0
+            _, _, _, header_length, attachments_length = FRAME_PREFIX.unpack_from(self.buffer)
+            size = FRAME_PREFIX.size + header_length + attachments_length
+            if not self._fill(size):
+                return None, False, 0
+            header = self.buffer[FRAME_PREFIX.size:FRAME_PREFIX.size + header_length]
+            body = self.buffer[FRAME_PREFIX.size + header_length:size]
+            del self.buffer[:size]
+            return decode_frame(header, body), True, size
+
+        while True:
+            text = self.buffer.decode("utf-8", errors="ignore").lstrip()
+            try:
+                command, end = self.decoder.raw_decode(text)
+            except json.JSONDecodeError:
+                data = self.sock.recv(65536)
+                if not data:
+                    return None, False, 0
+                self.buffer += data
+                continue
+            size = len(text[:end].encode("utf-8"))
+            self.buffer = bytearray(text[end:].encode("utf-8"))
+            return command, False, size
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+@dataclass
+class _Stats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    payload_bytes: int = 0
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        latency = {
+            name: percentile(ordered, fraction) * 1000
+            for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p999", 0.999))
+        }
+        latency["max"] = ordered[-1] * 1000 if ordered else 0.0
+        return {
+            "requests": len(ordered),
+            "errors": self.errors,
+            "req_per_s": len(ordered) / elapsed if elapsed else 0.0,
+            "payload_bytes_per_s": self.payload_bytes / elapsed if elapsed else 0.0,
+            "latency_ms": latency,
+        }
+
+
+def _payload_size(result: Any) -> int:
+    data = result.get("data") if isinstance(result, dict) else None
+    if isinstance(data, BinaryAttachment):
+        return data.nbytes
+    if isinstance(data, str):
+        return len(data)
+    if data is None:
+        return len(json.dumps(result))
+    return len(json.dumps(data))
+
+
+def run_load(host: str, port: int, mix: List[MixEntry], concurrency: int = 1, requests: Optional[int] = None,
+             duration: Optional[float] = None, warmup: int = 0, shared_connection: bool = False,
+             seed: int = 0, on_start=None) -> Dict[str, Any]:
+    """Send commands from `concurrency` threads until `requests` are done or `duration` seconds pass.
+
+    Each thread owns a BlenderConnection, unless shared_connection is set: then
+    all threads take turns on one connection, as the MCP server's tools do.
+    on_start is called once warm-up is over, right before measuring starts.
+    """
+    if requests is None and duration is None:
+        raise ValueError("Either requests or duration is required")
+    weights = [entry.weight for entry in mix]
+    shared = BlenderConnection(host=host, port=port) if shared_connection else None
+    shared_lock = threading.Lock()
+    stats = {entry.command_type: _Stats() for entry in mix}
+    stats_lock = threading.Lock()
+    remaining = [requests]
+    start_gate = threading.Barrier(concurrency + 1)
+    deadline = [None]
+
+    def take_ticket() -> bool:
+        with stats_lock:
+            if deadline[0] is not None and time.perf_counter() >= deadline[0]:
+                return False
+            if remaining[0] is not None:
+                if remaining[0] <= 0:
+                    return False
+                remaining[0] -= 1
+            return True
+
+    def worker(index: int):
+        rng = random.Random(seed + index)
+        connection = shared or BlenderConnection(host=host, port=port)
+        send = connection.send_command
+        for _ in range(warmup):
+            entry = rng.choices(mix, weights)[0]
+            try:
+                with shared_lock if shared else nullcontext():
+                    send(entry.command_type, entry.params)
+            except Exception:
+                pass
+        start_gate.wait()
+
+        local = {entry.command_type: _Stats() for entry in mix}
+        while take_ticket():
+            entry = rng.choices(mix, weights)[0]
+            started = time.perf_counter()
+            try:
+                with shared_lock if shared else nullcontext():
+                    result = send(entry.command_type, entry.params)
+            except Exception:
+                local[entry.command_type].errors += 1
+                continue
+            local[entry.command_type].latencies.append(time.perf_counter() - started)
+            local[entry.command_type].payload_bytes += _payload_size(result)
+
+        if not shared:
+            connection.disconnect()
+        with stats_lock:
+            for command_type, result in local.items():
+                stats[command_type].latencies.extend(result.latencies)
+                stats[command_type].errors += result.errors
+                stats[command_type].payload_bytes += result.payload_bytes
+
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    if on_start:
+        on_start()
+    start_gate.wait()
+    started = time.perf_counter()
+    if duration is not None:
+        deadline[0] = started + duration
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if shared:
+        shared.disconnect()
+
+    total = _Stats()
+    for result in stats.values():
+        total.latencies.extend(result.latencies)
+        total.errors += result.errors
+        total.payload_bytes += result.payload_bytes
+    return {
+        "elapsed_s": elapsed,
+        "concurrency": concurrency,
+        "shared_connection": shared_connection,
+        "total": total.summary(elapsed),
+        "commands": {command_type: result.summary(elapsed) for command_type, result in stats.items()},
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"{report['elapsed_s']:.2f}s, concurrency {report['concurrency']}"
+        f"{' (shared connection)' if report['shared_connection'] else ''}",
+    ]
+    if "wire" in report:
+        wire = report["wire"]
+        lines.append(f"wire: {format_size(wire['bytes_sent_per_s'])}/s to clients, "
+                     f"{format_size(wire['bytes_received_per_s'])}/s from clients")
+    lines.append(f"{'command':<24}{'requests':>9}{'errors':>7}{'req/s':>10}{'payload/s':>11}"
+                 f"{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'p99.9 ms':>10}{'max ms':>9}")
+    rows = list(report["commands"].items()) + [("total", report["total"])]
+    for name, summary in rows:
+        latency = summary["latency_ms"]
+        lines.append(
+            f"{name:<24}{summary['requests']:>9}{summary['errors']:>7}{summary['req_per_s']:>10.1f}"
+            f"{format_size(summary['payload_bytes_per_s']) + '/s':>11}"
+            f"{latency['p50']:>9.2f}{latency['p90']:>9.2f}{latency['p99']:>9.2f}{latency['p999']:>10.2f}"
+            f"{latency['max']:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mix", default="get_scene_info:1:1KB",
+                        help="Comma separated type:weight:reply size[:handler ms] entries")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--requests", type=int, help="Total requests to send")
+    parser.add_argument("--duration", type=float, help="Seconds to run (default 5 when --requests is not given)")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed requests per client before measuring")
+    parser.add_argument("--shared-connection", action="store_true",
+                        help="All clients take turns on one connection, like the MCP server")
+    parser.add_argument("--reply-kind", choices=("json", "attachment"), default="json",
+                        help="Mock payload as a JSON string or as a binary attachment")
+    parser.add_argument("--legacy-replies", action="store_true", help="Mock replies with bare JSON")
+    parser.add_argument("--parallel", action="store_true", help="Mock runs handlers concurrently")
+    parser.add_argument("--target", help="host:port of a running addon instead of the mock")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--log-level", default="WARNING", help="Level of the BlenderMCPServer logger")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("BlenderMCPServer").setLevel(args.log_level.upper())
+    mix = parse_mix(args.mix)
+    duration = args.duration if args.duration is not None or args.requests is not None else 5.0
+
+    mock = None
+    if args.target:
+        host, _, port = args.target.rpartition(":")
+        host, port = host or "localhost", int(port)
+    else:
+        mock = MockAddonServer(serial=not args.parallel, reply_kind=args.reply_kind,
+                               legacy_replies=args.legacy_replies).start()
+        host, port = mock.address
+    try:
+        before = []
+        on_start = (lambda: before.extend((mock.bytes_sent, mock.bytes_received))) if mock else None
+        report = run_load(host, port, mix, args.concurrency, args.requests, duration, args.warmup,
+                          args.shared_connection, args.seed, on_start)
+        if mock:
+            elapsed = report["elapsed_s"]
+            report["wire"] = {
+                "bytes_sent_per_s": (mock.bytes_sent - before[0]) / elapsed,
+                "bytes_received_per_s": (mock.bytes_received - before[1]) / elapsed,
+            }
+    finally:
+        if mock:
+            mock.stop()
+
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
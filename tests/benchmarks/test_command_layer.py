@@ -0,0 +1,55 @@
+"""Benchmarks of the addon's command handlers at growing scene sizes"""
+import pytest
+
+
+def _mesh_objects(objects):
+    return [obj for obj in objects if obj.type == 'MESH']
+
+
+def test_get_scene_info(benchmark, server, synthetic_scene):
+    info = benchmark(server.get_scene_info)
+    assert info["object_count"] == len(synthetic_scene)
+    assert len(info["objects"]) == min(10, len(synthetic_scene))
+
+
+def test_get_object_info(benchmark, server, synthetic_scene):
+    obj = _mesh_objects(synthetic_scene)[-1]
+    info = benchmark(server.get_object_info, obj.name)
+    assert info["name"] == obj.name
+    assert info["mesh"]["vertices"] == 8
+    assert "world_bounding_box" in info
+
+
+def test_get_aabb(benchmark, server, synthetic_scene):
+    obj = _mesh_objects(synthetic_scene)[-1]
+    box = benchmark(server._get_aabb, obj)
+    center = [(low + high) / 2 for low, high in zip(*box)]
+    assert center == pytest.approx(list(obj.location))
+
+
+def test_get_world_aabbs(benchmark, server, synthetic_scene):
+    boxes = benchmark(server._get_world_aabbs, synthetic_scene)
+    assert len(boxes) == len(synthetic_scene)
+    assert sum(box is None for box in boxes) == len(synthetic_scene) - len(_mesh_objects(synthetic_scene))
+
+
+@pytest.mark.parametrize("command_type", [
+    "get_scene_info",
+    "get_object_info",
+    "find_overlaps",
+    "query_region",
+    "nearest_objects",
+])
+def test_execute_command_internal(benchmark, server, synthetic_scene, command_type):
+    name = _mesh_objects(synthetic_scene)[-1].name
+    params = {
+        "get_scene_info": {},
+        "get_object_info": {"name": name},
+        "find_overlaps": {"name": name},
+        "query_region": {"box_min": [-2, -2, -2], "box_max": [2, 2, 2]},
+        "nearest_objects": {"name": name, "count": 5},
+    }[command_type]
+    command = {"type": command_type, "params": params}
+
+    response = benchmark(server._execute_command_internal, command)
+    assert response["status"] == "success", response.get("message")
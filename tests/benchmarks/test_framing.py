@@ -0,0 +1,136 @@
+"""Benchmarks of response encoding and of receiving commands over a socket"""
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+import addon
+
+
+@pytest.fixture(scope="session")
+def scene_listing(server, synthetic_scene):
+    """A response listing every object, as large scene queries return"""
+    boxes = server._get_world_aabbs(synthetic_scene)
+    objects = [
+        {"name": obj.name, "type": obj.type, "location": list(obj.location), "world_bounding_box": box}
+        for obj, box in zip(synthetic_scene, boxes)
+    ]
+    return {"status": "success", "result": {"objects": objects, "count": len(objects)}}
+
+
+@pytest.fixture(scope="session")
+def vertex_payload(synthetic_scene):
+    """A command carrying 8 float32 vertices per object as a binary attachment"""
+    vertices = np.random.default_rng(0).random((len(synthetic_scene) * 8, 3), dtype=np.float32)
+    return {
+        "type": "set_mesh_data",
+        "params": {"name": "bench", "vertices": addon.BinaryAttachment.from_array(vertices)},
+    }
+
+
+class _Client(addon._ClientConnection):
+    def reset(self):
+        self.buffer = bytearray()
+        self.frame_header = None
+        self.inflater = None
+        self.attachment_buffer = None
+        self.attachment_received = 0
+        self.pending.clear()
+        self.recv_started = None
+
+
+def _joined(buffers):
+    return b"".join(bytes(buffer) for buffer in buffers)
+
+
+def _require_codec(codec):
+    if codec == "msgpack" and addon.msgpack is None:
+        pytest.skip("msgpack is not installed")
+
+
+@pytest.mark.parametrize("codec", ["json", "msgpack", None], ids=["framed-json", "framed-msgpack", "legacy"])
+def test_encode_response(benchmark, server, scene_listing, codec):
+    _require_codec(codec)
+    client = _Client(None, None)
+    client.framed = codec is not None
+    client.codec = codec
+    buffers = benchmark(server._encode_response, client, scene_listing)
+    assert sum(len(buffer) for buffer in buffers) > 0
+
+
+@pytest.mark.parametrize("codec", ["json", "msgpack"])
+@pytest.mark.parametrize("payload", ["listing", "attachment"])
+def test_parse_frames(benchmark, server, scene_listing, vertex_payload, payload, codec):
+    _require_codec(codec)
+    message = scene_listing if payload == "listing" else vertex_payload
+    data = _joined(addon._encode_frame(message, codec=codec))
+    client = _Client(None, None)
+    client.framed = True
+
+    def parse():
+        client.reset()
+        client.buffer += data
+        return server._parse_frames(client)
+
+    commands = benchmark(parse)
+    assert len(commands) == 1
+
+
+@pytest.mark.parametrize("compression", ["zlib", "zstd"])
+def test_parse_compressed_frames(benchmark, server, scene_listing, compression):
+    if compression == "zstd" and addon.zstandard is None:
+        pytest.skip("zstandard is not installed")
+    data = _joined(addon._compress_frame(addon._encode_frame(scene_listing), compression, threshold=0))
+    client = _Client(None, None)
+    client.framed = True
+
+    def parse():
+        client.reset()
+        client.buffer += data
+        return server._parse_frames(client)
+
+    commands = benchmark(parse)
+    assert commands == [scene_listing]
+
+
+def test_parse_legacy_json(benchmark, server, scene_listing):
+    data = _joined(server._encode_response(_Client(None, None), scene_listing))
+    client = _Client(None, None)
+    client.framed = False
+
+    def parse():
+        client.reset()
+        client.buffer += data
+        return server._parse_legacy_commands(client)
+
+    commands = benchmark(parse)
+    assert len(commands) == 1
+
+
+@pytest.mark.parametrize("payload", ["listing", "attachment"])
+def test_socket_receive(benchmark, server, scene_listing, vertex_payload, payload):
+    """Time from the first byte written until the server has queued the parsed command"""
+    message = scene_listing if payload == "listing" else vertex_payload
+    buffers = addon._encode_frame(message)
+    sender, receiver = socket.socketpair()
+    client = _Client(receiver, "bench")
+    client.framed = True
+
+    def receive():
+        client.reset()
+        server._ready_clients.clear()
+        writer = threading.Thread(target=lambda: [sender.sendall(buffer) for buffer in buffers])
+        writer.start()
+        while not client.pending and not client.closed:
+            server._read_client(client)
+        writer.join()
+        return len(client.pending)
+
+    try:
+        assert benchmark(receive) == 1
+    finally:
+        sender.close()
+        receiver.close()
+        server._ready_clients.clear()
+        server._queue_scheduled = False
@@ -0,0 +1,37 @@
+"""Round-trip benchmarks of BlenderConnection.send_command against the mock addon server"""
+import pytest
+
+from loadgen import MixEntry, MockAddonServer, parse_size, run_load
+from blender_mcp.server import BlenderConnection
+
+REPLY_SIZES = ["1KB", "1MB", "16MB"]
+# Bare JSON replies are re-parsed after every 8KB read, which is quadratic in the reply size
+LEGACY_MAX_REPLY = parse_size("1MB")
+
+
+@pytest.fixture(scope="module", params=["framed", "legacy"])
+def mock_server(request):
+    with MockAddonServer(legacy_replies=request.param == "legacy") as server:
+        yield server
+
+
+@pytest.mark.parametrize("reply_size", REPLY_SIZES)
+def test_send_command(benchmark, mock_server, reply_size):
+    params = {"reply_bytes": parse_size(reply_size)}
+    if mock_server.legacy_replies and params["reply_bytes"] > LEGACY_MAX_REPLY:
+        pytest.skip("too slow with bare JSON replies")
+    connection = BlenderConnection(*mock_server.address)
+    try:
+        result = benchmark(connection.send_command, "get_scene_info", params)
+    finally:
+        connection.disconnect()
+    assert len(result["data"]) == params["reply_bytes"]
+
+
+@pytest.mark.parametrize("shared_connection", [False, True], ids=["per-client", "shared"])
+def test_concurrent_load(mock_server, shared_connection):
+    mix = [MixEntry("get_scene_info", 9, parse_size("1KB")), MixEntry("get_mesh_data", 1, parse_size("256KB"), 1.0)]
+    report = run_load(*mock_server.address, mix, concurrency=4, requests=200, shared_connection=shared_connection)
+    assert report["total"]["requests"] == 200
+    assert report["total"]["errors"] == 0
+    assert report["total"]["latency_ms"]["p50"] <= report["total"]["latency_ms"]["p99"]
@@ -0,0 +1,104 @@
+"""Shared fixtures: load addon.py outside Blender and build synthetic scenes.
+
+When bpy cannot be imported, the stand-in package in tests/fake_bpy (bpy,
+mathutils, bmesh) goes first on sys.path. Inside Blender the real modules are
+used instead and the same tests run against them:
+
+    blender -b --python-expr "import pytest; pytest.main(['tests'])"
+
+Scenes are built through the regular bpy data API. Their sizes come from
+--scene-sizes, e.g. ``pytest tests --scene-sizes 100,1000``.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import bpy
+except ImportError:
+    sys.path.insert(0, os.path.join(ROOT, "tests", "fake_bpy"))
+    import bpy
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+import addon  # noqa: E402
+
+SCENE_SIZES = (100, 1_000, 10_000, 100_000)
+
+# Unit cube, faces wound outwards
+CUBE_VERTICES = [(x, y, z) for x in (-1.0, 1.0) for y in (-1.0, 1.0) for z in (-1.0, 1.0)]
+CUBE_FACES = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+
+# One object in EMPTY_EVERY is an empty, so the bounding box code sees objects without extent
+EMPTY_EVERY = 10
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--scene-sizes",
+        default=",".join(str(size) for size in SCENE_SIZES),
+        help="Comma separated object counts of the synthetic scenes",
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "scene_size" in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption("scene_sizes").split(",") if size]
+        metafunc.parametrize("scene_size", sizes, ids=[f"{size}obj" for size in sizes], scope="session")
+
+
+@pytest.fixture(scope="session")
+def registered_addon():
+    """The addon with its scene properties registered"""
+    addon.register()
+    yield addon
+    addon.unregister()
+
+
+@pytest.fixture(scope="session")
+def server(registered_addon):
+    """A server instance whose handlers are called directly, without starting the socket"""
+    return registered_addon.BlenderMCPServer()
+
+
+def build_scene(count, seed=0):
+    """Link `count` objects to the scene: cubes sharing one mesh, plus some empties"""
+    rng = np.random.default_rng(seed)
+    # Keep the density constant so spatial queries see similar neighbourhoods at every size
+    side = max(count ** (1 / 3), 1.0) * 4.0
+    locations = rng.uniform(-side, side, (count, 3))
+    rotations = rng.uniform(-np.pi, np.pi, (count, 3))
+    scales = rng.uniform(0.25, 2.0, (count, 1)).repeat(3, axis=1)
+
+    mesh = bpy.data.meshes.new("bench_cube")
+    mesh.from_pydata(CUBE_VERTICES, [], CUBE_FACES)
+    mesh.update()
+
+    collection = bpy.context.scene.collection
+    objects = []
+    for i in range(count):
+        data = None if i % EMPTY_EVERY == EMPTY_EVERY - 1 else mesh
+        obj = bpy.data.objects.new(f"bench_{i:06d}", data)
+        obj.location = locations[i]
+        obj.rotation_euler = rotations[i]
+        obj.scale = scales[i]
+        collection.objects.link(obj)
+        objects.append(obj)
+    bpy.context.view_layer.update()
+    return mesh, objects
+
+
+@pytest.fixture(scope="session")
+def synthetic_scene(server, scene_size):
+    """Objects of a scene with `scene_size` objects, removed again afterwards"""
+    mesh, objects = build_scene(scene_size)
+    server.spatial_index.invalidate()
+    yield objects
+    for obj in objects:
+        bpy.data.objects.remove(obj, do_unlink=True)
+    bpy.data.meshes.remove(mesh)
+    server.spatial_index.invalidate()
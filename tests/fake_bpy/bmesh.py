@@ -0,0 +1,13 @@
+"""Stand-in for bmesh: importable, but mesh editing is not modelled"""
+
+
+class _Unavailable:
+    def __getattr__(self, name):
+        raise NotImplementedError(f"bmesh.ops.{name} is not available outside Blender")
+
+
+ops = _Unavailable()
+
+
+def new():
+    raise NotImplementedError("bmesh is not available outside Blender")
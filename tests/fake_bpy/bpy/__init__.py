@@ -0,0 +1,17 @@
+"""Stand-in for Blender's bpy module, for running the addon outside Blender.
+
+Holds one blend file with a single scene and no user interface. Only
+read-mostly data access is modelled; bpy.ops is absent, so code paths that
+need operators fail the same way they would with no viewport.
+"""
+from . import app, path, props, types, utils
+
+data = types.BlendData()
+context = types.Context(data.scenes.new("Scene"))
+
+
+def reset():
+    """Stand-in only: start over from an empty blend file"""
+    global data, context
+    data = types.BlendData()
+    context = types.Context(data.scenes.new("Scene"))
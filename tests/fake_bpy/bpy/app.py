@@ -0,0 +1,40 @@
+"""bpy.app of the bpy stand-in: version, timers and handlers"""
+import types
+
+version = (4, 2, 0)
+version_string = "4.2.0 (stand-in)"
+background = True
+
+
+class _Timers:
+    """Registered functions are only run when a test calls run_pending()"""
+
+    def __init__(self):
+        self._functions = []
+
+    def register(self, function, first_interval=0.0, persistent=False):
+        self._functions.append(function)
+
+    def unregister(self, function):
+        self._functions.remove(function)
+
+    def is_registered(self, function):
+        return function in self._functions
+
+    def run_pending(self):
+        """Stand-in only: call every registered function once, keeping those that return a delay"""
+        functions, self._functions = self._functions, []
+        for function in functions:
+            if function() is not None:
+                self._functions.append(function)
+
+
+timers = _Timers()
+
+handlers = types.SimpleNamespace(
+    persistent=lambda function: function,
+    depsgraph_update_post=[],
+    load_post=[],
+    save_pre=[],
+    save_post=[],
+)
@@ -0,0 +1,12 @@
+"""bpy.path of the bpy stand-in"""
+import os
+
+
+def abspath(path, start=None, library=None):
+    if path.startswith("//"):
+        return os.path.join(start or os.getcwd(), path[2:])
+    return path
+
+
+def basename(path):
+    return os.path.basename(path[2:] if path.startswith("//") else path)
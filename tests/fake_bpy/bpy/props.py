@@ -0,0 +1,22 @@
+"""Property definitions of the bpy stand-in.
+
+Blender turns these into descriptors; here each one evaluates to its
+default, so a property assigned to a class (bpy.types.Scene.blendermcp_port
+= IntProperty(default=9876)) reads back the default on every instance.
+"""
+
+
+def _property(fallback):
+    def definition(**options):
+        return options.get("default", fallback)
+    return definition
+
+
+BoolProperty = _property(False)
+IntProperty = _property(0)
+FloatProperty = _property(0.0)
+StringProperty = _property("")
+EnumProperty = _property(None)
+FloatVectorProperty = _property((0.0, 0.0, 0.0))
+PointerProperty = _property(None)
+CollectionProperty = _property(())
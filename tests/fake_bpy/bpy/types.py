@@ -0,0 +1,458 @@
+"""Data-block and UI classes of the bpy stand-in.
+
+Only what the addon's command layer touches is modelled: objects with
+transforms and bounding boxes, meshes built with ``from_pydata``, materials,
+images, collections and the scene. Names and behaviour follow the real API
+so the same test code runs inside Blender.
+"""
+from contextlib import contextmanager
+
+import numpy as np
+from mathutils import Euler, Matrix, Vector
+
+
+class bpy_struct:
+    """Base of every RNA-backed type; registered properties become class attributes"""
+
+
+class Panel(bpy_struct):
+    pass
+
+
+class Operator(bpy_struct):
+    pass
+
+
+class PropertyGroup(bpy_struct):
+    pass
+
+
+class bpy_prop_collection:
+    """Ordered name -> item mapping with the lookup and slicing rules of Blender collections"""
+
+    def __init__(self, items=()):
+        self._items = {}
+        for item in items:
+            self._items[item.name] = item
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return key in self._items
+        return any(item is key for item in self._items.values())
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._items[key]
+        values = list(self._items.values())
+        return values[key]
+
+    def get(self, key, default=None):
+        return self._items.get(key, default)
+
+    def keys(self):
+        return list(self._items)
+
+    def values(self):
+        return list(self._items.values())
+
+    def items(self):
+        return list(self._items.items())
+
+    def find(self, key):
+        return next((i for i, name in enumerate(self._items) if name == key), -1)
+
+
+class ID(bpy_struct):
+    """A named data-block with custom properties"""
+
+    def __init__(self, name):
+        self.name = name
+        self.users = 0
+        self.use_fake_user = False
+        self.library = None
+        self._properties = {}
+
+    @property
+    def original(self):
+        return self
+
+    def __getitem__(self, key):
+        return self._properties[key]
+
+    def __setitem__(self, key, value):
+        self._properties[key] = value
+
+    def __delitem__(self, key):
+        del self._properties[key]
+
+    def __contains__(self, key):
+        return key in self._properties
+
+    def get(self, key, default=None):
+        return self._properties.get(key, default)
+
+    def keys(self):
+        return self._properties.keys()
+
+    def __repr__(self):
+        return f"bpy.data.{type(self).__name__.lower()}s[{self.name!r}]"
+
+
+class MeshVertex:
+    __slots__ = ("index", "co")
+
+    def __init__(self, index, co):
+        self.index = index
+        self.co = Vector(co)
+
+
+class MeshEdge:
+    __slots__ = ("index", "vertices")
+
+    def __init__(self, index, vertices):
+        self.index = index
+        self.vertices = tuple(vertices)
+
+
+class MeshPolygon:
+    __slots__ = ("index", "vertices", "material_index")
+
+    def __init__(self, index, vertices):
+        self.index = index
+        self.vertices = tuple(vertices)
+        self.material_index = 0
+
+
+class Mesh(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.vertices = []
+        self.edges = []
+        self.polygons = []
+        self.materials = []
+        self._bounds = None
+
+    def from_pydata(self, vertices, edges, faces):
+        self.vertices = [MeshVertex(i, co) for i, co in enumerate(vertices)]
+        edges = list(edges)
+        if not edges:
+            # Blender derives the edges of the faces
+            unique = {}
+            for face in faces:
+                for a, b in zip(face, tuple(face[1:]) + tuple(face[:1])):
+                    unique.setdefault((min(a, b), max(a, b)), None)
+            edges = list(unique)
+        self.edges = [MeshEdge(i, edge) for i, edge in enumerate(edges)]
+        self.polygons = [MeshPolygon(i, face) for i, face in enumerate(faces)]
+        self._bounds = None
+
+    def update(self, calc_edges=False):
+        self._bounds = None
+
+    def _bound_box(self):
+        if self._bounds is None:
+            if self.vertices:
+                co = np.array([vertex.co for vertex in self.vertices], dtype=np.float64)
+                low, high = co.min(axis=0), co.max(axis=0)
+            else:
+                low = high = np.zeros(3)
+            # Same corner order as Object.bound_box in Blender
+            self._bounds = tuple(
+                (float(x), float(y), float(z))
+                for x, y, z in (
+                    (low[0], low[1], low[2]), (low[0], low[1], high[2]),
+                    (low[0], high[1], high[2]), (low[0], high[1], low[2]),
+                    (high[0], low[1], low[2]), (high[0], low[1], high[2]),
+                    (high[0], high[1], high[2]), (high[0], high[1], low[2]),
+                )
+            )
+        return self._bounds
+
+
+class Material(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.use_nodes = False
+        self.node_tree = None
+        self.diffuse_color = (0.8, 0.8, 0.8, 1.0)
+
+
+class Image(ID):
+    def __init__(self, name, width=0, height=0):
+        super().__init__(name)
+        self.size = (width, height)
+        self.filepath = ""
+        self.packed_file = None
+        self.colorspace_settings = type("ColorspaceSettings", (), {"name": "sRGB"})()
+
+
+class MaterialSlot:
+    __slots__ = ("material", "link")
+
+    def __init__(self, material=None):
+        self.material = material
+        self.link = 'DATA'
+
+
+class Object(ID):
+    _TYPES = {Mesh: 'MESH'}
+
+    def __init__(self, name, object_data=None):
+        super().__init__(name)
+        self.data = object_data
+        self.type = self._TYPES.get(type(object_data), 'EMPTY')
+        self.parent = None
+        self.instance_type = 'NONE'
+        self.instance_collection = None
+        self.hide_viewport = False
+        self.hide_render = False
+        self._hide = False
+        self._selected = False
+        self._location = Vector((0.0, 0.0, 0.0))
+        self._rotation = Euler((0.0, 0.0, 0.0))
+        self._scale = Vector((1.0, 1.0, 1.0))
+        self._matrix_world = None
+        self.material_slots = []
+        if object_data is not None and getattr(object_data, "materials", None):
+            self.material_slots = [MaterialSlot(material) for material in object_data.materials]
+
+    # Transforms: matrix_world follows location/rotation/scale, as after a depsgraph update
+    @property
+    def location(self):
+        return self._location
+
+    @location.setter
+    def location(self, value):
+        self._location = Vector(value)
+        self._matrix_world = None
+
+    @property
+    def rotation_euler(self):
+        return self._rotation
+
+    @rotation_euler.setter
+    def rotation_euler(self, value):
+        self._rotation = Euler(value)
+        self._matrix_world = None
+
+    @property
+    def scale(self):
+        return self._scale
+
+    @scale.setter
+    def scale(self, value):
+        self._scale = Vector(value)
+        self._matrix_world = None
+
+    @property
+    def matrix_world(self):
+        if self._matrix_world is None:
+            self._matrix_world = Matrix.LocRotScale(self._location, self._rotation, self._scale)
+        return self._matrix_world
+
+    @matrix_world.setter
+    def matrix_world(self, value):
+        matrix = Matrix(value)
+        self._matrix_world = matrix
+        self._location = Vector(matrix.to_translation())
+
+    @property
+    def bound_box(self):
+        if isinstance(self.data, Mesh):
+            return self.data._bound_box()
+        return ((-1.0, -1.0, -1.0),) * 4 + ((1.0, 1.0, 1.0),) * 4
+
+    @property
+    def dimensions(self):
+        box = np.array(self.bound_box)
+        return Vector((box.max(axis=0) - box.min(axis=0)) * np.abs(np.array(self._scale)))
+
+    @property
+    def users_collection(self):
+        import bpy
+        return [collection for collection in bpy.data.collections if self in collection.objects] + [
+            scene.collection for scene in bpy.data.scenes if self in scene.collection.objects]
+
+    def visible_get(self):
+        return not (self._hide or self.hide_viewport)
+
+    def hide_get(self):
+        return self._hide
+
+    def hide_set(self, state):
+        self._hide = bool(state)
+
+    def select_get(self):
+        return self._selected
+
+    def select_set(self, state):
+        self._selected = bool(state)
+
+
+class CollectionObjects(bpy_prop_collection):
+    def link(self, obj):
+        if obj.name in self._items:
+            raise RuntimeError(f"Object '{obj.name}' already in collection")
+        self._items[obj.name] = obj
+        obj.users += 1
+
+    def unlink(self, obj):
+        if self._items.pop(obj.name, None) is not None:
+            obj.users -= 1
+
+
+class CollectionChildren(bpy_prop_collection):
+    def link(self, collection):
+        self._items[collection.name] = collection
+        collection.users += 1
+
+    def unlink(self, collection):
+        if self._items.pop(collection.name, None) is not None:
+            collection.users -= 1
+
+
+class Collection(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.objects = CollectionObjects()
+        self.children = CollectionChildren()
+        self.instance_offset = Vector((0.0, 0.0, 0.0))
+        self.hide_viewport = False
+        self.hide_render = False
+
+    @property
+    def all_objects(self):
+        if not len(self.children):
+            return self.objects
+        seen = {}
+        stack = [self]
+        while stack:
+            collection = stack.pop()
+            for obj in collection.objects:
+                seen.setdefault(obj.name, obj)
+            stack.extend(collection.children)
+        return bpy_prop_collection(seen.values())
+
+
+class Scene(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.collection = Collection("Scene Collection")
+        self.camera = None
+        self.frame_current = 1
+
+    @property
+    def objects(self):
+        return self.collection.all_objects
+
+
+class IDCollection(bpy_prop_collection):
+    """A bpy.data collection: new() makes names unique the way Blender does"""
+
+    def __init__(self, id_type):
+        super().__init__()
+        self._id_type = id_type
+
+    def _unique_name(self, name):
+        if name not in self._items:
+            return name
+        base, _, suffix = name.rpartition(".")
+        if not (base and suffix.isdigit()):
+            base = name
+        number = 1
+        while f"{base}.{number:03d}" in self._items:
+            number += 1
+        return f"{base}.{number:03d}"
+
+    def new(self, name, *args, **kwargs):
+        item = self._id_type(self._unique_name(name), *args, **kwargs)
+        self._items[item.name] = item
+        return item
+
+    def remove(self, item, do_unlink=True):
+        if do_unlink:
+            import bpy
+            for collection in list(self._all_collections(bpy)):
+                if isinstance(item, Object):
+                    collection.objects.unlink(item)
+                elif isinstance(item, Collection):
+                    collection.children.unlink(item)
+        self._items.pop(item.name, None)
+
+    @staticmethod
+    def _all_collections(bpy):
+        yield from bpy.data.collections
+        for scene in bpy.data.scenes:
+            yield scene.collection
+
+
+class BlendData:
+    def __init__(self):
+        self.objects = IDCollection(Object)
+        self.meshes = IDCollection(Mesh)
+        self.materials = IDCollection(Material)
+        self.images = IDCollection(Image)
+        self.collections = IDCollection(Collection)
+        self.scenes = IDCollection(Scene)
+        self.filepath = ""
+        self.is_dirty = False
+
+
+class LayerObjects(bpy_prop_collection):
+    def __init__(self, scene):
+        self._scene = scene
+        self.active = None
+
+    @property
+    def _items(self):
+        return {obj.name: obj for obj in self._scene.objects}
+
+
+class ViewLayer:
+    def __init__(self, scene):
+        self.name = "ViewLayer"
+        self.objects = LayerObjects(scene)
+        self._scene = scene
+
+    def update(self):
+        # Pick up in-place edits such as obj.location.x = 1
+        for obj in self._scene.objects:
+            obj._matrix_world = None
+
+
+class Context:
+    """bpy.context of a background session: no window, screen or 3D viewport"""
+
+    def __init__(self, scene):
+        self.scene = scene
+        self.view_layer = ViewLayer(scene)
+        self.screen = None
+        self.area = None
+
+    @property
+    def collection(self):
+        return self.scene.collection
+
+    @property
+    def selected_objects(self):
+        return [obj for obj in self.scene.objects if obj.select_get()]
+
+    def copy(self):
+        return {"scene": self.scene, "view_layer": self.view_layer, "screen": self.screen, "area": self.area}
+
+    @contextmanager
+    def temp_override(self, **overrides):
+        previous = {key: getattr(self, key, None) for key in overrides}
+        for key, value in overrides.items():
+            setattr(self, key, value)
+        try:
+            yield
+        finally:
+            for key, value in previous.items():
+                setattr(self, key, value)
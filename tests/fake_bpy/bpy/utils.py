@@ -0,0 +1,21 @@
+"""bpy.utils of the bpy stand-in"""
+import os
+import tempfile
+
+_registered = []
+
+
+def register_class(cls):
+    _registered.append(cls)
+
+
+def unregister_class(cls):
+    _registered.remove(cls)
+
+
+def user_resource(resource_type, path="", create=False):
+    root = os.path.join(tempfile.gettempdir(), "bpy-stand-in", resource_type.lower())
+    target = os.path.join(root, path)
+    if create:
+        os.makedirs(target, exist_ok=True)
+    return target
@@ -0,0 +1,156 @@
+"""NumPy-backed stand-in for the parts of mathutils used with the bpy stand-in"""
+import math
+
+import numpy as np
+
+
+class Vector:
+    __slots__ = ("_values",)
+
+    def __init__(self, values=(0.0, 0.0, 0.0)):
+        self._values = [float(value) for value in values]
+
+    def _axis(index):
+        def get(self):
+            return self._values[index]
+
+        def set(self, value):
+            self._values[index] = float(value)
+        return property(get, set)
+
+    x, y, z, w = _axis(0), _axis(1), _axis(2), _axis(3)
+    del _axis
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __getitem__(self, index):
+        return self._values[index]
+
+    def __setitem__(self, index, value):
+        self._values[index] = float(value)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self._values, dtype=dtype)
+
+    def __eq__(self, other):
+        try:
+            return list(self) == [float(value) for value in other]
+        except TypeError:
+            return NotImplemented
+
+    def __add__(self, other):
+        return type(self)(a + b for a, b in zip(self, other))
+
+    def __sub__(self, other):
+        return type(self)(a - b for a, b in zip(self, other))
+
+    def __mul__(self, scalar):
+        return type(self)(a * scalar for a in self)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return type(self)(-a for a in self)
+
+    @property
+    def length(self):
+        return math.sqrt(sum(a * a for a in self))
+
+    def copy(self):
+        return type(self)(self._values)
+
+    def to_tuple(self, precision=None):
+        if precision is None:
+            return tuple(self._values)
+        return tuple(round(value, precision) for value in self._values)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(({', '.join(f'{value:.4f}' for value in self)}))"
+
+
+class Euler(Vector):
+    __slots__ = ("order",)
+
+    def __init__(self, values=(0.0, 0.0, 0.0), order='XYZ'):
+        super().__init__(values)
+        self.order = order
+
+    def to_matrix(self):
+        """3x3 rotation matrix, XYZ order"""
+        x, y, z = self._values[:3]
+        cx, sx, cy, sy, cz, sz = math.cos(x), math.sin(x), math.cos(y), math.sin(y), math.cos(z), math.sin(z)
+        rx = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]])
+        ry = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+        rz = np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]])
+        return Matrix(rz @ ry @ rx)
+
+
+class Matrix:
+    __slots__ = ("_array",)
+
+    def __init__(self, rows=None):
+        self._array = np.identity(4) if rows is None else np.array(rows, dtype=np.float64)
+
+    @classmethod
+    def Identity(cls, size):
+        return cls(np.identity(size))
+
+    @classmethod
+    def Translation(cls, vector):
+        matrix = np.identity(4)
+        matrix[:3, 3] = list(vector)[:3]
+        return cls(matrix)
+
+    @classmethod
+    def Diagonal(cls, vector):
+        return cls(np.diag(list(vector)))
+
+    @classmethod
+    def LocRotScale(cls, location, rotation, scale):
+        matrix = np.identity(4)
+        linear = np.identity(3) if rotation is None else rotation.to_matrix()._array
+        if scale is not None:
+            linear = linear * np.array(list(scale), dtype=np.float64)
+        matrix[:3, :3] = linear
+        if location is not None:
+            matrix[:3, 3] = list(location)
+        return cls(matrix)
+
+    def __len__(self):
+        return len(self._array)
+
+    def __iter__(self):
+        return (Vector(row) for row in self._array)
+
+    def __getitem__(self, index):
+        return Vector(self._array[index])
+
+    def __array__(self, dtype=None, copy=None):
+        return self._array if dtype is None else self._array.astype(dtype)
+
+    def __matmul__(self, other):
+        if isinstance(other, Matrix):
+            return Matrix(self._array @ other._array)
+        vector = np.array(list(other), dtype=np.float64)
+        if len(vector) == 3 and len(self._array) == 4:
+            return Vector(self._array[:3, :3] @ vector + self._array[:3, 3])
+        return Vector(self._array @ vector)
+
+    def to_translation(self):
+        return Vector(self._array[:3, 3])
+
+    def to_3x3(self):
+        return Matrix(self._array[:3, :3])
+
+    def inverted(self):
+        return Matrix(np.linalg.inv(self._array))
+
+    def copy(self):
+        return Matrix(self._array.copy())
+
+    def __repr__(self):
+        return f"Matrix({self._array.tolist()})"